@@ -1,34 +1,161 @@
+import os
+import json
 import pickle
 import numpy as np
-from sklearn.model_selection import train_test_split
+from tqdm import tqdm
 
-# Load the dataset
-with open('super_tic_tac_toe_training_data_combined.pkl', 'rb') as f:
-    training_data = pickle.load(f)
+from game_record import load_records, replay_positions, COMBINED_FILENAME
+from game_store import GameStore, STORE_PATH
+from symmetry import SampleIndex, deduplicate
+import features
 
-# Split data into board states (X) and moves (y)
-X = []
-y = []
+PREPROCESSED_DIR = 'preprocessed'
+MANIFEST_FILENAME = 'manifest.json'
 
-for game in training_data:
-    if game is not None:
-        for player, state, move in game[1:]:  # Skip the initial state
-            if state is not None and move is not None:
-                X.append(state.flatten())  # Flatten the board state to use as input
-                y.append(move)
+def preprocess_in_memory():
+    from sklearn.model_selection import train_test_split
 
-# Convert lists to numpy arrays
-X = np.array(X)
-y = np.array(y)
+    # Load the dataset (compact records; a legacy .pkl path also works)
+    training_data = load_records(COMBINED_FILENAME)
 
-# Split the data into training and testing sets (e.g., 80% training, 20% testing)
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Split data into board states (X) and moves (y)
+    X = []
+    y = []
 
-print("Data successfully preprocessed!")
-print(f"Total samples: {len(X)}, Training samples: {len(X_train)}, Testing samples: {len(X_test)}")
+    for record in training_data:
+        if record is not None and record.num_moves > 0:
+            # Board before each move, rebuilt by replaying the move list
+            X.append(record.states()[:-1].reshape(-1, 81).astype(int))
+            y.append(record.moves.astype(int))
 
-# Optionally, save the preprocessed data
-with open('preprocessed_data.pkl', 'wb') as f:
-    pickle.dump((X_train, X_test, y_train, y_test), f)
+    # Convert lists to numpy arrays
+    X = np.concatenate(X) if X else np.zeros((0, 81), dtype=int)
+    y = np.concatenate(y) if y else np.zeros(0, dtype=int)
 
-print("Preprocessed data saved to 'preprocessed_data.pkl'")
+    # Split the data into training and testing sets (e.g., 80% training, 20% testing)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    print("Data successfully preprocessed!")
+    print(f"Total samples: {len(X)}, Training samples: {len(X_train)}, Testing samples: {len(X_test)}")
+
+    # Optionally, save the preprocessed data
+    with open('preprocessed_data.pkl', 'wb') as f:
+        pickle.dump((X_train, X_test, y_train, y_test), f)
+
+    print("Preprocessed data saved to 'preprocessed_data.pkl'")
+
+def is_test_game(game_ids, test_fraction=0.2):
+    # Assign whole games to the test split by a hash of their ID, so the split
+    # is stable across runs and needs no shuffle of the full dataset
+    hashed = np.asarray(game_ids, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    return (hashed >> np.uint64(40)) % np.uint64(10000) < np.uint64(round(test_fraction * 10000))
+
+def shard_filename(output_dir, split, kind, shard):
+    return os.path.join(output_dir, f'{split}_{kind}_{shard:05d}.npy')
+
+def preprocess_streaming(store_path=STORE_PATH, output_dir=PREPROCESSED_DIR, games_per_shard=10000, test_fraction=0.2,
+                         dedup=False, feature_mode='board'):
+    # Walk the game store one range of games at a time and write int8 boards and
+    # uint8 move labels straight into preallocated .npy files, one set per range.
+    # With dedup, positions are reduced to one canonical sample per symmetry class and
+    # the number of merged positions is written alongside as a uint32 sample weight.
+    # feature_mode 'planes' stores bit-packed feature planes (see features.py) instead of boards.
+    if dedup and feature_mode != 'board':
+        raise ValueError('Symmetry deduplication works on raw boards only')
+    store = GameStore(store_path)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {'store': store_path, 'test_fraction': test_fraction, 'deduplicated': dedup,
+                'features': feature_mode, 'shards': []}
+    totals = {'train': 0, 'test': 0}
+    positions = {'train': 0, 'test': 0}
+    indexes = {'train': SampleIndex(), 'test': SampleIndex()}
+
+    for shard, start in enumerate(tqdm(range(0, len(store), games_per_shard), desc="Preprocessing shards")):
+        stop = min(start + games_per_shard, len(store))
+        moves, offsets, entries = store.moves_range(start, stop)
+        test_games = is_test_game(np.arange(start, stop), test_fraction)
+        states, game_index, ply = replay_positions(moves, offsets, entries['starting_player'])
+        test_positions = test_games[game_index]
+        if feature_mode == 'planes':
+            current_players, next_valid = features.game_context(moves, entries['starting_player'], game_index, ply)
+            states = features.pack(features.encode_planes(states, current_players, next_valid))
+
+        shard_info = {'games': [start, stop]}
+        for split, selected in (('train', ~test_positions), ('test', test_positions)):
+            X_split = states[selected]
+            y_split = moves[selected]
+            positions[split] += len(y_split)
+            if dedup:
+                X_split, y_split, counts, sample_keys = deduplicate(X_split, y_split)
+                new = indexes[split].add_shard(sample_keys, counts)
+                X_split, y_split = X_split[new], y_split[new]
+            count = len(y_split)
+            X_file = shard_filename(output_dir, split, 'X', shard)
+            y_file = shard_filename(output_dir, split, 'y', shard)
+            X_out = np.lib.format.open_memmap(X_file, mode='w+', dtype=X_split.dtype, shape=(count, X_split.shape[1]))
+            y_out = np.lib.format.open_memmap(y_file, mode='w+', dtype=np.uint8, shape=(count,))
+            X_out[:] = X_split
+            y_out[:] = y_split
+            X_out.flush()
+            y_out.flush()
+            del X_out, y_out
+            shard_info[split] = {'X': os.path.basename(X_file), 'y': os.path.basename(y_file), 'samples': count}
+            totals[split] += count
+        manifest['shards'].append(shard_info)
+
+    if dedup:
+        # Weights are final only once every shard has been seen
+        for split in ('train', 'test'):
+            for shard, (shard_info, weights) in enumerate(zip(manifest['shards'], indexes[split].weights)):
+                w_file = shard_filename(output_dir, split, 'w', shard)
+                np.save(w_file, weights)
+                shard_info[split]['w'] = os.path.basename(w_file)
+
+    manifest['train_samples'] = totals['train']
+    manifest['test_samples'] = totals['test']
+    manifest['train_positions'] = positions['train']
+    manifest['test_positions'] = positions['test']
+    with open(os.path.join(output_dir, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    print("Data successfully preprocessed!")
+    print(f"Total samples: {totals['train'] + totals['test']}, Training samples: {totals['train']}, Testing samples: {totals['test']}")
+    if dedup:
+        print(f"Deduplicated {positions['train'] + positions['test']} positions by symmetry "
+              f"({(totals['train'] + totals['test']) / max(positions['train'] + positions['test'], 1):.1%} kept)")
+    print(f"Preprocessed shards saved to '{output_dir}'")
+    return manifest
+
+def load_split(output_dir=PREPROCESSED_DIR, split='train', mmap_mode='r'):
+    # Re-open the sharded arrays of one split without reading them into memory
+    with open(os.path.join(output_dir, MANIFEST_FILENAME), 'r') as f:
+        manifest = json.load(f)
+    shards = []
+    for shard_info in manifest['shards']:
+        files = shard_info[split]
+        shards.append((np.load(os.path.join(output_dir, files['X']), mmap_mode=mmap_mode),
+                       np.load(os.path.join(output_dir, files['y']), mmap_mode=mmap_mode)))
+    return shards
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Turn self-play games into training samples')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Read the indexed game store shard by shard and write sharded int8 .npy files')
+    parser.add_argument('--store', default=STORE_PATH)
+    parser.add_argument('--output-dir', default=PREPROCESSED_DIR)
+    parser.add_argument('--games-per-shard', type=int, default=10000)
+    parser.add_argument('--test-fraction', type=float, default=0.2)
+    parser.add_argument('--dedup', action='store_true',
+                        help='Merge positions equivalent under the 8 board symmetries, keeping counts as sample weights')
+    parser.add_argument('--features', choices=['board', 'planes'], default='board',
+                        help='board: raw int8 cells; planes: bit-packed planes with side to move and legal moves')
+    args = parser.parse_args()
+
+    if args.dedup and args.features != 'board':
+        parser.error('--dedup needs --features board')
+    if args.streaming:
+        preprocess_streaming(args.store, args.output_dir, args.games_per_shard, args.test_fraction, args.dedup,
+                             args.features)
+    else:
+        preprocess_in_memory()
@@ -0,0 +1,294 @@
+import copy
+import time
+
+import numpy as np
+
+from bitboard import WIN_LINES, SUB_BOARD_MOVES, BitboardSuperTicTacToe
+from buildai import SuperTicTacToe
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from endgame import SolveTimeout
+
+# Negamax alpha-beta player with iterative deepening under a hard wall-clock deadline.
+# The search runs make_move/undo_move on a private SuperTicTacToe copy and uses the
+# incremental Zobrist hash for the transposition table.
+
+WIN_SCORE = 1000000
+MATE_THRESHOLD = WIN_SCORE - 1000  # Scores beyond this are "win in N plies"
+INFINITY = WIN_SCORE + 1
+
+# Evaluation weights, in points for the player they favour
+SUB_BOARD_WIN = 100
+SUB_BOARD_THREAT = 12  # Two in a line of a sub-board with the third cell free
+META_THREAT = 250  # Two won sub-boards in a meta line with the third still open
+META_LINE = 30  # One won sub-board in a meta line that is otherwise open
+CENTER_CELL = 3
+SUB_BOARD_WEIGHTS = (1.2, 1.0, 1.2, 1.0, 1.5, 1.0, 1.2, 1.0, 1.2)  # Corners and center matter more
+
+# Board cells in sub-board order, so one reshape gives a (9 sub-boards, 9 cells) view
+CELL_ORDER = np.array([move for moves in SUB_BOARD_MOVES for move in moves])
+CELL_BITS = 1 << np.arange(9)
+
+
+def _line_counts():
+    own = np.arange(512)[:, None]
+    other = np.arange(512)[None, :]
+    threats = np.zeros((512, 512), dtype=np.int64)
+    singles = np.zeros((512, 512), dtype=np.int64)
+    for line in WIN_LINES:
+        own_bits = np.array([bin(mask & line).count('1') for mask in range(512)])[:, None]
+        blocked = (other & line) != 0
+        threats += (own_bits == 2) & ~blocked
+        singles += (own_bits == 1) & ~blocked
+    return threats.reshape(-1).tolist(), singles.reshape(-1).tolist()
+
+
+# THREATS[own << 9 | other] counts lines with two own marks and no other mark;
+# SINGLES counts lines with exactly one own mark and no other mark
+THREATS, SINGLES = _line_counts()
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class AlphaBetaAI:
+    def __init__(self, player, time_limit_ms=100, max_depth=64, transposition_table=None, safety_margin_ms=3,
+                 endgame_solver=None):
+        self.player = player
+        self.endgame_solver = endgame_solver  # Optional EndgameSolver tried first in small positions
+        self.time_limit_ms = time_limit_ms
+        self.max_depth = max_depth
+        self.safety_margin_ms = safety_margin_ms
+        self.tt = transposition_table if transposition_table is not None else TranspositionTable(18)
+
+        self.killers = []
+        self.history = [0] * 81
+        self.deadline = 0.0
+
+        # Statistics of the last search
+        self.nodes = 0
+        self.depth_reached = 0
+        self.last_search_time = 0.0
+        self.last_score = 0
+
+    def nodes_per_sec(self):
+        return self.nodes / self.last_search_time if self.last_search_time > 0 else 0.0
+
+    def search_copy(self, game):
+        # The search needs SuperTicTacToe's make/unmake and incremental hash
+        if isinstance(game, SuperTicTacToe):
+            return copy.deepcopy(game)
+        return BitboardSuperTicTacToe.from_game(game).to_game(SuperTicTacToe)
+
+    def evaluate(self, game):
+        # Static score from the point of view of the side to move
+        cells = game.board.reshape(81)[CELL_ORDER].reshape(9, 9)
+        x_masks = ((cells == 1) @ CELL_BITS).tolist()
+        o_masks = ((cells == -1) @ CELL_BITS).tolist()
+        status = game.sub_board_status.tolist()
+
+        score = 0.0
+        x_meta = 0
+        o_meta = 0
+        closed = 0
+        for sub_board in range(9):
+            weight = SUB_BOARD_WEIGHTS[sub_board]
+            if status[sub_board] == 1:
+                x_meta |= 1 << sub_board
+                score += SUB_BOARD_WIN * weight
+            elif status[sub_board] == -1:
+                o_meta |= 1 << sub_board
+                score -= SUB_BOARD_WIN * weight
+            elif status[sub_board] == 3:
+                closed |= 1 << sub_board
+            else:
+                x_mask = x_masks[sub_board]
+                o_mask = o_masks[sub_board]
+                score += weight * SUB_BOARD_THREAT * (THREATS[x_mask << 9 | o_mask] - THREATS[o_mask << 9 | x_mask])
+                score += weight * CENTER_CELL * (((x_mask >> 4) & 1) - ((o_mask >> 4) & 1))
+
+        # Meta-board lines; tied sub-boards block both players
+        score += META_THREAT * (THREATS[x_meta << 9 | o_meta | closed] - THREATS[o_meta << 9 | x_meta | closed])
+        score += META_LINE * (SINGLES[x_meta << 9 | o_meta | closed] - SINGLES[o_meta << 9 | x_meta | closed])
+        return int(score) * game.current_player
+
+    def order_moves(self, moves, tt_move, ply):
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history
+
+        def priority(move):
+            if move == tt_move:
+                return 1 << 30
+            if move in killers:
+                return 1 << 29
+            return history[move]
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def negamax(self, game, depth, alpha, beta, ply):
+        self.nodes += 1
+        if time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+        winner = game.winner
+        if winner is not None:
+            # The previous mover decided the game
+            return 0 if winner == 0 else -(WIN_SCORE - ply)
+        if depth == 0:
+            return self.evaluate(game)
+
+        original_alpha = alpha
+        tt_move = None
+        entry = self.tt.probe(game.hash)
+        if entry is not None:
+            entry_depth, value, flag, tt_move = entry
+            if entry_depth >= depth:
+                value = from_tt_score(value, ply)
+                if flag == EXACT:
+                    return value
+                if flag == LOWER_BOUND:
+                    alpha = max(alpha, value)
+                elif flag == UPPER_BOUND:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        best_score = -INFINITY
+        best_move = None
+        for move in self.order_moves(game.get_valid_moves(), tt_move, ply):
+            game.make_move(move)
+            score = -self.negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            game.undo_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.record_cutoff(move, depth, ply)
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.tt.store(game.hash, depth, to_tt_score(best_score, ply), flag, best_move)
+        return best_score
+
+    def record_cutoff(self, move, depth, ply):
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[move] += depth * depth
+
+    def search_root(self, game, depth, root_moves):
+        alpha = -INFINITY
+        best_move = root_moves[0]
+        for move in root_moves:
+            game.make_move(move)
+            score = -self.negamax(game, depth - 1, -INFINITY, -alpha, 1)
+            game.undo_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        return best_move, alpha
+
+    def choose_move(self, game):
+        start_time = time.perf_counter()
+        self.deadline = start_time + max(self.time_limit_ms - self.safety_margin_ms, 0) / 1000.0
+        self.nodes = 0
+        self.depth_reached = 0
+        self.killers = []
+        self.history = [0] * 81
+
+        valid_moves = game.get_valid_moves()
+        if not valid_moves:
+            return None
+        best_move = valid_moves[0]
+        state = self.search_copy(game) if len(valid_moves) > 1 else None
+        if state is not None and self.endgame_solver is not None and self.endgame_solver.can_solve(state):
+            # Give the exact solver half of the budget; the search gets whatever is left
+            solver_deadline = start_time + (self.deadline - start_time) / 2
+            try:
+                self.last_score, best_move = self.endgame_solver.solve(state, solver_deadline)
+                self.last_search_time = time.perf_counter() - start_time
+                return best_move
+            except SolveTimeout:
+                pass
+        if state is not None:
+            root_moves = list(valid_moves)
+            for depth in range(1, self.max_depth + 1):
+                try:
+                    move, score = self.search_root(state, depth, root_moves)
+                except SearchTimeout:
+                    break
+                best_move = move
+                self.last_score = score
+                self.depth_reached = depth
+                # Search the previous best move first in the next iteration
+                root_moves.remove(move)
+                root_moves.insert(0, move)
+                if abs(score) >= MATE_THRESHOLD:
+                    break  # Forced result found; deeper search cannot change it
+
+        self.last_search_time = time.perf_counter() - start_time
+        return best_move
+
+
+def to_tt_score(score, ply):
+    # Store mate scores relative to the node so they stay valid at any ply
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def from_tt_score(score, ply):
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+if __name__ == '__main__':
+    import argparse
+    from buildai import BasicAI
+
+    parser = argparse.ArgumentParser(description='Play AlphaBetaAI against the random BasicAI')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--time-ms', type=int, default=50, help='Hard time limit per move in milliseconds')
+    args = parser.parse_args()
+
+    ai = AlphaBetaAI(1, time_limit_ms=args.time_ms)
+    opponent = BasicAI(-1)
+    results = {1: 0, -1: 0, 0: 0}
+    total_nodes = 0
+    total_time = 0.0
+    depths = []
+    max_move_time = 0.0
+    for game_number in range(args.games):
+        game = SuperTicTacToe(starting_player=1 if game_number % 2 == 0 else -1)
+        while not game.is_game_over():
+            if game.current_player == 1:
+                move = ai.choose_move(game)
+                total_nodes += ai.nodes
+                total_time += ai.last_search_time
+                depths.append(ai.depth_reached)
+                max_move_time = max(max_move_time, ai.last_search_time)
+            else:
+                move = opponent.choose_move(game)
+            game.make_move(move)
+        results[game.get_winner()] += 1
+
+    print(f"AlphaBetaAI results as player 1: {results}")
+    if total_time > 0:
+        print(f"Nodes/sec: {total_nodes / total_time:.0f}, mean depth: {np.mean(depths):.1f}, "
+              f"slowest move: {max_move_time * 1000:.1f} ms (limit {args.time_ms} ms)")
+    print(f"Transposition table: {ai.tt.stats()}")
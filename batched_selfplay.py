@@ -0,0 +1,170 @@
+import numpy as np
+from collections import deque
+
+from bitboard import WIN_TABLE, MOVE_TO_SUB_BOARD, MOVE_TO_CELL, FULL_MASK
+from game_record import GameRecord
+
+# Lookup tables as arrays so they can index whole batches at once
+WIN_LOOKUP = np.array(WIN_TABLE, dtype=bool)
+MOVE_SUB_BOARD = np.array(MOVE_TO_SUB_BOARD, dtype=np.int64)
+MOVE_CELL = np.array(MOVE_TO_CELL, dtype=np.int64)
+MOVE_BIT = (1 << MOVE_CELL).astype(np.uint16)
+SUB_BOARD_BITS = (1 << np.arange(9)).astype(np.uint16)
+
+NO_SUB_BOARD = -1  # next_valid_sub_board value meaning "any open sub-board"
+NO_GAME = -1  # game_ids value of an idle slot
+
+
+# N games of SuperTicTacToe stored as arrays and advanced in lockstep.
+# Rows use the same rules and move numbering as buildai.SuperTicTacToe.
+class BatchedSuperTicTacToe:
+    def __init__(self, num_games, rng=None):
+        self.num_games = num_games
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self.board = np.zeros((num_games, 81), dtype=np.int8)
+        self.player_masks = np.zeros((num_games, 2, 9), dtype=np.uint16)  # [:, 0] player 1, [:, 1] player -1
+        self.sub_board_status = np.zeros((num_games, 9), dtype=np.int8)  # 1, -1, 3 for a tie, 0 open
+        self.meta_masks = np.zeros((num_games, 2), dtype=np.uint16)  # Sub-boards won by each player
+        self.closed_sub_boards = np.zeros(num_games, dtype=np.uint16)
+        self.current_player = np.ones(num_games, dtype=np.int8)
+        self.starting_player = np.ones(num_games, dtype=np.int8)
+        self.next_valid_sub_board = np.full(num_games, NO_SUB_BOARD, dtype=np.int8)
+        self.winner = np.zeros(num_games, dtype=np.int8)
+        self.finished = np.zeros(num_games, dtype=bool)
+        self.moves = np.zeros((num_games, 81), dtype=np.uint8)
+        self.num_moves = np.zeros(num_games, dtype=np.int64)
+        self.game_ids = np.full(num_games, NO_GAME, dtype=np.int64)
+
+    def active_rows(self):
+        return np.flatnonzero((self.game_ids != NO_GAME) & ~self.finished)
+
+    def reset_rows(self, rows, game_ids, starting_players=None):
+        rows = np.asarray(rows, dtype=np.int64)
+        if starting_players is None:
+            starting_players = np.where(self.rng.random(len(rows)) < 0.5, 1, -1)
+        self.board[rows] = 0
+        self.player_masks[rows] = 0
+        self.sub_board_status[rows] = 0
+        self.meta_masks[rows] = 0
+        self.closed_sub_boards[rows] = 0
+        self.current_player[rows] = starting_players
+        self.starting_player[rows] = starting_players
+        self.next_valid_sub_board[rows] = NO_SUB_BOARD
+        self.winner[rows] = 0
+        self.finished[rows] = False
+        self.num_moves[rows] = 0
+        self.game_ids[rows] = game_ids
+
+    def legal_move_mask(self, rows):
+        empty = self.board[rows] == 0
+        open_sub_boards = self.sub_board_status[rows] == 0
+        next_sub_board = self.next_valid_sub_board[rows]
+        forced = next_sub_board != NO_SUB_BOARD
+        allowed = open_sub_boards.copy()
+        allowed[forced] = np.arange(9) == next_sub_board[forced, None]
+        return empty & allowed[:, MOVE_SUB_BOARD]
+
+    def sample_random_moves(self, mask):
+        # Uniform choice among the legal cells of each row
+        scores = self.rng.random(mask.shape)
+        scores[~mask] = -1.0
+        return scores.argmax(axis=1)
+
+    def apply_moves(self, rows, moves):
+        rows = np.asarray(rows, dtype=np.int64)
+        moves = np.asarray(moves, dtype=np.int64)
+        players = self.current_player[rows]
+        player_index = (players == -1).astype(np.int64)
+        sub_boards = MOVE_SUB_BOARD[moves]
+        cells = MOVE_CELL[moves]
+
+        self.board[rows, moves] = players
+        self.moves[rows, self.num_moves[rows]] = moves
+        self.num_moves[rows] += 1
+
+        masks = self.player_masks[rows, player_index, sub_boards] | MOVE_BIT[moves]
+        self.player_masks[rows, player_index, sub_boards] = masks
+        occupied = self.player_masks[rows, 0, sub_boards] | self.player_masks[rows, 1, sub_boards]
+        won = WIN_LOOKUP[masks]
+        full = occupied == FULL_MASK
+        self.sub_board_status[rows, sub_boards] = np.where(won, players, np.where(full, 3, 0))
+
+        sub_bits = SUB_BOARD_BITS[sub_boards]
+        self.meta_masks[rows, player_index] |= np.where(won, sub_bits, 0).astype(np.uint16)
+        self.closed_sub_boards[rows] |= np.where(won | full, sub_bits, 0).astype(np.uint16)
+
+        # Game over when the mover completes a meta-board line or every sub-board is closed
+        meta_won = WIN_LOOKUP[self.meta_masks[rows, player_index]]
+        all_closed = self.closed_sub_boards[rows] == FULL_MASK
+        self.winner[rows] = np.where(meta_won, players, 0)
+        self.finished[rows] = meta_won | all_closed
+
+        # If the next sub-board is full or won, allow move in any sub-board
+        next_closed = (self.closed_sub_boards[rows] >> cells.astype(np.uint16)) & 1
+        self.next_valid_sub_board[rows] = np.where(next_closed == 1, NO_SUB_BOARD, cells)
+        self.current_player[rows] = -players
+
+    def step(self):
+        rows = self.active_rows()
+        if len(rows) == 0:
+            return rows
+        moves = self.sample_random_moves(self.legal_move_mask(rows))
+        self.apply_moves(rows, moves)
+        return rows
+
+    def finished_rows(self):
+        return np.flatnonzero((self.game_ids != NO_GAME) & self.finished)
+
+    def game_moves(self, row):
+        return self.moves[row, :self.num_moves[row]].copy()
+
+    def to_record(self, row):
+        return GameRecord(int(self.starting_player[row]), self.game_moves(row), int(self.winner[row]))
+
+
+def iter_batched_games(game_numbers, num_parallel=1024, rng=None):
+    # Yields (game_number, starting_player, moves, outcome) as games finish.
+    # Finished rows are refilled from the queue until it runs dry.
+    queue = deque(game_numbers)
+    games = BatchedSuperTicTacToe(min(num_parallel, max(len(queue), 1)), rng=rng)
+
+    def refill(rows):
+        count = min(len(rows), len(queue))
+        if count:
+            games.reset_rows(rows[:count], [queue.popleft() for _ in range(count)])
+        games.game_ids[rows[count:]] = NO_GAME
+
+    refill(np.arange(games.num_games))
+    while len(games.step()):
+        done = games.finished_rows()
+        if len(done) == 0:
+            continue
+        for row in done:
+            yield int(games.game_ids[row]), int(games.starting_player[row]), games.game_moves(row), int(games.winner[row])
+        refill(done)
+
+
+def play_records_batched(game_numbers, num_parallel=1024, seed=None):
+    # GameRecords for game_numbers, in the same order
+    game_numbers = list(game_numbers)
+    results = {}
+    for game_number, starting_player, moves, outcome in iter_batched_games(
+            game_numbers, num_parallel, np.random.default_rng(seed)):
+        results[game_number] = GameRecord(starting_player, moves, outcome)
+    return [results[game_number] for game_number in game_numbers]
+
+
+def play_games_batched(game_numbers, num_parallel=1024, seed=None):
+    # Drop-in replacement for mapping play_single_game_with_timeout over game_numbers
+    return [record.to_game_data() for record in play_records_batched(game_numbers, num_parallel, seed)]
+
+
+if __name__ == '__main__':
+    import time
+
+    num_games = 20000
+    start_time = time.time()
+    games_played = sum(1 for _ in iter_batched_games(range(num_games)))
+    elapsed = time.time() - start_time
+    print(f"Simulated {games_played} games in {elapsed:.2f} seconds ({games_played / elapsed:.0f} games/sec)")
@@ -0,0 +1,310 @@
+import contextlib
+import io
+import json
+import os
+import pickle
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from functools import partial
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+
+from buildai import SuperTicTacToe, play_single_game_with_timeout, play_single_record_with_timeout
+from game_record import GameRecord, read_records, write_records
+
+# Benchmarks for the hot paths of the engine, self-play generation and the data
+# pipeline. Results are written to JSON and compared against a stored baseline; a
+# metric that is worse than the baseline by more than the tolerance is a regression
+# and makes the run exit with status 1. Every metric is the best of several timed
+# samples; how far the median sample trails the best is saved as the metric's noise
+# and added to its tolerance, so a metric that is unsteady on this machine needs a
+# correspondingly larger change before it counts as a regression.
+#
+#   python benchmark.py --save-baseline       # record the current numbers
+#   python benchmark.py                       # compare against them
+
+RESULTS_PATH = 'benchmark_results.json'
+BASELINE_PATH = 'benchmark_baseline.json'
+DEFAULT_TOLERANCE = 0.15
+REPEATS = 7
+MIN_SAMPLE_SECONDS = 0.2  # Each sample repeats the work until it runs at least this long
+INFERENCE_BATCH_SIZES = (1, 32, 256, 1024)
+
+
+def best_time(function, repeats=REPEATS, min_seconds=MIN_SAMPLE_SECONDS):
+    # (seconds per call of function, noise). The time is the fastest of several samples,
+    # the least noisy estimate on a shared machine; short calls are repeated within a
+    # sample until it lasts min_seconds, so timer resolution does not dominate. Noise is
+    # how much slower the median sample was, relative to the fastest.
+    start_time = time.perf_counter()
+    function()  # Also warms caches and worker processes
+    first = time.perf_counter() - start_time
+    calls = max(1, int(np.ceil(min_seconds / first))) if first > 0 else 1
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        for _ in range(calls):
+            function()
+        times.append((time.perf_counter() - start_time) / calls)
+    best = min(times)
+    return best, float(np.median(times)) / best - 1 if best > 0 else 0.0
+
+
+def random_games(num_games, seed=0):
+    # Seeded random games as GameRecords, so every run measures the same work
+    rng = random.Random(seed)
+    games = []
+    for _ in range(num_games):
+        starting_player = rng.choice([1, -1])
+        game = SuperTicTacToe(starting_player=starting_player)
+        moves = []
+        while not game.is_game_over():
+            move = rng.choice(game.get_valid_moves())
+            game.make_move(move)
+            moves.append(move)
+        games.append(GameRecord(starting_player, moves, game.get_winner()))
+    return games
+
+
+def sample_positions(games, seed=0):
+    # One random position from every game, as engine objects
+    rng = random.Random(seed)
+    positions = []
+    for record in games:
+        game = SuperTicTacToe(starting_player=record.starting_player)
+        for move in record.moves[:rng.randrange(record.num_moves)].tolist():
+            game.make_move(move)
+        positions.append(game)
+    return positions
+
+
+def bench_engine(scale):
+    games = random_games(20 * scale)
+    move_lists = [(record.starting_player, record.moves.tolist()) for record in games]
+    total_moves = sum(len(moves) for _, moves in move_lists)
+
+    def replay():
+        for starting_player, moves in move_lists:
+            game = SuperTicTacToe(starting_player=starting_player)
+            for move in moves:
+                game.make_move(move)
+
+    positions = sample_positions(games)
+    loops = 20
+
+    def valid_moves():
+        for _ in range(loops):
+            for game in positions:
+                game.get_valid_moves()
+
+    def game_over():
+        for _ in range(loops):
+            for game in positions:
+                game.is_game_over()
+
+    def winner():
+        for _ in range(loops):
+            for game in positions:
+                game.get_winner()
+
+    calls = loops * len(positions)
+    results = {}
+    for name, function, count in (('make_move', replay, total_moves), ('get_valid_moves', valid_moves, calls),
+                                  ('is_game_over', game_over, calls), ('get_winner', winner, calls)):
+        elapsed, noise = best_time(function)
+        results[f'engine.{name}_us'] = (elapsed / count * 1e6, 'us', False, noise)
+    return results
+
+
+def bench_generation(scale, processes=None):
+    # The game loop of the default compact-record generator
+    num_games = 20 * scale
+    play = partial(play_single_record_with_timeout, timeout=60, verbose=False)
+    random.seed(0)
+    elapsed, noise = best_time(lambda: [play(i) for i in range(num_games)])
+    results = {'generation.single_process_games_per_sec': (num_games / elapsed, 'games/s', True, noise)}
+
+    processes = processes or cpu_count()
+    with Pool(processes=processes) as pool:
+        pool.map(play, range(processes))  # Start the workers before timing
+        elapsed, noise = best_time(lambda: list(pool.imap_unordered(play, range(num_games * processes),
+                                                                    chunksize=max(1, num_games // 4))))
+    results['generation.pool_games_per_sec'] = (num_games * processes / elapsed, 'games/s', True, noise)
+    return results
+
+
+def bench_serialization(scale, work_dir):
+    random.seed(0)
+    games = [play_single_game_with_timeout(i, timeout=60, verbose=False) for i in range(20 * scale)]
+    records = [GameRecord.from_game_data(game) for game in games]
+    pickle_path = os.path.join(work_dir, 'batch.pkl')
+    record_path = os.path.join(work_dir, 'batch.stt')
+
+    def write_pickle():
+        with open(pickle_path, 'wb') as f:
+            pickle.dump(games, f)
+
+    def read_pickle():
+        with open(pickle_path, 'rb') as f:
+            pickle.load(f)
+
+    results = {}
+    elapsed, noise = best_time(write_pickle)
+    size_mb = os.path.getsize(pickle_path) / 1e6
+    results['pickle.write_mb_per_sec'] = (size_mb / elapsed, 'MB/s', True, noise)
+    results['pickle.write_games_per_sec'] = (len(games) / elapsed, 'games/s', True, noise)
+    elapsed, noise = best_time(read_pickle)
+    results['pickle.read_mb_per_sec'] = (size_mb / elapsed, 'MB/s', True, noise)
+    results['pickle.read_games_per_sec'] = (len(games) / elapsed, 'games/s', True, noise)
+
+    elapsed, noise = best_time(lambda: write_records(record_path, records))
+    results['records.write_games_per_sec'] = (len(records) / elapsed, 'games/s', True, noise)
+    elapsed, noise = best_time(lambda: read_records(record_path))
+    results['records.read_games_per_sec'] = (len(records) / elapsed, 'games/s', True, noise)
+    return results
+
+
+def bench_preprocessing(scale, work_dir):
+    from game_store import GameStoreWriter
+    from Split import preprocess_streaming
+
+    store_path = os.path.join(work_dir, 'store')
+    with GameStoreWriter(store_path) as writer:
+        writer.write_all(random_games(200 * scale, seed=1))
+
+    output_dir = os.path.join(work_dir, 'preprocessed')
+    manifests = []
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        elapsed, noise = best_time(lambda: manifests.append(
+            preprocess_streaming(store_path, output_dir, games_per_shard=50 * scale)))
+    rows = manifests[-1]['train_samples'] + manifests[-1]['test_samples']
+    return {'split.rows_per_sec': (rows / elapsed, 'rows/s', True, noise)}
+
+
+def bench_inference(scale, use_tensorflow=False):
+    from numpy_model import NumpyPolicy, TFJS_MODEL_DIR
+
+    predictors = {'numpy': NumpyPolicy.from_tfjs(TFJS_MODEL_DIR)}
+    if use_tensorflow:
+        from inference_server import SavedModelPredictor
+        predictors['tensorflow'] = SavedModelPredictor()
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for name, predict in predictors.items():
+        for batch_size in INFERENCE_BATCH_SIZES:
+            boards = rng.integers(-1, 2, size=(batch_size, 81)).astype(np.float32)
+            repeats = max(1, 2000 * scale // batch_size)
+            predict(boards)
+            elapsed, noise = best_time(lambda: [predict(boards) for _ in range(repeats)])
+            results[f"inference.{name}.batch_{batch_size}_positions_per_sec"] = \
+                (repeats * batch_size / elapsed, 'positions/s', True, noise)
+    return results
+
+
+BENCHMARKS = ('engine', 'generation', 'serialization', 'preprocessing', 'inference')
+
+
+def run_benchmarks(names=BENCHMARKS, scale=5, processes=None, use_tensorflow=False):
+    work_dir = tempfile.mkdtemp(prefix='stt_benchmark_')
+    results = {}
+    try:
+        for name in names:
+            start_time = time.time()
+            if name == 'engine':
+                results.update(bench_engine(scale))
+            elif name == 'generation':
+                results.update(bench_generation(scale, processes))
+            elif name == 'serialization':
+                results.update(bench_serialization(scale, work_dir))
+            elif name == 'preprocessing':
+                results.update(bench_preprocessing(scale, work_dir))
+            elif name == 'inference':
+                results.update(bench_inference(scale, use_tensorflow))
+            print(f"{name} benchmarks done in {time.time() - start_time:.1f} seconds")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {name: {'value': value, 'unit': unit, 'higher_is_better': higher, 'noise': noise}
+            for name, (value, unit, higher, noise) in results.items()}
+
+
+def environment():
+    return {
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': cpu_count(),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    # [(metric, current, baseline, relative change, allowed change, regressed)] for
+    # metrics in both runs. Each metric may slow down by the tolerance plus the larger
+    # of its noise in the two runs.
+    rows = []
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]['value']
+        value = current['value']
+        change = (value - base) / base if base else 0.0
+        allowed = tolerance + max(current.get('noise', 0.0), baseline[name].get('noise', 0.0))
+        if current['higher_is_better']:
+            regressed = value < base * (1 - allowed)
+        else:
+            regressed = value > base * (1 + allowed)
+        rows.append((name, value, base, change, allowed, regressed))
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark engine, generation and data-pipeline hot paths')
+    parser.add_argument('--only', nargs='*', choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument('--scale', type=int, default=5, help='Work per benchmark; larger is slower but steadier')
+    parser.add_argument('--processes', type=int, default=None, help='Workers for the pool generation benchmark')
+    parser.add_argument('--tensorflow', action='store_true', help='Also benchmark the SavedModel under TensorFlow')
+    parser.add_argument('--output', default=RESULTS_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown relative to the baseline, e.g. 0.15 for 15%%, on top of "
+                             "each metric's measured noise")
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only, args.scale, args.processes, args.tensorflow)
+    report = {'environment': environment(), 'scale': args.scale, 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != args.scale:
+            print(f"Warning: baseline was recorded with --scale {baseline.get('scale')}")
+        rows = compare(results, baseline['results'], args.tolerance)
+        regressions = [row for row in rows if row[5]]
+        print(f"{'metric':<55}{'current':>14}{'baseline':>14}{'change':>9}{'allowed':>9}")
+        for name, value, base, change, allowed, regressed in rows:
+            flag = 'REGRESSION' if regressed else ''
+            print(f"{name:<55}{value:>14.2f}{base:>14.2f}{change:>+9.1%}{allowed:>9.0%}  {flag}")
+        if regressions:
+            print(f"\n{len(regressions)} of {len(rows)} metrics regressed by more than their allowed change")
+            sys.exit(1)
+        print(f"\nNo regressions beyond the allowed change across {len(rows)} metrics")
+    else:
+        for name, result in results.items():
+            print(f"{name:<55}{result['value']:>14.2f} {result['unit']}")
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
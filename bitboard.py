@@ -0,0 +1,218 @@
+import numpy as np
+
+# Bitboard implementation of the SuperTicTacToe rules. Every sub-board is a
+# 9-bit mask per player (bit i = cell i of the 3x3 board in row-major order)
+# and the meta-board is three more 9-bit masks (won by X, won by O, tied).
+# Moves use the same 0-80 numbering as buildai.SuperTicTacToe: row * 9 + col
+# on the full 9x9 grid.
+
+FULL_MASK = 0x1FF
+
+WIN_LINES = (
+    0b000000111, 0b000111000, 0b111000000,  # rows
+    0b001001001, 0b010010010, 0b100100100,  # columns
+    0b100010001, 0b001010100,               # diagonals
+)
+
+# WIN_TABLE[mask] is True when the 9-bit mask contains a complete line
+WIN_TABLE = tuple(any(mask & line == line for line in WIN_LINES) for mask in range(512))
+
+# Lookup tables between the 9x9 move numbering and (sub-board, cell) pairs
+MOVE_TO_SUB_BOARD = tuple((move // 9 // 3) * 3 + (move % 9) // 3 for move in range(81))
+MOVE_TO_CELL = tuple((move // 9 % 3) * 3 + (move % 9) % 3 for move in range(81))
+SUB_BOARD_MOVES = tuple(
+    tuple(((sub_board // 3) * 3 + cell // 3) * 9 + (sub_board % 3) * 3 + cell % 3 for cell in range(9))
+    for sub_board in range(9)
+)
+
+# EMPTY_CELL_MOVES[sub_board][occupied_mask] lists the free moves of a
+# sub-board in the same ascending order SuperTicTacToe.get_valid_moves uses
+EMPTY_CELL_MOVES = tuple(
+    tuple(
+        tuple(SUB_BOARD_MOVES[sub_board][cell] for cell in range(9) if not occupied >> cell & 1)
+        for occupied in range(512)
+    )
+    for sub_board in range(9)
+)
+
+
+class BitboardSuperTicTacToe:
+    __slots__ = ('x_boards', 'o_boards', 'x_meta', 'o_meta', 'tie_meta',
+                 'current_player', 'next_valid_sub_board', 'move_history')
+
+    def __init__(self, starting_player=1):
+        self.x_boards = [0] * 9
+        self.o_boards = [0] * 9
+        self.x_meta = 0  # Sub-boards won by player 1
+        self.o_meta = 0  # Sub-boards won by player -1
+        self.tie_meta = 0  # Sub-boards that filled up without a winner
+        self.current_player = starting_player  # 1 for 'X', -1 for 'O'
+        self.next_valid_sub_board = None  # Can be None (any sub-board) or 0-8
+        self.move_history = []  # (move, previous next_valid_sub_board, previous meta masks) for undo_move
+
+    def closed_sub_boards(self):
+        return self.x_meta | self.o_meta | self.tie_meta
+
+    def is_valid_move(self, move):
+        if not 0 <= move < 81:
+            return False
+        sub_board = MOVE_TO_SUB_BOARD[move]
+        if self.next_valid_sub_board is not None and sub_board != self.next_valid_sub_board:
+            return False
+        if self.closed_sub_boards() >> sub_board & 1:
+            return False
+        return not (self.x_boards[sub_board] | self.o_boards[sub_board]) >> MOVE_TO_CELL[move] & 1
+
+    def make_move(self, move):
+        if not self.is_valid_move(move):
+            return False
+
+        sub_board = MOVE_TO_SUB_BOARD[move]
+        cell = MOVE_TO_CELL[move]
+        bit = 1 << cell
+        sub_bit = 1 << sub_board
+        self.move_history.append((move, self.next_valid_sub_board, self.x_meta, self.o_meta, self.tie_meta))
+
+        if self.current_player == 1:
+            mask = self.x_boards[sub_board] | bit
+            self.x_boards[sub_board] = mask
+            if WIN_TABLE[mask]:
+                self.x_meta |= sub_bit
+            elif mask | self.o_boards[sub_board] == FULL_MASK:
+                self.tie_meta |= sub_bit
+        else:
+            mask = self.o_boards[sub_board] | bit
+            self.o_boards[sub_board] = mask
+            if WIN_TABLE[mask]:
+                self.o_meta |= sub_bit
+            elif mask | self.x_boards[sub_board] == FULL_MASK:
+                self.tie_meta |= sub_bit
+
+        # If the next sub-board is full or won, allow move in any sub-board
+        if self.closed_sub_boards() >> cell & 1:
+            self.next_valid_sub_board = None
+        else:
+            self.next_valid_sub_board = cell
+
+        self.current_player = -self.current_player
+        return True
+
+    def undo_move(self):
+        # Take back the last move made with make_move and return it
+        move, self.next_valid_sub_board, self.x_meta, self.o_meta, self.tie_meta = self.move_history.pop()
+        sub_board = MOVE_TO_SUB_BOARD[move]
+        bit = 1 << MOVE_TO_CELL[move]
+        self.current_player = -self.current_player
+        if self.current_player == 1:
+            self.x_boards[sub_board] &= ~bit
+        else:
+            self.o_boards[sub_board] &= ~bit
+        return move
+
+    def get_valid_moves(self):
+        if self.next_valid_sub_board is None:
+            closed = self.closed_sub_boards()
+            valid_sub_boards = [i for i in range(9) if not closed >> i & 1]
+        else:
+            valid_sub_boards = [self.next_valid_sub_board]
+
+        valid_moves = []
+        for sub_board in valid_sub_boards:
+            occupied = self.x_boards[sub_board] | self.o_boards[sub_board]
+            valid_moves.extend(EMPTY_CELL_MOVES[sub_board][occupied])
+        return valid_moves
+
+    def get_winner(self):
+        if WIN_TABLE[self.x_meta]:
+            return 1
+        if WIN_TABLE[self.o_meta]:
+            return -1
+        if self.closed_sub_boards() == FULL_MASK:
+            return 0  # Tie
+        return None  # Game not over
+
+    def is_game_over(self):
+        return self.get_winner() is not None
+
+    @property
+    def sub_board_status(self):
+        status = np.zeros(9, dtype=int)
+        for sub_board in range(9):
+            sub_bit = 1 << sub_board
+            if self.x_meta & sub_bit:
+                status[sub_board] = 1
+            elif self.o_meta & sub_bit:
+                status[sub_board] = -1
+            elif self.tie_meta & sub_bit:
+                status[sub_board] = 3  # Use 3 to represent a tie
+        return status
+
+    @property
+    def board(self):
+        return self.to_array()
+
+    def to_array(self):
+        # 9x9 int array in the same layout as SuperTicTacToe.board
+        flat = np.zeros(81, dtype=int)
+        for sub_board in range(9):
+            x_mask = self.x_boards[sub_board]
+            o_mask = self.o_boards[sub_board]
+            for cell, move in enumerate(SUB_BOARD_MOVES[sub_board]):
+                if x_mask >> cell & 1:
+                    flat[move] = 1
+                elif o_mask >> cell & 1:
+                    flat[move] = -1
+        return flat.reshape(9, 9)
+
+    @classmethod
+    def from_array(cls, board, current_player=1, next_valid_sub_board=None):
+        game = cls(starting_player=current_player)
+        flat = np.asarray(board).reshape(81)
+        for sub_board in range(9):
+            x_mask = 0
+            o_mask = 0
+            for cell, move in enumerate(SUB_BOARD_MOVES[sub_board]):
+                if flat[move] == 1:
+                    x_mask |= 1 << cell
+                elif flat[move] == -1:
+                    o_mask |= 1 << cell
+            game.x_boards[sub_board] = x_mask
+            game.o_boards[sub_board] = o_mask
+
+            sub_bit = 1 << sub_board
+            if WIN_TABLE[x_mask]:
+                game.x_meta |= sub_bit
+            elif WIN_TABLE[o_mask]:
+                game.o_meta |= sub_bit
+            elif x_mask | o_mask == FULL_MASK:
+                game.tie_meta |= sub_bit
+
+        if next_valid_sub_board is not None and game.closed_sub_boards() >> next_valid_sub_board & 1:
+            next_valid_sub_board = None
+        game.next_valid_sub_board = next_valid_sub_board
+        return game
+
+    @classmethod
+    def from_game(cls, game):
+        return cls.from_array(game.board, game.current_player, game.next_valid_sub_board)
+
+    def to_game(self, game_class):
+        # Build an array-backed game (e.g. buildai.SuperTicTacToe) in the same position
+        game = game_class(starting_player=self.current_player)
+        game.board[:, :] = self.to_array()
+        game.sub_board_status[:] = self.sub_board_status
+        game.next_valid_sub_board = self.next_valid_sub_board
+        game.rebuild_indices()
+        return game
+
+    def copy(self):
+        game = BitboardSuperTicTacToe.__new__(BitboardSuperTicTacToe)
+        game.x_boards = self.x_boards[:]
+        game.o_boards = self.o_boards[:]
+        game.x_meta = self.x_meta
+        game.o_meta = self.o_meta
+        game.tie_meta = self.tie_meta
+        game.current_player = self.current_player
+        game.next_valid_sub_board = self.next_valid_sub_board
+        game.move_history = self.move_history[:]
+        return game
@@ -11,6 +11,14 @@ from functools import partial
 import sys
 import signal
 import json
+import queue
+import threading
+
+from bitboard import BitboardSuperTicTacToe, SUB_BOARD_MOVES
+from batched_selfplay import play_records_batched
+from zobrist import CELL_KEYS, SIDE_KEY, compute_hash, player_index, sub_board_key
+from game_record import GameRecord, RecordWriter, write_records, BATCH_FILENAME, RECORD_EXTENSION
+import instrumentation
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -22,6 +30,17 @@ class SuperTicTacToe:
         self.current_player = starting_player  # 1 for 'X', -1 for 'O'
         self.sub_board_status = np.zeros(9, dtype=int)  # Tracks the status of each 3x3 board
         self.next_valid_sub_board = None  # Can be None (any sub-board) or 0-8
+        self.move_history = []  # (move, previous next_valid_sub_board, previous winner, previous hash) for undo_move
+        self.rebuild_indices()
+
+    def rebuild_indices(self):
+        # Recompute the incremental indices from board and sub_board_status,
+        # e.g. after the arrays were filled in directly
+        flat_board = self.board.reshape(81)
+        self.empty_cells = [{move for move in SUB_BOARD_MOVES[i] if flat_board[move] == 0} for i in range(9)]
+        self.open_sub_boards = {i for i in range(9) if self.sub_board_status[i] == 0}
+        self.winner = self.compute_winner()
+        self.hash = compute_hash(self.board, self.current_player, self.next_valid_sub_board)
 
     def is_valid_move(self, move):
         # Check if the move is valid
@@ -40,20 +59,51 @@ class SuperTicTacToe:
         
         if self.next_valid_sub_board is not None and sub_board != self.next_valid_sub_board:
             return False
+        if sub_board not in self.open_sub_boards:
+            return False  # Sub-board is already won or full
         
         if self.board[row, col] == 0:
+            self.move_history.append((move, self.next_valid_sub_board, self.winner, self.hash))
+            previous_sub_board_key = sub_board_key(self.next_valid_sub_board)
             self.board[row, col] = self.current_player
+            self.empty_cells[sub_board].discard(move)
             self.update_sub_board_status(sub_board)
+
+            # The meta-board only changes when this sub-board was just decided
+            if self.sub_board_status[sub_board] != 0:
+                self.open_sub_boards.discard(sub_board)
+                self.winner = self.compute_winner()
+
             self.next_valid_sub_board = (row % 3) * 3 + (col % 3)
             
             # If the next sub-board is full or won, allow move in any sub-board
-            if self.sub_board_status[self.next_valid_sub_board] != 0:
+            if self.next_valid_sub_board not in self.open_sub_boards:
                 self.next_valid_sub_board = None
             
+            # Zobrist update: the new stone, the active sub-board and the side to move
+            self.hash ^= CELL_KEYS[move][player_index(self.current_player)] ^ SIDE_KEY
+            self.hash ^= previous_sub_board_key ^ sub_board_key(self.next_valid_sub_board)
             self.current_player = -self.current_player
             return True
         return False
 
+    def undo_move(self):
+        # Take back the last move made with make_move and return it
+        move, previous_next_valid_sub_board, previous_winner, self.hash = self.move_history.pop()
+        row, col = divmod(move, 9)
+        sub_board = (row // 3) * 3 + (col // 3)
+
+        self.board[row, col] = 0
+        self.empty_cells[sub_board].add(move)
+        if self.sub_board_status[sub_board] != 0:
+            # Only the move that decides a sub-board closes it, so undoing it reopens it
+            self.sub_board_status[sub_board] = 0
+            self.open_sub_boards.add(sub_board)
+        self.winner = previous_winner
+        self.next_valid_sub_board = previous_next_valid_sub_board
+        self.current_player = -self.current_player
+        return move
+
     def update_sub_board_status(self, sub_board):
         row_start = (sub_board // 3) * 3
         col_start = (sub_board % 3) * 3
@@ -72,43 +122,29 @@ class SuperTicTacToe:
             return
 
         # Check if the sub-board is full (tie)
-        if np.all(sub_board_array != 0):
+        if not self.empty_cells[sub_board]:
             self.sub_board_status[sub_board] = 3  # Use 3 to represent a tie
 
     def is_game_over(self):
-        # Check if the overall game is over based on the status of the 3x3 boards
-        meta_board = self.sub_board_status.reshape(3, 3)
-        for player in [1, -1]:
-            for i in range(3):
-                if np.all(meta_board[i, :] == player) or np.all(meta_board[:, i] == player):
-                    return True
-            if np.all(np.diag(meta_board) == player) or np.all(np.diag(np.fliplr(meta_board)) == player):
-                return True
-        
-        # Check for a tie (all sub-boards are filled)
-        if np.all(self.sub_board_status != 0):
-            return True
-        
-        return False
+        return self.winner is not None
 
     def get_valid_moves(self):
         if self.next_valid_sub_board is None:
-            valid_sub_boards = [i for i in range(9) if self.sub_board_status[i] == 0]
+            valid_sub_boards = sorted(self.open_sub_boards)
         else:
             valid_sub_boards = [self.next_valid_sub_board]
 
         valid_moves = []
         for sub_board in valid_sub_boards:
-            row_start = (sub_board // 3) * 3
-            col_start = (sub_board % 3) * 3
-            for i in range(3):
-                for j in range(3):
-                    move = (row_start + i) * 9 + (col_start + j)
-                    if self.board.flatten()[move] == 0:
-                        valid_moves.append(move)
+            empty_cells = self.empty_cells[sub_board]
+            valid_moves.extend(move for move in SUB_BOARD_MOVES[sub_board] if move in empty_cells)
         return valid_moves
 
     def get_winner(self):
+        return self.winner
+
+    def compute_winner(self):
+        # Full scan of the meta-board; make_move only calls this when a sub-board status changes
         meta_board = self.sub_board_status.reshape(3, 3)
         for player in [1, -1]:
             for i in range(3):
@@ -133,14 +169,25 @@ class BasicAI:
             return random.choice(valid_moves)
         return None
 
-def play_single_game_with_timeout(game_number, timeout=5):
+# Game engines that can drive self-play; they share the same public API
+ENGINES = {
+    'numpy': SuperTicTacToe,
+    'bitboard': BitboardSuperTicTacToe,
+}
+
+def play_single_game_with_timeout(game_number, timeout=5, game_class=SuperTicTacToe, verbose=True):
     starting_player = 1 if random.random() < 0.5 else -1
-    game = SuperTicTacToe(starting_player=starting_player)
+    game = game_class(starting_player=starting_player)
     ai1 = BasicAI(1)
     ai2 = BasicAI(-1)
     game_data = [(starting_player, None, None)]
     start_time = time.time()
     move_count = 0
+    # Phase timing only when instrumentation is enabled; otherwise one flag check per move
+    metrics = instrumentation.metrics
+    timed = metrics.enabled
+    game_start = time.perf_counter() if timed else 0.0
+    snapshot_time = 0.0
 
     try:
         while not game.is_game_over():
@@ -148,7 +195,11 @@ def play_single_game_with_timeout(game_number, timeout=5):
                 print(f"Game {game_number} timed out after {timeout} seconds and {move_count} moves.")
                 return None  # Return None for timed-out games
 
+            if timed:
+                snapshot_start = time.perf_counter()
             current_state = game.board.copy()
+            if timed:
+                snapshot_time += time.perf_counter() - snapshot_start
             move = ai1.choose_move(game) if game.current_player == 1 else ai2.choose_move(game)
             
             if move is None:
@@ -166,15 +217,81 @@ def play_single_game_with_timeout(game_number, timeout=5):
         final_state = game.board.copy()
         outcome = game.get_winner()
         game_data.append((outcome, final_state, None))
+        if timed:
+            metrics.add_time('worker.snapshot', snapshot_time)
+            metrics.add_time('worker.simulate', time.perf_counter() - game_start - snapshot_time)
 
-        print(f"Game {game_number} completed successfully with {move_count} moves. Outcome: {outcome}")
-        print(f"Game data length: {len(game_data)}, Last move: {game_data[-1]}")
+        if verbose:
+            with metrics.timer('worker.print'):
+                print(f"Game {game_number} completed successfully with {move_count} moves. Outcome: {outcome}")
+                print(f"Game data length: {len(game_data)}, Last move: {game_data[-1]}")
         return game_data
     except Exception as e:
         print(f"Error in game {game_number} after {move_count} moves:")
         print(traceback.format_exc())
         return None  # Return None for errored games
 
+def play_single_record_with_timeout(game_number, timeout=5, game_class=SuperTicTacToe, verbose=True):
+    # Same games as play_single_game_with_timeout (same RNG draws), but only the moves and
+    # outcome are kept: compact records rebuild every board from the moves, so copying the
+    # board on each ply would be wasted work
+    starting_player = 1 if random.random() < 0.5 else -1
+    game = game_class(starting_player=starting_player)
+    ai1 = BasicAI(1)
+    ai2 = BasicAI(-1)
+    moves = []
+    start_time = time.time()
+    metrics = instrumentation.metrics
+    game_start = time.perf_counter() if metrics.enabled else 0.0
+
+    try:
+        while not game.is_game_over():
+            if time.time() - start_time > timeout:
+                print(f"Game {game_number} timed out after {timeout} seconds and {len(moves)} moves.")
+                return None  # Return None for timed-out games
+
+            move = ai1.choose_move(game) if game.current_player == 1 else ai2.choose_move(game)
+
+            if move is None:
+                print(f"Game {game_number} ended after {len(moves)} moves: No valid moves available.")
+                break
+
+            if game.make_move(move):
+                moves.append(move)
+            else:
+                print(f"Game {game_number} ended after {len(moves)} moves: Invalid move.")
+                break
+
+        outcome = game.get_winner()
+        if metrics.enabled:
+            metrics.add_time('worker.simulate', time.perf_counter() - game_start)
+
+        if verbose:
+            with metrics.timer('worker.print'):
+                print(f"Game {game_number} completed successfully with {len(moves)} moves. Outcome: {outcome}")
+        return GameRecord(starting_player, moves, outcome)
+    except Exception as e:
+        print(f"Error in game {game_number} after {len(moves)} moves:")
+        print(traceback.format_exc())
+        return None  # Return None for errored games
+
+def play_batch_batched(pool, game_numbers):
+    # Split the batch into one contiguous chunk per worker and let each worker
+    # advance its chunk in lockstep with BatchedSuperTicTacToe
+    game_numbers = list(game_numbers)
+    chunk_size = max(1, -(-len(game_numbers) // cpu_count()))
+    chunks = [game_numbers[i:i + chunk_size] for i in range(0, len(game_numbers), chunk_size)]
+    results = instrumentation.collect(pool.map(instrumentation.task(play_records_batched), chunks))
+    return [record for chunk in results for record in chunk]
+
+def count_records(records):
+    # Game and move counters for a block of finished records
+    metrics = instrumentation.metrics
+    if metrics.enabled:
+        metrics.count('games', len(records))
+        metrics.count('games_timed_out', sum(record is None for record in records))
+        metrics.count('moves', sum(record.num_moves for record in records if record is not None))
+
 def save_checkpoint(batch_start, total_moves, file_count):
     checkpoint = {
         'batch_start': batch_start,
@@ -190,7 +307,21 @@ def load_checkpoint():
             return json.load(f)
     return None
 
-def generate_and_save_training_data(num_games=100000, batch_size=1000, game_timeout=5, batch_timeout=300):
+def start_instrumentation(metrics_dir, metrics_interval):
+    # Metrics exporter of the parent, or None when instrumentation is off
+    if metrics_dir is None:
+        return None
+    instrumentation.enable()
+    print(f"Writing metrics to {metrics_dir} every {metrics_interval:g} seconds")
+    return instrumentation.MetricsExporter(metrics_dir, metrics_interval)
+
+def generate_and_save_training_data(num_games=100000, batch_size=1000, game_timeout=5, batch_timeout=300, engine='numpy', backend='pool', record_format='compact',
+                                    metrics_dir=None, metrics_interval=10.0):
+    # Board snapshots are only needed for the legacy pickle format
+    play_function = play_single_game_with_timeout if record_format == 'pickle' else play_single_record_with_timeout
+    play_game = partial(play_function, timeout=game_timeout, game_class=ENGINES[engine])
+    exporter = start_instrumentation(metrics_dir, metrics_interval)
+    metrics = instrumentation.metrics
     checkpoint_file = 'training_data_checkpoint.json'
     
     # Load checkpoint if it exists
@@ -209,12 +340,22 @@ def generate_and_save_training_data(num_games=100000, batch_size=1000, game_time
         batch_start = 0
 
     try:
-        with Pool(processes=cpu_count()) as pool:
+        with Pool(processes=cpu_count(), initializer=instrumentation.init_worker,
+                  initargs=(exporter is not None, metrics_dir or '.')) as pool:
             for batch_start in range(batch_start, num_games, batch_size):
                 batch_end = min(batch_start + batch_size, num_games)
                 print(f"Generating games {batch_start+1}-{batch_end}")
                 
-                batch_data = pool.map(play_single_game_with_timeout, range(batch_start+1, batch_end+1))
+                with metrics.timer('parent.wait_results'):
+                    if backend == 'batched':
+                        batch_data = play_batch_batched(pool, range(batch_start+1, batch_end+1))
+                    else:
+                        games = instrumentation.collect(pool.map(instrumentation.task(play_game), range(batch_start+1, batch_end+1)))
+                        if record_format == 'pickle':
+                            batch_data = [GameRecord.from_game_data(game) if game else None for game in games]
+                        else:
+                            batch_data = games
+                count_records(batch_data)
                 
                 if batch_data:
                     # Count outcomes
@@ -223,20 +364,12 @@ def generate_and_save_training_data(num_games=100000, batch_size=1000, game_time
                     error_count = 0
                     valid_game_count = 0
                     
-                    for game in batch_data:
-                        if game is None:
+                    for record in batch_data:
+                        if record is None:
                             timeout_count += 1
-                        elif len(game) > 0:
-                            last_move = game[-1]
-                            if isinstance(last_move, tuple) and len(last_move) > 0:
-                                outcome = last_move[0]
-                                if outcome in [1, -1, 0]:
-                                    outcomes.append(outcome)
-                                    valid_game_count += 1
-                                else:
-                                    error_count += 1
-                            else:
-                                error_count += 1
+                        elif record.outcome in [1, -1, 0]:
+                            outcomes.append(record.outcome)
+                            valid_game_count += 1
                         else:
                             error_count += 1
                     
@@ -249,12 +382,20 @@ def generate_and_save_training_data(num_games=100000, batch_size=1000, game_time
                     print(f"Total games processed in this batch: {len(batch_data)}")
                     
                     # Save the batch data
-                    filename = f'super_tic_tac_toe_training_data_batch_{file_count}.pkl'
-                    print(f"Saving batch {file_count} to {filename}...")
-                    with open(filename, 'wb') as f:
-                        pickle.dump(batch_data, f)
+                    with metrics.timer('parent.write'):
+                        if record_format == 'pickle':
+                            filename = f'super_tic_tac_toe_training_data_batch_{file_count}.pkl'
+                            print(f"Saving batch {file_count} to {filename}...")
+                            with open(filename, 'wb') as f:
+                                pickle.dump([record.to_game_data() if record else None for record in batch_data], f)
+                        else:
+                            filename = BATCH_FILENAME.format(file_count)
+                            print(f"Saving batch {file_count} to {filename}...")
+                            write_records(filename, batch_data)
+                    if metrics.enabled:
+                        metrics.count('bytes_written', os.path.getsize(filename))
                     
-                    total_moves += sum(len(game) for game in batch_data if game is not None)
+                    total_moves += sum(record.num_moves for record in batch_data if record is not None)
                     total_games_processed += len(batch_data)
                     print(f"Batch {file_count} saved. Total moves so far: {total_moves}")
                     print(f"Total games processed so far: {total_games_processed}")
@@ -268,8 +409,12 @@ def generate_and_save_training_data(num_games=100000, batch_size=1000, game_time
                         'total_games_processed': total_games_processed,
                         'batch_start': batch_end
                     }
-                    with open(checkpoint_file, 'w') as f:
-                        json.dump(checkpoint, f)
+                    with metrics.timer('parent.checkpoint'):
+                        with open(checkpoint_file, 'w') as f:
+                            json.dump(checkpoint, f)
+
+                if exporter is not None:
+                    exporter.maybe_flush()
 
     except KeyboardInterrupt:
         print("Process interrupted. Progress saved in checkpoint file.")
@@ -278,6 +423,9 @@ def generate_and_save_training_data(num_games=100000, batch_size=1000, game_time
         print(f"An error occurred: {str(e)}")
         print("Progress saved in checkpoint file.")
         return total_moves, file_count, total_games_processed
+    finally:
+        if exporter is not None:
+            exporter.flush()
 
     # If we've completed successfully, remove the checkpoint file
     if os.path.exists(checkpoint_file):
@@ -286,13 +434,158 @@ def generate_and_save_training_data(num_games=100000, batch_size=1000, game_time
 
     return total_moves, file_count, total_games_processed
 
+SHARD_DIR = 'selfplay_shards'
+
+def shard_path(output_dir, chunk_id):
+    return os.path.join(output_dir, f'shard_{chunk_id:06d}{RECORD_EXTENSION}')
+
+def generate_shard(chunk_id, num_games, games_per_chunk, seed, output_dir, engine='bitboard', backend='pool',
+                   game_timeout=5, write_every=250, filename=None):
+    # Worker side of the sharded generator: play one chunk of games with this process's
+    # RNG seeded for the chunk, and write them to the chunk's own shard file (or to
+    # filename, e.g. a name unique to the machine when several share output_dir).
+    # A writer thread appends finished blocks while the next block is simulated.
+    chunk_start = chunk_id * games_per_chunk
+    chunk_end = min(chunk_start + games_per_chunk, num_games)
+    chunk_seed = seed * 1000003 + chunk_id
+    random.seed(chunk_seed)
+    rng = np.random.default_rng(chunk_seed)
+    play_game = partial(play_single_record_with_timeout, timeout=game_timeout,
+                        game_class=ENGINES[engine], verbose=False)
+
+    filename = filename or shard_path(output_dir, chunk_id)
+    temp_filename = filename + '.tmp'
+    blocks = queue.Queue(maxsize=4)
+    metrics = instrumentation.metrics
+
+    def write_blocks():
+        with RecordWriter(temp_filename) as writer:
+            for block in iter(blocks.get, None):
+                with metrics.timer('worker.write'):
+                    writer.write_all(block)
+
+    writer_thread = threading.Thread(target=write_blocks, daemon=True)
+    writer_thread.start()
+
+    summary = {'chunk_id': chunk_id, 'games': 0, 'moves': 0, 'outcomes': {1: 0, -1: 0, 0: 0},
+               'timed_out': 0, 'errored': 0}
+    start_time = time.time()
+    try:
+        for block_start in range(chunk_start + 1, chunk_end + 1, write_every):
+            game_numbers = range(block_start, min(block_start + write_every, chunk_end + 1))
+            if backend == 'batched':
+                records = play_records_batched(game_numbers, seed=rng.integers(2**63))
+            else:
+                records = [play_game(game_number) for game_number in game_numbers]
+
+            for record in records:
+                if record is None:
+                    summary['timed_out'] += 1
+                elif record.outcome in (1, -1, 0):
+                    summary['outcomes'][record.outcome] += 1
+                    summary['moves'] += record.num_moves
+                else:
+                    summary['errored'] += 1
+                    summary['moves'] += record.num_moves
+            summary['games'] += len(records)
+            count_records(records)
+            with metrics.timer('worker.queue_wait'):  # Blocks only when the writer falls behind
+                blocks.put(records)
+    finally:
+        blocks.put(None)
+        writer_thread.join()
+
+    # The shard only gets its final name once complete, so a resumed run can trust it
+    os.replace(temp_filename, filename)
+    if metrics.enabled:
+        metrics.count('bytes_written', os.path.getsize(filename))
+    summary['seconds'] = time.time() - start_time
+    return summary
+
+def generate_sharded_training_data(num_games=100000, games_per_chunk=1000, seed=0, output_dir=SHARD_DIR,
+                                   engine='bitboard', backend='pool', game_timeout=5, processes=None,
+                                   metrics_dir=None, metrics_interval=10.0):
+    # Every worker writes its own shards; the parent only collects small summaries
+    # in completion order, so one slow chunk never holds up the others
+    os.makedirs(output_dir, exist_ok=True)
+    num_chunks = -(-num_games // games_per_chunk)
+    pending = [chunk_id for chunk_id in range(num_chunks) if not os.path.exists(shard_path(output_dir, chunk_id))]
+    if len(pending) < num_chunks:
+        print(f"Resuming: {num_chunks - len(pending)} of {num_chunks} shards already exist in {output_dir}")
+
+    make_shard = partial(generate_shard, num_games=num_games, games_per_chunk=games_per_chunk, seed=seed,
+                         output_dir=output_dir, engine=engine, backend=backend, game_timeout=game_timeout)
+    total_moves = 0
+    total_games = 0
+    outcome_counts = {1: 0, -1: 0, 0: 0}
+    timed_out = 0
+    errored = 0
+    start_time = time.time()
+    exporter = start_instrumentation(metrics_dir, metrics_interval)
+
+    # Worker metrics arrive with each finished shard, so smaller chunks give finer updates
+    with Pool(processes=processes or cpu_count(), initializer=instrumentation.init_worker,
+              initargs=(exporter is not None, metrics_dir or '.')) as pool:
+        results = pool.imap_unordered(instrumentation.task(make_shard), pending)
+        for result in tqdm(instrumentation.timed_iter(results, 'parent.wait_results'), total=len(pending),
+                           desc="Generating shards"):
+            summary = instrumentation.collect_one(result)
+            if exporter is not None:
+                exporter.maybe_flush()
+            total_moves += summary['moves']
+            total_games += summary['games']
+            timed_out += summary['timed_out']
+            errored += summary['errored']
+            for outcome, count in summary['outcomes'].items():
+                outcome_counts[outcome] += count
+
+    if exporter is not None:
+        exporter.flush()
+    elapsed = time.time() - start_time
+    print(f"Outcomes: {outcome_counts}")
+    print(f"Timed out games: {timed_out}")
+    print(f"Errored games: {errored}")
+    if elapsed > 0:
+        print(f"Generated {total_games} games in {elapsed:.2f} seconds ({total_games / elapsed:.0f} games/sec)")
+    return total_moves, len(pending), total_games
+
 # Make sure this is wrapped in if __name__ == '__main__':
 if __name__ == '__main__':
     from multiprocessing import freeze_support
     freeze_support()
 
+    import argparse
+    parser = argparse.ArgumentParser(description='Generate Super Tic-Tac-Toe self-play training data')
+    parser.add_argument('--num-games', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='bitboard',
+                        help='Game engine used by the per-object pool backend')
+    parser.add_argument('--backend', choices=['pool', 'batched'], default='pool',
+                        help="'pool' plays one game object per task, 'batched' steps many games at once per worker")
+    parser.add_argument('--format', choices=['compact', 'pickle'], default='compact',
+                        help="'compact' writes move-sequence .stt records, 'pickle' the legacy board snapshots")
+    parser.add_argument('--sharded', action='store_true',
+                        help='Let every worker write its own shard files instead of sending batches to the parent')
+    parser.add_argument('--games-per-chunk', type=int, default=1000, help='Games per shard in --sharded mode')
+    parser.add_argument('--seed', type=int, default=0, help='Base seed of the per-chunk RNGs in --sharded mode')
+    parser.add_argument('--output-dir', default=SHARD_DIR, help='Shard directory in --sharded mode')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--metrics-dir', default=None,
+                        help='Enable instrumentation and write JSON-lines and Prometheus metrics to this directory')
+    parser.add_argument('--metrics-interval', type=float, default=10.0, help='Seconds between metrics writes')
+    args = parser.parse_args()
+
     start_time = time.time()
-    total_moves, num_files, total_games = generate_and_save_training_data(100000, game_timeout=5, batch_timeout=300)
+    if args.sharded:
+        total_moves, num_files, total_games = generate_sharded_training_data(
+            args.num_games, games_per_chunk=args.games_per_chunk, seed=args.seed, output_dir=args.output_dir,
+            engine=args.engine, backend=args.backend, game_timeout=5, processes=args.processes,
+            metrics_dir=args.metrics_dir, metrics_interval=args.metrics_interval)
+    else:
+        total_moves, num_files, total_games = generate_and_save_training_data(
+            args.num_games, batch_size=args.batch_size, game_timeout=5, batch_timeout=300,
+            engine=args.engine, backend=args.backend, record_format=args.format,
+            metrics_dir=args.metrics_dir, metrics_interval=args.metrics_interval)
 
     print(f"Training data generation complete! Time taken: {time.time() - start_time:.2f} seconds")
     print(f"Total moves recorded: {total_moves}")
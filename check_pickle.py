@@ -1,9 +1,10 @@
-import pickle
 import numpy as np
 from tqdm import tqdm
 import multiprocessing as mp
 from collections import Counter
 
+from game_record import GameRecord, load_records, COMBINED_FILENAME
+
 def check_move_validity(prev_move, current_move, board):
     if prev_move is None:
         return True, "Valid move (first move)"
@@ -35,6 +36,9 @@ def check_sub_board_win(sub_board):
     return False
 
 def analyze_game(game_data):
+    if isinstance(game_data, GameRecord):
+        game_data = game_data.to_game_data()  # Replay the moves to get the board before each one
+
     valid_moves = 0
     invalid_moves = 0
     invalid_move_reasons = []
@@ -93,8 +97,7 @@ def analyze_dataset_parallel(training_data, num_processes):
 
 if __name__ == '__main__':
     try:
-        with open('super_tic_tac_toe_training_data_combined.pkl', 'rb') as f:
-            training_data = pickle.load(f)
+        training_data = load_records(COMBINED_FILENAME)
 
         print(f"Total number of items in the dataset: {len(training_data)}")
         
@@ -1,40 +1,70 @@
-import pickle
 import os
 from tqdm import tqdm
 
-def combine_batch_files(num_files, output_filename='super_tic_tac_toe_training_data_combined.pkl'):
+from game_record import RecordWriter, read_records, records_from_pickle, BATCH_FILENAME, COMBINED_FILENAME
+from game_store import GameStore, ingest_files, STORE_PATH
+
+def combine_batch_files(num_files, output_filename=COMBINED_FILENAME):
     print("Combining batch files into a single file...")
-    combined_data = []
     total_moves = 0
     total_games = 0
 
-    for i in tqdm(range(num_files), desc="Processing batches"):
-        filename = f'super_tic_tac_toe_training_data_batch_{i}.pkl'
-        if os.path.exists(filename):
-            with open(filename, 'rb') as f:
-                batch_data = pickle.load(f)
-                combined_data.extend(batch_data)
-                total_games += len(batch_data)
-                total_moves += sum(len(game) for game in batch_data if game is not None)
+    # Batches are appended one at a time, so only a single batch is in memory
+    with RecordWriter(output_filename) as writer:
+        for i in tqdm(range(num_files), desc="Processing batches"):
+            filename = BATCH_FILENAME.format(i)
+            legacy_filename = f'super_tic_tac_toe_training_data_batch_{i}.pkl'
+            if os.path.exists(filename):
+                batch_data = read_records(filename)
+            elif os.path.exists(legacy_filename):
+                filename = legacy_filename
+                batch_data = records_from_pickle(filename)
+            else:
+                print(f"Warning: {filename} not found. Skipping.")
+                continue
+
+            writer.write_all(batch_data)
+            total_games += len(batch_data)
+            total_moves += sum(record.num_moves for record in batch_data if record is not None)
             os.remove(filename)  # Remove the batch file after combining
-        else:
-            print(f"Warning: {filename} not found. Skipping.")
 
-    print(f"Saving combined data to {output_filename}...")
-    with open(output_filename, 'wb') as f:
-        pickle.dump(combined_data, f)
-    
     print("Combined file saved successfully!")
     print(f"Total games in combined data: {total_games}")
     print(f"Total moves in combined data: {total_moves}")
     return total_games, total_moves
 
+def combine_into_store(num_files, store_path=STORE_PATH):
+    # Append every batch to the indexed game store instead of a single combined file
+    filenames = []
+    for i in range(num_files):
+        filename = BATCH_FILENAME.format(i)
+        legacy_filename = f'super_tic_tac_toe_training_data_batch_{i}.pkl'
+        if os.path.exists(filename):
+            filenames.append(filename)
+        elif os.path.exists(legacy_filename):
+            filenames.append(legacy_filename)
+        else:
+            print(f"Warning: {filename} not found. Skipping.")
+
+    print(f"Appending {len(filenames)} batch files to the game store {store_path}...")
+    total_games, total_moves = ingest_files(store_path, tqdm(filenames, desc="Processing batches"), remove=True)
+    print(f"Game store now holds {len(GameStore(store_path))} games")
+    return total_games, total_moves
+
 if __name__ == '__main__':
-    num_files = 100  # The number of batch files you generated
-    output_filename = 'super_tic_tac_toe_training_data_combined.pkl'
+    import argparse
+    parser = argparse.ArgumentParser(description='Combine self-play batch files')
+    parser.add_argument('--num-files', type=int, default=100, help='The number of batch files you generated')
+    parser.add_argument('--store', action='store_true', help='Append to the indexed game store instead of one combined file')
+    args = parser.parse_args()
 
-    total_games, total_moves = combine_batch_files(num_files, output_filename)
+    if args.store:
+        total_games, total_moves = combine_into_store(args.num_files)
+        output_filename = STORE_PATH
+    else:
+        output_filename = COMBINED_FILENAME
+        total_games, total_moves = combine_batch_files(args.num_files, output_filename)
 
-    print(f"All data combined into a single file: {output_filename}")
+    print(f"All data combined into: {output_filename}")
     print(f"Total games in combined data: {total_games}")
     print(f"Total moves in combined data: {total_moves}")
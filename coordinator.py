@@ -0,0 +1,347 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from multiprocessing import get_context
+
+from buildai import ENGINES, generate_shard
+from game_record import RECORD_EXTENSION
+
+# Self-play spread over several machines. One coordinator owns the run: it splits the
+# game IDs into fixed ranges, leases them to workers over TCP and records finished
+# ranges in a manifest next to the shards. Workers write one uniquely named shard per
+# range into the shared output directory and report back. A lease that is not renewed
+# in time goes back to the queue, so ranges held by a crashed machine are reissued;
+# if two workers end up finishing the same range, the first report wins and the other
+# shard is deleted. Restarting the coordinator resumes from the manifest.
+#
+#   python coordinator.py coordinator --num-games 1000000 --output-dir /shared/run1
+#   python coordinator.py worker --host coordinator-host        # on every machine
+#   python coordinator.py coordinator --num-games 20000 --local-workers 4   # one box
+#
+# Game content depends only on the seed and the range, exactly as with
+# buildai.py --sharded, so a reissued range produces the same games.
+#
+# Each connection carries one request and one reply, each a single line holding an
+# HMAC-SHA256 signature and a JSON object; nothing received is ever unpickled. The
+# coordinator listens on 127.0.0.1 unless --host says otherwise, and refuses any other
+# address unless a shared secret is given with --authkey or STT_AUTHKEY; every machine
+# then needs the same secret, and messages with a wrong signature are dropped.
+#
+#   STT_AUTHKEY=<secret> python coordinator.py coordinator --host 0.0.0.0
+
+DEFAULT_PORT = 6150
+AUTHKEY_ENV = 'STT_AUTHKEY'
+COORDINATOR_DIR = 'distributed_shards'
+MANIFEST_FILENAME = 'manifest.json'
+LEASE_SECONDS = 300.0
+CONNECTION_TIMEOUT = 30.0
+MAX_MESSAGE_BYTES = 1 << 20
+
+
+def resolve_authkey(authkey=None):
+    # The explicit key, else STT_AUTHKEY, as bytes; None when neither is set
+    authkey = authkey if authkey is not None else os.environ.get(AUTHKEY_ENV)
+    if not authkey:
+        return None
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+def is_loopback(host):
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+def sign(body, authkey):
+    return hmac.new(authkey, body, hashlib.sha256).hexdigest().encode() if authkey else b'-'
+
+
+def send_message(connection, message, authkey):
+    body = json.dumps(message).encode()
+    connection.sendall(sign(body, authkey) + b' ' + body + b'\n')
+
+
+def recv_message(connection, authkey):
+    with connection.makefile('rb') as reader:
+        line = reader.readline(MAX_MESSAGE_BYTES)
+    if not line.endswith(b'\n'):
+        raise EOFError('Connection closed before a complete message arrived')
+    signature, _, body = line[:-1].partition(b' ')
+    if not hmac.compare_digest(signature, sign(body, authkey)):
+        raise ValueError('Message signature does not match; check the authkey')
+    message = json.loads(body)
+    if not isinstance(message, dict):
+        raise ValueError('Expected a JSON object')
+    return message
+
+
+def range_shard_path(output_dir, start, stop, worker):
+    return os.path.join(output_dir, f'games_{start:010d}_{stop:010d}_{worker}{RECORD_EXTENSION}')
+
+
+def load_manifest(path, config):
+    if not os.path.exists(path):
+        return {'config': config, 'done': {}}
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    if manifest['config'] != config:
+        raise ValueError(f"{path} belongs to a run with different settings: {manifest['config']}")
+    return manifest
+
+
+def save_manifest(manifest, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+class Coordinator:
+    def __init__(self, num_games, range_size=1000, seed=0, output_dir=COORDINATOR_DIR, engine='bitboard',
+                 backend='pool', lease_seconds=LEASE_SECONDS):
+        os.makedirs(output_dir, exist_ok=True)
+        self.config = {'num_games': num_games, 'range_size': range_size, 'seed': seed, 'engine': engine,
+                       'backend': backend}
+        self.output_dir = output_dir
+        self.lease_seconds = lease_seconds
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.manifest = load_manifest(self.manifest_path, self.config)
+        # Ranges are keyed by their first game ID (0-based, as a string in the manifest)
+        self.pending = deque(start for start in range(0, num_games, range_size)
+                             if str(start) not in self.manifest['done'])
+        self.leases = {}  # lease_id -> {'start', 'stop', 'worker', 'expires'}
+        self.next_lease_id = 0
+        self.start_time = time.time()
+        self.games_this_run = 0
+        self.worker_games = {}
+
+    @property
+    def finished(self):
+        return not self.pending and not self.leases
+
+    def expire_leases(self):
+        now = time.time()
+        for lease_id, lease in list(self.leases.items()):
+            if lease['expires'] < now:
+                print(f"Lease {lease_id} on games {lease['start']}-{lease['stop']} held by {lease['worker']} "
+                      f"expired; reissuing")
+                del self.leases[lease_id]
+                self.pending.appendleft(lease['start'])
+
+    def lease(self, worker):
+        self.expire_leases()
+        if not self.pending:
+            if not self.leases:
+                return {'done': True}
+            # Everything is leased; ask the worker to come back in case a lease expires
+            next_expiry = min(lease['expires'] for lease in self.leases.values())
+            return {'wait': min(max(next_expiry - time.time(), 0.5), 2.0)}
+        start = self.pending.popleft()
+        stop = min(start + self.config['range_size'], self.config['num_games'])
+        lease_id = self.next_lease_id
+        self.next_lease_id += 1
+        self.leases[lease_id] = {'start': start, 'stop': stop, 'worker': worker,
+                                 'expires': time.time() + self.lease_seconds}
+        return {'lease_id': lease_id, 'start': start, 'stop': stop, 'lease_seconds': self.lease_seconds,
+                'output_dir': self.output_dir, **self.config}
+
+    def renew(self, lease_id):
+        lease = self.leases.get(lease_id)
+        if lease is None:
+            return {'ok': False}
+        lease['expires'] = time.time() + self.lease_seconds
+        return {'ok': True}
+
+    def complete(self, message):
+        lease = self.leases.pop(message['lease_id'], None)
+        start = message['start']
+        if str(start) in self.manifest['done']:
+            return {'accepted': False}  # Finished by another worker after a reissue
+        if lease is None:
+            # The lease expired but nobody has finished the range yet: take this result
+            if start in self.pending:
+                self.pending.remove(start)
+            for lease_id, other in list(self.leases.items()):
+                if other['start'] == start:
+                    del self.leases[lease_id]
+        self.manifest['done'][str(start)] = {
+            'stop': message['stop'], 'shard': os.path.basename(message['shard']), 'worker': message['worker'],
+            'games': message['games'], 'moves': message['moves'], 'outcomes': message['outcomes'],
+            'seconds': message['seconds'], 'completed_at': time.time(),
+        }
+        save_manifest(self.manifest, self.manifest_path)
+        self.games_this_run += message['games']
+        self.worker_games[message['worker']] = self.worker_games.get(message['worker'], 0) + message['games']
+        done = len(self.manifest['done'])
+        total = -(-self.config['num_games'] // self.config['range_size'])
+        elapsed = time.time() - self.start_time
+        print(f"{done}/{total} ranges done; games {start}-{message['stop']} by {message['worker']} "
+              f"({self.games_this_run / elapsed:.0f} games/sec overall)")
+        return {'accepted': True}
+
+    def handle(self, message):
+        kind = message.get('type')
+        if kind == 'lease':
+            return self.lease(message['worker'])
+        if kind == 'renew':
+            return self.renew(message['lease_id'])
+        if kind == 'complete':
+            return self.complete(message)
+        return {'error': f"Unknown request type {kind!r}"}
+
+    def serve(self, server, authkey=None):
+        # One short request per connection, handled in order, until every range is done
+        while not self.finished:
+            try:
+                connection, _ = server.accept()
+                with connection:
+                    connection.settimeout(CONNECTION_TIMEOUT)
+                    send_message(connection, self.handle(recv_message(connection, authkey)), authkey)
+            except (EOFError, OSError) as e:
+                print(f"Dropped a worker connection: {e}")
+            except Exception as e:  # A bad signature or a malformed request
+                print(f"Rejected a connection: {e!r}")
+
+
+def request(address, authkey, message):
+    with socket.create_connection(address, timeout=CONNECTION_TIMEOUT) as connection:
+        send_message(connection, message, authkey)
+        return recv_message(connection, authkey)
+
+
+def keep_lease(address, authkey, lease_id, interval, stop_event):
+    # Heartbeat thread: renew the lease until the range is finished
+    while not stop_event.wait(interval):
+        try:
+            request(address, authkey, {'type': 'renew', 'lease_id': lease_id})
+        except (OSError, EOFError):
+            pass
+
+
+def run_worker(address, authkey=None, output_dir=None, worker=None):
+    # Lease ranges and play them until the coordinator reports the run is complete or
+    # goes away. output_dir overrides the coordinator's path, for a share mounted elsewhere.
+    authkey = resolve_authkey(authkey)
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    games = 0
+    start_time = time.time()
+    while True:
+        try:
+            lease = request(address, authkey, {'type': 'lease', 'worker': worker})
+        except (ConnectionRefusedError, ConnectionResetError):
+            break  # Coordinator finished and closed its listener
+        except EOFError:
+            print("Coordinator closed the connection without a reply; is the authkey the same on both ends?")
+            break
+        if lease.get('done'):
+            break
+        if 'wait' in lease:
+            time.sleep(lease['wait'])
+            continue
+
+        shard_dir = output_dir or lease['output_dir']
+        filename = range_shard_path(shard_dir, lease['start'], lease['stop'], worker)
+        range_size = lease['range_size']
+        stop_event = threading.Event()
+        heartbeat = threading.Thread(target=keep_lease, daemon=True,
+                                     args=(address, authkey, lease['lease_id'], lease['lease_seconds'] / 3,
+                                           stop_event))
+        heartbeat.start()
+        try:
+            summary = generate_shard(lease['start'] // range_size, lease['num_games'], range_size, lease['seed'],
+                                     shard_dir, engine=lease['engine'], backend=lease['backend'],
+                                     filename=filename)
+        finally:
+            stop_event.set()
+            heartbeat.join()
+
+        report = {'type': 'complete', 'lease_id': lease['lease_id'], 'start': lease['start'], 'stop': lease['stop'],
+                  'worker': worker, 'shard': filename, 'games': summary['games'], 'moves': summary['moves'],
+                  'outcomes': summary['outcomes'], 'seconds': summary['seconds']}
+        try:
+            accepted = request(address, authkey, report)['accepted']
+        except (ConnectionRefusedError, ConnectionResetError, EOFError):
+            accepted = False  # The run completed without this range, so it was a duplicate
+        if not accepted:
+            os.remove(filename)
+        else:
+            games += summary['games']
+    elapsed = time.time() - start_time
+    print(f"Worker {worker} played {games} games in {elapsed:.1f} seconds")
+
+
+def run_coordinator(num_games, range_size=1000, seed=0, output_dir=COORDINATOR_DIR, engine='bitboard', backend='pool',
+                    lease_seconds=LEASE_SECONDS, host='127.0.0.1', port=DEFAULT_PORT, authkey=None,
+                    local_workers=0):
+    # Serve leases until the run is complete; local_workers starts that many worker
+    # processes on this machine, standing in for separate nodes
+    authkey = resolve_authkey(authkey)
+    if authkey is None and not is_loopback(host):
+        raise ValueError(f"Refusing to listen on {host} without a shared secret; "
+                         f"pass --authkey or set {AUTHKEY_ENV}")
+    coordinator = Coordinator(num_games, range_size, seed, output_dir, engine, backend, lease_seconds)
+    if coordinator.finished:
+        print(f"All ranges in {coordinator.manifest_path} are already done")
+        return coordinator
+    workers = []
+    with socket.create_server((host, port)) as server:
+        port = server.getsockname()[1]
+        print(f"Coordinator listening on {host}:{port}; {len(coordinator.pending)} ranges to play")
+        address = ('127.0.0.1' if is_loopback(host) or host in ('', '0.0.0.0') else host, port)
+        # Spawned, not forked: a forked child would inherit the listening socket and keep
+        # connections to it open after the coordinator closes it
+        context = get_context('spawn')
+        for i in range(local_workers):
+            process = context.Process(target=run_worker, args=(address, authkey), kwargs={'worker': f"local{i}"})
+            process.start()
+            workers.append(process)
+        coordinator.serve(server, authkey)
+    elapsed = time.time() - coordinator.start_time
+    for process in workers:
+        process.join()
+
+    print(f"Run complete: {coordinator.games_this_run} games in {elapsed:.2f} seconds "
+          f"({coordinator.games_this_run / elapsed:.0f} games/sec)")
+    for worker, games in sorted(coordinator.worker_games.items()):
+        print(f"  {worker}: {games} games")
+    return coordinator
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Coordinate self-play across machines by leasing game ID ranges')
+    parser.add_argument('role', choices=['coordinator', 'worker'])
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="Coordinator: interface to listen on; anything but loopback needs an authkey. "
+                             "Worker: the coordinator's host")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--authkey', default=None,
+                        help=f"Shared secret used to sign every message (default ${AUTHKEY_ENV}); "
+                             "must match on all machines")
+    parser.add_argument('--output-dir', default=None,
+                        help=f"Shared shard directory (coordinator default {COORDINATOR_DIR}); "
+                             "workers default to the coordinator's path")
+    parser.add_argument('--num-games', type=int, default=100000)
+    parser.add_argument('--range-size', type=int, default=1000, help='Games per lease and shard')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='bitboard')
+    parser.add_argument('--backend', choices=['pool', 'batched'], default='pool')
+    parser.add_argument('--lease-seconds', type=float, default=LEASE_SECONDS,
+                        help='Ranges not renewed for this long are given to another worker')
+    parser.add_argument('--local-workers', type=int, default=0,
+                        help='Worker processes to start alongside the coordinator')
+    args = parser.parse_args()
+
+    if args.role == 'coordinator':
+        run_coordinator(args.num_games, args.range_size, args.seed, args.output_dir or COORDINATOR_DIR, args.engine,
+                        args.backend, args.lease_seconds, args.host, args.port, args.authkey, args.local_workers)
+    else:
+        run_worker((args.host, args.port), args.authkey, args.output_dir)
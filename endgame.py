@@ -0,0 +1,192 @@
+import copy
+import sqlite3
+import time
+from collections import OrderedDict
+
+from bitboard import BitboardSuperTicTacToe
+from buildai import SuperTicTacToe
+
+# Exact endgame solver. Once few enough empty cells remain in the open sub-boards,
+# the game tree is searched to the end and every position gets its game-theoretic
+# result for the side to move: 1 win, 0 draw, -1 loss. Results are memoized by
+# Zobrist hash in an in-memory LRU cache backed by an SQLite table, so solved
+# positions survive restarts and are shared by every process using the same file.
+
+CACHE_DB_PATH = 'endgame_cache.sqlite'
+FLUSH_EVERY = 5000  # New results buffered before they are written to the database
+
+
+class SolveTimeout(Exception):
+    pass
+
+
+def signed_key(h):
+    # SQLite integers are signed 64-bit
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+class EndgameSolver:
+    def __init__(self, threshold=10, cache_size=200000, db_path=CACHE_DB_PATH):
+        self.threshold = threshold  # Solve when at most this many empty cells remain in open sub-boards
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.db = None
+        self.pending = []
+        if db_path is not None:
+            self.db = sqlite3.connect(db_path, timeout=30)
+            self.db.execute('CREATE TABLE IF NOT EXISTS results (key INTEGER PRIMARY KEY, value INTEGER NOT NULL)')
+            self.db.commit()
+        self.deadline = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.solves = 0
+        self.last_solve_time = 0.0
+        self.total_solve_time = 0.0
+
+    def remaining_cells(self, game):
+        if not isinstance(game, SuperTicTacToe):
+            game = BitboardSuperTicTacToe.from_game(game).to_game(SuperTicTacToe)
+        return sum(len(game.empty_cells[sub_board]) for sub_board in game.open_sub_boards)
+
+    def can_solve(self, game):
+        return game.get_winner() is None and self.remaining_cells(game) <= self.threshold
+
+    def lookup(self, h):
+        value = self.cache.get(h)
+        if value is not None:
+            self.cache.move_to_end(h)
+            self.memory_hits += 1
+            return value
+        if self.db is not None:
+            row = self.db.execute('SELECT value FROM results WHERE key = ?', (signed_key(h),)).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                self.remember(h, row[0])
+                return row[0]
+        self.misses += 1
+        return None
+
+    def remember(self, h, value):
+        self.cache[h] = value
+        self.cache.move_to_end(h)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def store(self, h, value):
+        self.remember(h, value)
+        if self.db is not None:
+            self.pending.append((signed_key(h), value))
+            if len(self.pending) >= FLUSH_EVERY:
+                self.flush()
+
+    def flush(self):
+        if self.db is not None and self.pending:
+            self.db.executemany('INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)', self.pending)
+            self.db.commit()
+            self.pending = []
+
+    def negamax(self, game):
+        winner = game.winner
+        if winner is not None:
+            return 0 if winner == 0 else -1  # The previous mover decided the game
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SolveTimeout()
+
+        h = game.hash
+        value = self.lookup(h)
+        if value is not None:
+            return value
+
+        best = -1
+        for move in game.get_valid_moves():
+            game.make_move(move)
+            score = -self.negamax(game)
+            game.undo_move()
+            if score > best:
+                best = score
+                if best == 1:
+                    break  # A win cannot be improved on, so the value is still exact
+        self.store(h, best)
+        return best
+
+    def solve(self, game, deadline=None):
+        # (result for the side to move, best move); raises SolveTimeout past the deadline
+        state = copy.deepcopy(game) if isinstance(game, SuperTicTacToe) else \
+            BitboardSuperTicTacToe.from_game(game).to_game(SuperTicTacToe)
+        self.deadline = deadline
+        start_time = time.perf_counter()
+        try:
+            best_move = None
+            best = -2
+            for move in state.get_valid_moves():
+                state.make_move(move)
+                score = -self.negamax(state)
+                state.undo_move()
+                if score > best:
+                    best = score
+                    best_move = move
+                    if best == 1:
+                        break
+        finally:
+            self.last_solve_time = time.perf_counter() - start_time
+            self.total_solve_time += self.last_solve_time
+            self.deadline = None
+        self.solves += 1
+        return best, best_move
+
+    def choose_move(self, game, deadline=None):
+        # Exact best move, or None when the position has too many empty cells to solve
+        if not self.can_solve(game):
+            return None
+        return self.solve(game, deadline)[1]
+
+    def hit_rate(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'solves': self.solves,
+            'last_solve_time': self.last_solve_time,
+            'total_solve_time': self.total_solve_time,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate(),
+            'cached_positions': len(self.cache),
+        }
+
+    def close(self):
+        self.flush()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+if __name__ == '__main__':
+    import argparse
+    import random
+
+    parser = argparse.ArgumentParser(description='Solve random late-game positions and report cache statistics')
+    parser.add_argument('--positions', type=int, default=20)
+    parser.add_argument('--threshold', type=int, default=10)
+    parser.add_argument('--db', default=CACHE_DB_PATH)
+    args = parser.parse_args()
+
+    solver = EndgameSolver(threshold=args.threshold, db_path=args.db)
+    solved = 0
+    while solved < args.positions:
+        # Play random moves until the position is small enough to solve
+        game = SuperTicTacToe(starting_player=random.choice([1, -1]))
+        while not game.is_game_over() and not solver.can_solve(game):
+            game.make_move(random.choice(game.get_valid_moves()))
+        if game.is_game_over():
+            continue
+        result, move = solver.solve(game)
+        solved += 1
+        print(f"Position {solved}: {solver.remaining_cells(game)} empty cells, result {result:+d} "
+              f"with move {move} in {solver.last_solve_time * 1000:.1f} ms")
+    solver.close()
+    print(f"Endgame solver: {solver.stats()}")
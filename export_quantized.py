@@ -0,0 +1,243 @@
+import copy
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+
+from numpy_model import NumpyPolicy, TFJS_MODEL_DIR, dense_layers, load_tfjs_weights
+
+# Post-training export of smaller variants of the policy network, run after training.py.
+# Kernels are quantized to 8 bits with the affine scheme of the tfjs converter
+# (value = q * scale + min, with zero exactly representable), optionally after magnitude
+# pruning. Each variant is written twice: as a tfjs graph model that reuses the topology
+# of the float export, and as a compressed .npz for numpy_model.NumpyPolicy.from_npz.
+# tfjs only supports one scale and min per tensor; the .npz keeps one per kernel row,
+# so a few large weights (often those of dead hidden units) cost precision only in
+# their own row. Biases are tiny and stay float32.
+
+MODEL_DIR = 'super_tic_tac_toe_model'
+PREPROCESSED_DIR = 'preprocessed'
+REPORT_PATH = 'quantization_report.json'
+BATCH_SIZES = (1, 16, 256)
+
+
+def load_float_layers(source):
+    # [(kernel, bias)] from a tfjs export directory or a SavedModel (which needs TensorFlow)
+    if os.path.exists(os.path.join(source, 'model.json')):
+        return dense_layers(load_tfjs_weights(source))
+    import tensorflow as tf
+    variables = {v.name.split(':')[0]: v.numpy() for v in tf.saved_model.load(source).variables}
+    names = sorted({name.split('/')[0] for name in variables if name.endswith('/kernel')},
+                   key=lambda layer: int(layer.rsplit('_', 1)[1]) if '_' in layer else 0)
+    return [(variables[f"{layer}/kernel"], variables[f"{layer}/bias"]) for layer in names]
+
+
+def prune(kernel, sparsity):
+    # Zero the smallest-magnitude fraction of the weights
+    if sparsity <= 0:
+        return kernel
+    threshold = np.quantile(np.abs(kernel), sparsity)
+    return np.where(np.abs(kernel) <= threshold, 0, kernel).astype(kernel.dtype)
+
+
+def quantize(values, bits=8, per_row=False):
+    # (q as uint8, scale, min); the range is nudged so 0.0 maps to an integer exactly.
+    # per_row gives each row of a kernel its own scale and min, as (rows, 1) arrays.
+    axis = 1 if per_row else None
+    low = np.minimum(values.min(axis=axis, keepdims=per_row), 0.0).astype(np.float64)
+    high = np.maximum(values.max(axis=axis, keepdims=per_row), 0.0).astype(np.float64)
+    levels = (1 << bits) - 1
+    scale = np.where(high > low, (high - low) / levels, 1.0)
+    low = -np.round(-low / scale) * scale
+    q = np.clip(np.round((values - low) / scale), 0, levels).astype(np.uint8)
+    return q, scale.astype(np.float32), low.astype(np.float32)
+
+
+def save_npz(path, quantized_layers):
+    arrays = {}
+    for i, (q, scale, low, bias) in enumerate(quantized_layers):
+        arrays[f"layer{i}_kernel_q"] = q
+        arrays[f"layer{i}_kernel_scale"] = scale
+        arrays[f"layer{i}_kernel_min"] = low
+        arrays[f"layer{i}_bias"] = bias.astype(np.float32)
+    np.savez_compressed(path, **arrays)
+
+
+def save_tfjs(output_dir, quantized_layers, template_dir=TFJS_MODEL_DIR):
+    # Rewrite the template's weights manifest with quantized kernels; other weights are copied
+    with open(os.path.join(template_dir, 'model.json'), 'r') as f:
+        model = json.load(f)
+    template_weights = load_tfjs_weights(template_dir)
+    layer_names = {}
+    for name in template_weights:
+        parts = name.split('/')
+        if len(parts) >= 3 and parts[-2] in ('MatMul', 'BiasAdd'):
+            layer_names[name] = (parts[-3], parts[-2])
+    layers = sorted({layer for layer, _ in layer_names.values()},
+                    key=lambda layer: int(layer.rsplit('_', 1)[1]) if '_' in layer else 0)
+    template_shapes = [kernel.shape for kernel, _ in dense_layers(template_weights)]
+    model_shapes = [q.shape for q, _, _, _ in quantized_layers]
+    if template_shapes != model_shapes:
+        raise ValueError(f"{template_dir} has dense layers {template_shapes}, the model has {model_shapes}; "
+                         "use a tfjs export of the same network as the template")
+
+    specs = []
+    chunks = []
+    for group in model['weightsManifest']:
+        for spec in group['weights']:
+            spec = copy.deepcopy(spec)
+            spec.pop('quantization', None)
+            if spec['name'] in layer_names:
+                layer, op = layer_names[spec['name']]
+                q, scale, low, bias = quantized_layers[layers.index(layer)]
+                if op == 'MatMul':
+                    spec['shape'] = list(q.shape)
+                    spec['quantization'] = {'dtype': 'uint8', 'scale': float(scale), 'min': float(low),
+                                            'original_dtype': spec['dtype']}
+                    chunks.append(q.tobytes())
+                else:
+                    spec['shape'] = list(bias.shape)
+                    chunks.append(bias.astype('<f4').tobytes())
+            else:
+                values = template_weights[spec['name']]
+                chunks.append(values.astype(values.dtype.newbyteorder('<')).tobytes())
+            specs.append(spec)
+
+    os.makedirs(output_dir, exist_ok=True)
+    shard_name = 'group1-shard1of1.bin'
+    with open(os.path.join(output_dir, shard_name), 'wb') as f:
+        f.write(b''.join(chunks))
+    model['weightsManifest'] = [{'paths': [shard_name], 'weights': specs}]
+    with open(os.path.join(output_dir, 'model.json'), 'w') as f:
+        json.dump(model, f)
+
+
+def directory_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def load_held_out(data_dir=PREPROCESSED_DIR, max_samples=100000):
+    # Test positions from Split.py: the streaming shards if present, else preprocessed_data.pkl
+    if os.path.exists(os.path.join(data_dir, 'manifest.json')):
+        import features
+        from Split import load_split
+        with open(os.path.join(data_dir, 'manifest.json'), 'r') as f:
+            planes = json.load(f).get('features', 'board') == 'planes'
+        X_parts, y_parts = [], []
+        remaining = max_samples
+        for X, y in load_split(data_dir, 'test'):
+            if remaining <= 0:
+                break
+            X_part = np.asarray(X[:remaining])
+            X_parts.append(features.unpack(X_part).reshape(len(X_part), -1) if planes else X_part)
+            y_parts.append(np.asarray(y[:remaining]))
+            remaining -= len(X_parts[-1])
+        return np.concatenate(X_parts).astype(np.float32), np.concatenate(y_parts).astype(np.int64)
+    with open('preprocessed_data.pkl', 'rb') as f:
+        _, X_test, _, y_test = pickle.load(f)
+    return np.asarray(X_test[:max_samples], dtype=np.float32), np.asarray(y_test[:max_samples])
+
+
+def time_load(load, repeats=5):
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        policy = load()
+    return policy, (time.perf_counter() - start_time) / repeats
+
+
+def time_inference(policy, X, batch_size, min_positions=20000):
+    # Mean seconds per position when predicting in batches of batch_size
+    batch = X[:batch_size] if len(X) >= batch_size else np.resize(X, (batch_size, X.shape[1]))
+    repeats = max(min_positions // batch_size, 10)
+    policy.predict(batch)
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        policy.predict(batch)
+    return (time.perf_counter() - start_time) / (repeats * batch_size)
+
+
+def evaluate_variant(name, path, load, X, y, float_top1):
+    policy, load_time = time_load(load)
+    top1 = policy.predict(X).argmax(axis=1)
+    return {
+        'variant': name,
+        'path': path,
+        'bytes': directory_size(path),
+        'load_ms': load_time * 1000,
+        'us_per_position': {str(batch_size): time_inference(policy, X, batch_size) * 1e6
+                            for batch_size in BATCH_SIZES},
+        'top1_agreement': float(np.mean(top1 == float_top1)),
+        'test_accuracy': float(np.mean(top1 == y)),
+    }
+
+
+def export_variants(source=MODEL_DIR, template_dir=TFJS_MODEL_DIR, sparsities=(0.0,), output_prefix=MODEL_DIR):
+    # Write one quantized variant per sparsity; returns [(name, tfjs dir, npz path)]
+    float_layers = load_float_layers(source)
+    variants = []
+    for sparsity in sparsities:
+        tfjs_layers = []
+        npz_layers = []
+        for kernel, bias in float_layers:
+            kernel = prune(kernel, sparsity)
+            tfjs_layers.append((*quantize(kernel), bias))
+            npz_layers.append((*quantize(kernel, per_row=True), bias))
+        name = 'int8' if sparsity <= 0 else f"int8_pruned{round(sparsity * 100)}"
+        tfjs_dir = f"{output_prefix}_{name}_tfjs"
+        npz_path = f"{output_prefix}_{name}.npz"
+        save_tfjs(tfjs_dir, tfjs_layers, template_dir)
+        save_npz(npz_path, npz_layers)
+        variants.append((name, tfjs_dir, npz_path))
+        print(f"Exported {name}: {tfjs_dir}/ and {npz_path}")
+    return variants
+
+
+def build_report(variants, source=MODEL_DIR, data_dir=PREPROCESSED_DIR, max_samples=100000):
+    # Every variant is compared with the float weights it was quantized from
+    X, y = load_held_out(data_dir, max_samples)
+    float_top1 = NumpyPolicy(load_float_layers(source)).predict(X).argmax(axis=1)
+    rows = [evaluate_variant('float32', source, lambda: NumpyPolicy(load_float_layers(source)), X, y, float_top1)]
+    for name, tfjs_dir, npz_path in variants:
+        rows.append(evaluate_variant(f"{name} (tfjs)", tfjs_dir, lambda d=tfjs_dir: NumpyPolicy.from_tfjs(d),
+                                     X, y, float_top1))
+        rows.append(evaluate_variant(f"{name} (npz)", npz_path, lambda p=npz_path: NumpyPolicy.from_npz(p),
+                                     X, y, float_top1))
+    return {'held_out_positions': int(len(y)), 'variants': rows}
+
+
+def print_report(report):
+    print(f"Held-out positions: {report['held_out_positions']}")
+    header = f"{'variant':<24}{'size KB':>10}{'load ms':>10}"
+    header += ''.join(f"{f'us/pos@{b}':>12}" for b in BATCH_SIZES)
+    header += f"{'agree':>9}{'acc':>8}"
+    print(header)
+    for row in report['variants']:
+        line = f"{row['variant']:<24}{row['bytes'] / 1024:>10.1f}{row['load_ms']:>10.2f}"
+        line += ''.join(f"{row['us_per_position'][str(b)]:>12.2f}" for b in BATCH_SIZES)
+        line += f"{row['top1_agreement']:>9.2%}{row['test_accuracy']:>8.2%}"
+        print(line)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export 8-bit quantized (and pruned) versions of the model')
+    parser.add_argument('--source', default=MODEL_DIR, help='SavedModel or tfjs export holding the float weights')
+    parser.add_argument('--template', default=TFJS_MODEL_DIR, help='Float tfjs export whose topology is reused')
+    parser.add_argument('--prune', type=float, nargs='*', default=[],
+                        help='Also export variants with these fractions of each kernel pruned, e.g. 0.5 0.8')
+    parser.add_argument('--data-dir', default=PREPROCESSED_DIR)
+    parser.add_argument('--max-samples', type=int, default=100000)
+    parser.add_argument('--report', default=REPORT_PATH)
+    args = parser.parse_args()
+
+    variants = export_variants(args.source, args.template, [0.0] + args.prune, os.path.basename(args.source.rstrip('/')))
+    report = build_report(variants, args.source, args.data_dir, args.max_samples)
+    print_report(report)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {args.report}")
@@ -0,0 +1,108 @@
+import numpy as np
+
+from bitboard import WIN_TABLE, MOVE_TO_SUB_BOARD, MOVE_TO_CELL, SUB_BOARD_MOVES
+
+# Feature planes for the policy network. The raw board input leaves out whose turn it
+# is and where the next move must go; the planes encode both, from the point of view
+# of the side to move. Every plane has one value per cell (moves are row * 9 + col):
+#
+#   0  own stones                 3  sub-boards won by the side to move
+#   1  opponent stones            4  sub-boards won by the opponent
+#   2  legal moves                5  tied sub-boards
+#
+# Planes are 0/1 int8, and pack to PACKED_SIZE bytes per position for storage.
+
+NUM_PLANES = 6
+PLANES_SIZE = NUM_PLANES * 81
+PACKED_SIZE = (PLANES_SIZE + 7) // 8
+ANY_SUB_BOARD = -1  # next_valid_sub_board for "play anywhere" in array form
+
+_WIN_TABLE = np.array(WIN_TABLE, dtype=bool)
+_CELL_ORDER = np.array([move for moves in SUB_BOARD_MOVES for move in moves])  # Sub-board-major cell order
+_CELL_BITS = 1 << np.arange(9)
+_MOVE_TO_SUB_BOARD = np.array(MOVE_TO_SUB_BOARD)
+_MOVE_TO_CELL = np.array(MOVE_TO_CELL)
+
+
+def sub_board_masks(boards, player):
+    # (N, 9) bitmasks of each sub-board's cells held by player (scalar or (N,) array)
+    cells = np.asarray(boards).reshape(-1, 81)[:, _CELL_ORDER].reshape(-1, 9, 9)
+    held = cells == np.asarray(player).reshape(-1, 1, 1)
+    return held.astype(np.int64) @ _CELL_BITS
+
+
+def encode_planes(boards, current_players, next_valid_sub_boards):
+    # (N, NUM_PLANES, 81) int8 planes for (N, 81) boards, (N,) players to move and (N,)
+    # next valid sub-boards (ANY_SUB_BOARD or None for any)
+    boards = np.asarray(boards, dtype=np.int8).reshape(-1, 81)
+    current_players = np.broadcast_to(np.asarray(current_players, dtype=np.int8), (len(boards),))
+    next_valid = np.array([ANY_SUB_BOARD if n is None else n for n in next_valid_sub_boards], dtype=np.int64) \
+        if isinstance(next_valid_sub_boards, (list, tuple)) else \
+        np.broadcast_to(np.asarray(next_valid_sub_boards, dtype=np.int64), (len(boards),))
+
+    own_masks = sub_board_masks(boards, current_players)
+    opponent_masks = sub_board_masks(boards, -current_players)
+    own_won = _WIN_TABLE[own_masks]
+    opponent_won = _WIN_TABLE[opponent_masks] & ~own_won
+    tied = ((own_masks | opponent_masks) == 0x1FF) & ~own_won & ~opponent_won
+    closed = own_won | opponent_won | tied
+
+    # The game is over once a player wins the meta-board or every sub-board is closed
+    own_meta = own_won.astype(np.int64) @ _CELL_BITS
+    opponent_meta = opponent_won.astype(np.int64) @ _CELL_BITS
+    game_over = _WIN_TABLE[own_meta] | _WIN_TABLE[opponent_meta] | closed.all(axis=1)
+
+    # Moves go to next_valid_sub_board unless it is "any" or already closed
+    rows = np.arange(len(boards))
+    forced = (next_valid >= 0) & ~closed[rows, np.maximum(next_valid, 0)]
+    allowed = ~closed & ~game_over[:, None]
+    allowed &= ~forced[:, None] | (np.arange(9)[None, :] == next_valid[:, None])
+
+    planes = np.empty((len(boards), NUM_PLANES, 81), dtype=np.int8)
+    planes[:, 0] = boards == current_players[:, None]
+    planes[:, 1] = boards == -current_players[:, None]
+    planes[:, 2] = (boards == 0) & allowed[:, _MOVE_TO_SUB_BOARD]
+    planes[:, 3] = own_won[:, _MOVE_TO_SUB_BOARD]
+    planes[:, 4] = opponent_won[:, _MOVE_TO_SUB_BOARD]
+    planes[:, 5] = tied[:, _MOVE_TO_SUB_BOARD]
+    return planes
+
+
+def game_context(moves, starting_players, game_index, ply):
+    # Player to move and next valid sub-board for every position of replay_positions
+    moves = np.asarray(moves, dtype=np.int64)
+    current_players = np.asarray(starting_players, dtype=np.int8)[game_index] * \
+        np.where(ply % 2 == 0, 1, -1).astype(np.int8)
+    previous = np.roll(moves, 1)
+    next_valid = np.where(ply > 0, _MOVE_TO_CELL[previous], ANY_SUB_BOARD)
+    return current_players, next_valid
+
+
+def encode_games(moves, offsets, starting_players):
+    # Planes for the position before every move of many games: (num_moves, NUM_PLANES, 81)
+    from game_record import replay_positions
+    states, game_index, ply = replay_positions(moves, offsets, starting_players)
+    current_players, next_valid = game_context(moves, starting_players, game_index, ply)
+    return encode_planes(states, current_players, next_valid)
+
+
+def pack(planes):
+    # (N, NUM_PLANES, 81) 0/1 planes -> (N, PACKED_SIZE) uint8
+    return np.packbits(np.asarray(planes, dtype=np.uint8).reshape(len(planes), -1), axis=1)
+
+
+def unpack(packed):
+    # (N, PACKED_SIZE) uint8 -> (N, NUM_PLANES, 81) int8
+    bits = np.unpackbits(np.asarray(packed, dtype=np.uint8), axis=1, count=PLANES_SIZE)
+    return bits.view(np.int8).reshape(-1, NUM_PLANES, 81)
+
+
+def model_inputs(boards, current_players, next_valid_sub_boards, input_size):
+    # float32 network input for a batch of positions: raw boards for the original 81-input
+    # model, flattened planes for a model trained on planes
+    if input_size == 81:
+        return np.asarray(boards, dtype=np.float32).reshape(-1, 81)
+    if input_size == PLANES_SIZE:
+        planes = encode_planes(boards, current_players, next_valid_sub_boards)
+        return planes.reshape(len(planes), PLANES_SIZE).astype(np.float32)
+    raise ValueError(f"No input encoding with {input_size} features")
@@ -0,0 +1,220 @@
+import glob
+import os
+import pickle
+
+import numpy as np
+
+# Compact game record format. A record file is a short header followed by
+# one variable-length record per game:
+#
+#   int8 starting_player   1 or -1, 0 for a game that timed out or errored
+#   int8 outcome           1, -1, 0 for a tie, OUTCOME_UNFINISHED if there was no result
+#   uint8 num_moves
+#   uint8 moves[num_moves] cell indices 0-80 (row * 9 + col on the 9x9 board)
+#
+# Board states are not stored; they are rebuilt on demand by replaying the moves.
+
+RECORD_MAGIC = b'STTR'
+RECORD_VERSION = 1
+HEADER = RECORD_MAGIC + bytes([RECORD_VERSION, 0, 0, 0])
+RECORD_EXTENSION = '.stt'
+OUTCOME_UNFINISHED = 2
+
+BATCH_FILENAME = 'super_tic_tac_toe_training_data_batch_{}' + RECORD_EXTENSION
+COMBINED_FILENAME = 'super_tic_tac_toe_training_data_combined' + RECORD_EXTENSION
+LEGACY_BATCH_PATTERN = 'super_tic_tac_toe_training_data_batch_*.pkl'
+
+
+class GameRecord:
+    __slots__ = ('starting_player', 'moves', 'outcome')
+
+    def __init__(self, starting_player, moves, outcome):
+        self.starting_player = starting_player
+        self.moves = np.asarray(moves, dtype=np.uint8)
+        self.outcome = outcome  # 1, -1, 0 for a tie or None if the game did not finish
+
+    @property
+    def num_moves(self):
+        return len(self.moves)
+
+    def movers(self):
+        # Player who made each move
+        return self.starting_player * np.where(np.arange(self.num_moves) % 2 == 0, 1, -1).astype(np.int8)
+
+    def states(self):
+        # All boards of the game as an (num_moves + 1, 9, 9) int8 array:
+        # states()[i] is the board before move i, states()[-1] the final board
+        placements = np.zeros((self.num_moves + 1, 81), dtype=np.int8)
+        placements[np.arange(1, self.num_moves + 1), self.moves] = self.movers()
+        return np.cumsum(placements, axis=0, dtype=np.int8).reshape(-1, 9, 9)
+
+    def state_at(self, ply):
+        # Board before move `ply` (ply == num_moves gives the final board)
+        flat = np.zeros(81, dtype=np.int8)
+        flat[self.moves[:ply]] = self.movers()[:ply]
+        return flat.reshape(9, 9)
+
+    def to_game_data(self):
+        # Legacy [(starting_player, None, None), (player, state, move), ..., (outcome, final_state, None)] form
+        states = self.states().astype(int)
+        movers = self.movers()
+        game_data = [(self.starting_player, None, None)]
+        for i in range(self.num_moves):
+            # The recorded player is the side to move after the move
+            game_data.append((int(-movers[i]), states[i], int(self.moves[i])))
+        game_data.append((self.outcome, states[-1], None))
+        return game_data
+
+    @classmethod
+    def from_game_data(cls, game_data):
+        starting_player = game_data[0][0]
+        moves = [move for _, _, move in game_data[1:] if move is not None]
+        outcome = game_data[-1][0] if len(game_data) > 1 else None
+        if outcome not in (1, -1, 0):
+            outcome = None
+        return cls(starting_player, moves, outcome)
+
+    def __repr__(self):
+        return f"GameRecord(starting_player={self.starting_player}, num_moves={self.num_moves}, outcome={self.outcome})"
+
+
+def replay_positions(moves, offsets, starting_players):
+    # Boards before every move of many games at once, without a Python loop per game.
+    # moves holds the games' moves back to back and game g owns moves[offsets[g]:offsets[g + 1]].
+    # Returns (states, game_index, ply): states is (num_moves, 81) int8.
+    moves = np.asarray(moves, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    game_index = np.repeat(np.arange(len(lengths)), lengths)
+    ply = np.arange(len(moves)) - offsets[game_index]
+    movers = np.asarray(starting_players, dtype=np.int8)[game_index] * np.where(ply % 2 == 0, 1, -1).astype(np.int8)
+
+    # Exclusive running sum over all games, minus its value where each game starts.
+    # int8 sums wrap around, but every difference is a single game's board in [-1, 1], so it comes out exact.
+    placements = np.zeros((len(moves), 81), dtype=np.int8)
+    placements[np.arange(len(moves)), moves] = movers
+    running = np.cumsum(placements, axis=0, dtype=np.int8)
+    running -= placements
+    states = running - running[offsets[game_index]]
+    return states, game_index, ply
+
+
+def encode_record(record):
+    # Bytes for one game; `None` (timed out or errored game) is kept as an empty record
+    if record is None:
+        return bytes([0, 0, 0])
+    outcome = OUTCOME_UNFINISHED if record.outcome is None else record.outcome
+    header = np.array([record.starting_player, outcome], dtype=np.int8).tobytes()
+    return header + bytes([record.num_moves]) + record.moves.tobytes()
+
+
+def decode_records(buffer):
+    # Decode a whole record file held in memory. Move arrays are views into the buffer.
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    if bytes(data[:4]) != RECORD_MAGIC:
+        raise ValueError("Not a game record file")
+    if data[4] != RECORD_VERSION:
+        raise ValueError(f"Unsupported game record version: {data[4]}")
+    signed = data.view(np.int8)
+
+    records = []
+    offset = len(HEADER)
+    end = len(data)
+    while offset < end:
+        starting_player = int(signed[offset])
+        outcome = int(signed[offset + 1])
+        num_moves = int(data[offset + 2])
+        moves = data[offset + 3:offset + 3 + num_moves]
+        offset += 3 + num_moves
+        if starting_player == 0:
+            records.append(None)
+        else:
+            records.append(GameRecord(starting_player, moves, None if outcome == OUTCOME_UNFINISHED else outcome))
+    return records
+
+
+class RecordWriter:
+    # Streams records to a file: `with RecordWriter(path) as writer: writer.write(record)`
+    def __init__(self, path, append=False):
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, 'ab' if exists else 'wb')
+        if not exists:
+            self.file.write(HEADER)
+        self.games_written = 0
+
+    def write(self, record):
+        self.file.write(encode_record(record))
+        self.games_written += 1
+
+    def write_all(self, records):
+        self.file.write(b''.join(encode_record(record) for record in records))
+        self.games_written += len(records)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+def write_records(path, records):
+    with RecordWriter(path) as writer:
+        writer.write_all(records)
+
+
+def read_records(path):
+    with open(path, 'rb') as f:
+        return decode_records(f.read())
+
+
+def records_from_pickle(path):
+    with open(path, 'rb') as f:
+        games = pickle.load(f)
+    return [GameRecord.from_game_data(game) if game else None for game in games]
+
+
+def load_records(path):
+    # Read either a compact record file or a legacy pickle of game_data lists
+    if path.endswith('.pkl'):
+        return records_from_pickle(path)
+    return read_records(path)
+
+
+def convert_pickle_file(pkl_path, remove=False):
+    out_path = os.path.splitext(pkl_path)[0] + RECORD_EXTENSION
+    records = records_from_pickle(pkl_path)
+    write_records(out_path, records)
+    if remove:
+        os.remove(pkl_path)
+    return out_path, len(records)
+
+
+if __name__ == '__main__':
+    import argparse
+    from tqdm import tqdm
+
+    parser = argparse.ArgumentParser(description='Convert pickled game batches to the compact record format')
+    parser.add_argument('files', nargs='*', help=f"Pickle files to convert (default: {LEGACY_BATCH_PATTERN})")
+    parser.add_argument('--remove', action='store_true', help='Delete each pickle after converting it')
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(LEGACY_BATCH_PATTERN))
+    if not files:
+        print("No pickle files to convert.")
+
+    pkl_bytes = 0
+    record_bytes = 0
+    total_games = 0
+    for pkl_path in tqdm(files, desc="Converting batches"):
+        pkl_bytes += os.path.getsize(pkl_path)
+        out_path, num_games = convert_pickle_file(pkl_path, remove=args.remove)
+        record_bytes += os.path.getsize(out_path)
+        total_games += num_games
+
+    if files:
+        print(f"Converted {total_games} games from {len(files)} files")
+        print(f"Size: {pkl_bytes / 1e6:.2f} MB pickled -> {record_bytes / 1e6:.2f} MB compact "
+              f"({record_bytes / max(total_games, 1):.0f} bytes per game)")
@@ -0,0 +1,197 @@
+import json
+import os
+import multiprocessing as mp
+
+import numpy as np
+from tqdm import tqdm
+
+from game_record import read_records, records_from_pickle
+from game_store import GameStore, store_paths
+
+# Mergeable dataset statistics. A GameStats holds only fixed-size count arrays, so
+# shards are summarized independently (in parallel), added together in the parent and
+# cached per shard: re-running after new shards arrive only reads the new data.
+
+STATS_CACHE_PATH = 'game_stats_cache.json'
+STORE_RANGE = 100000  # Games per store task; only complete ranges are cached
+MAX_MOVES = 81
+OUTCOMES = (1, -1, 0)  # Row order of last_moves and the first entries of outcome_counts
+
+
+class GameStats:
+    def __init__(self):
+        self.length_counts = np.zeros(MAX_MOVES + 1, dtype=np.int64)  # Games by number of moves
+        self.outcome_counts = np.zeros(4, dtype=np.int64)  # X wins, O wins, ties, unknown
+        self.first_player_counts = np.zeros(2, dtype=np.int64)  # Player 1, player -1
+        self.first_moves = np.zeros((2, 81), dtype=np.int64)  # By starting player
+        self.last_moves = np.zeros((3, 81), dtype=np.int64)  # By outcome
+        self.timed_out = 0  # Empty records of games that timed out or errored
+        self.errored = 0  # Records without moves
+
+    @classmethod
+    def from_arrays(cls, starting_players, outcomes, num_moves, first_moves, last_moves):
+        # One entry per record; starting_player 0 marks an empty (timed out) record and
+        # outcome 2 an unfinished game. first/last moves are ignored where num_moves is 0.
+        stats = cls()
+        starting_players = np.asarray(starting_players, dtype=np.int64)
+        outcomes = np.asarray(outcomes, dtype=np.int64)
+        num_moves = np.asarray(num_moves, dtype=np.int64)
+        first_moves = np.asarray(first_moves, dtype=np.int64)
+        last_moves = np.asarray(last_moves, dtype=np.int64)
+
+        present = starting_players != 0
+        stats.timed_out = int((~present).sum())
+        stats.errored = int((present & (num_moves == 0)).sum())
+        played = present & (num_moves > 0)
+
+        starter_row = (starting_players[played] == -1).astype(np.int64)
+        stats.length_counts += np.bincount(num_moves[played], minlength=MAX_MOVES + 1)
+        stats.first_player_counts += np.bincount(starter_row, minlength=2)
+        stats.first_moves += np.bincount(starter_row * 81 + first_moves[played], minlength=2 * 81).reshape(2, 81)
+
+        outcome_rows = np.full(played.sum(), 3, dtype=np.int64)
+        for row, outcome in enumerate(OUTCOMES):
+            outcome_rows[outcomes[played] == outcome] = row
+        stats.outcome_counts += np.bincount(outcome_rows, minlength=4)
+        finished = outcome_rows < 3
+        stats.last_moves += np.bincount(outcome_rows[finished] * 81 + last_moves[played][finished],
+                                        minlength=3 * 81).reshape(3, 81)
+        return stats
+
+    @classmethod
+    def from_records(cls, records):
+        # GameRecord objects (None for empty records)
+        starting_players, outcomes, num_moves, first_moves, last_moves = [], [], [], [], []
+        for record in records:
+            if record is None:
+                starting_players.append(0)
+                outcomes.append(2)
+                num_moves.append(0)
+                first_moves.append(0)
+                last_moves.append(0)
+                continue
+            starting_players.append(record.starting_player)
+            outcomes.append(2 if record.outcome is None else record.outcome)
+            num_moves.append(record.num_moves)
+            first_moves.append(int(record.moves[0]) if record.num_moves else 0)
+            last_moves.append(int(record.moves[-1]) if record.num_moves else 0)
+        return cls.from_arrays(starting_players, outcomes, num_moves, first_moves, last_moves)
+
+    def __add__(self, other):
+        total = GameStats()
+        for name, value in vars(self).items():
+            setattr(total, name, value + getattr(other, name))
+        return total
+
+    @property
+    def games(self):
+        return int(self.length_counts.sum())
+
+    def win_counts(self):
+        labels = (1, -1, 'Tie', 'Unknown')
+        return {label: int(count) for label, count in zip(labels, self.outcome_counts) if count}
+
+    def length_summary(self):
+        lengths = np.nonzero(self.length_counts)[0]
+        if len(lengths) == 0:
+            return {'min': 0, 'max': 0, 'mean': 0.0, 'median': 0.0}
+        cumulative = np.cumsum(self.length_counts)
+        total = cumulative[-1]
+        # Median of the expanded histogram, averaging the two middle games for an even count
+        lower = int(np.searchsorted(cumulative, (total + 1) // 2))
+        upper = int(np.searchsorted(cumulative, total // 2 + 1))
+        return {
+            'min': int(lengths[0]),
+            'max': int(lengths[-1]),
+            'mean': float(np.arange(MAX_MOVES + 1) @ self.length_counts / total),
+            'median': (lower + upper) / 2,
+        }
+
+    def to_dict(self):
+        return {name: value.tolist() if isinstance(value, np.ndarray) else value for name, value in vars(self).items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        for name, value in data.items():
+            current = getattr(stats, name)
+            setattr(stats, name, np.array(value, dtype=current.dtype) if isinstance(current, np.ndarray) else value)
+        return stats
+
+
+def file_stats(path):
+    records = records_from_pickle(path) if path.endswith('.pkl') else read_records(path)
+    return GameStats.from_records(records)
+
+
+def store_range_stats(task):
+    store_path, start, stop = task
+    moves, offsets, entries = GameStore(store_path).moves_range(start, stop)
+    num_moves = np.diff(offsets)
+    if len(moves) == 0:
+        first_moves = last_moves = np.zeros(len(num_moves), dtype=np.int64)
+    else:
+        # Clipped lookups; from_arrays ignores the values of games without moves
+        first_moves = moves[np.minimum(offsets[:-1], len(moves) - 1)]
+        last_moves = moves[np.maximum(offsets[1:] - 1, 0)]
+    return GameStats.from_arrays(entries['starting_player'], entries['outcome'], num_moves, first_moves, last_moves)
+
+
+def compute_task(task):
+    kind, argument = task
+    return file_stats(argument) if kind == 'file' else store_range_stats(argument)
+
+
+def load_cache(path=STATS_CACHE_PATH):
+    if path is None or not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_cache(cache, path=STATS_CACHE_PATH):
+    if path is None:
+        return
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+
+
+def collect_stats(files=(), store_path=None, processes=None, cache_path=STATS_CACHE_PATH):
+    # Combined GameStats of shard files and/or a game store, reusing cached shard results
+    cache = load_cache(cache_path)
+    tasks = []  # (cache key, fingerprint, task)
+    for path in files:
+        stat = os.stat(path)
+        tasks.append((os.path.abspath(path), [stat.st_size, stat.st_mtime], ('file', path)))
+    if store_path is not None:
+        store = GameStore(store_path)
+        data_path = os.path.abspath(store_paths(store_path)[0])
+        for start in range(0, len(store), STORE_RANGE):
+            stop = min(start + STORE_RANGE, len(store))
+            # The store only grows, so a complete range is identified by its byte span
+            fingerprint = [int(store.index['offset'][start]), int(store.index['offset'][stop - 1]), stop - start]
+            key = f"{data_path}:{start}" if stop - start == STORE_RANGE else None
+            tasks.append((key, fingerprint, ('store', (store_path, start, stop))))
+
+    total = GameStats()
+    pending = []
+    for key, fingerprint, task in tasks:
+        entry = cache.get(key) if key is not None else None
+        if entry is not None and entry['fingerprint'] == fingerprint:
+            total = total + GameStats.from_dict(entry['stats'])
+        else:
+            pending.append((key, fingerprint, task))
+    print(f"{len(tasks) - len(pending)} of {len(tasks)} shards cached, computing {len(pending)}")
+
+    if pending:
+        processes = processes or mp.cpu_count()
+        with mp.Pool(processes=min(processes, len(pending))) as pool:
+            results = pool.imap(compute_task, [task for _, _, task in pending])
+            for (key, fingerprint, _), stats in tqdm(zip(pending, results), total=len(pending), desc="Computing stats"):
+                total = total + stats
+                if key is not None:
+                    cache[key] = {'fingerprint': fingerprint, 'stats': stats.to_dict()}
+        save_cache(cache, cache_path)
+    return total
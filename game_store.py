@@ -0,0 +1,199 @@
+import os
+
+import numpy as np
+
+from game_record import GameRecord, read_records, records_from_pickle, OUTCOME_UNFINISHED, RECORD_EXTENSION
+
+# Append-only on-disk game store. A store is two flat files next to each other:
+#
+#   <path>.dat  every game's moves (uint8) back to back
+#   <path>.idx  one INDEX_DTYPE entry per game: where its moves start and its header fields
+#
+# Games are appended by writing their moves before their index entry, so a reader
+# never sees an entry whose moves are missing. Both files are opened with np.memmap,
+# so game i and any range of games can be read without loading the rest.
+
+STORE_PATH = 'super_tic_tac_toe_games'
+DATA_SUFFIX = '.dat'
+INDEX_SUFFIX = '.idx'
+
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),
+    ('num_moves', 'u1'),
+    ('starting_player', 'i1'),  # 0 marks a game that timed out or errored
+    ('outcome', 'i1'),  # 1, -1, 0 for a tie or OUTCOME_UNFINISHED
+])
+
+COPY_CHUNK_GAMES = 1 << 16  # Games per block when copying one store into another
+
+
+def store_paths(path):
+    return path + DATA_SUFFIX, path + INDEX_SUFFIX
+
+
+def _open_memmap(filename, dtype):
+    if not os.path.exists(filename) or os.path.getsize(filename) < dtype.itemsize:
+        return np.zeros(0, dtype=dtype)
+    count = os.path.getsize(filename) // dtype.itemsize
+    return np.memmap(filename, dtype=dtype, mode='r', shape=(count,))
+
+
+class GameStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.refresh()
+
+    def refresh(self):
+        # Re-open the memmaps, e.g. to see games appended since the store was opened
+        data_file, index_file = store_paths(self.path)
+        self.index = _open_memmap(index_file, INDEX_DTYPE)
+        self.data = _open_memmap(data_file, np.dtype(np.uint8))
+
+    def __len__(self):
+        return len(self.index)
+
+    def record(self, i):
+        entry = self.index[i]
+        if entry['starting_player'] == 0:
+            return None
+        offset = int(entry['offset'])
+        moves = self.data[offset:offset + int(entry['num_moves'])]
+        outcome = int(entry['outcome'])
+        return GameRecord(int(entry['starting_player']), moves, None if outcome == OUTCOME_UNFINISHED else outcome)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.record(i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("game index out of range")
+        return self.record(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def moves_range(self, start, stop):
+        # Moves of games [start, stop) as one flat array plus per-game offsets into it,
+        # for consumers that work on a whole range with NumPy
+        entries = self.index[start:stop]
+        if len(entries) == 0:
+            return np.zeros(0, dtype=np.uint8), np.zeros(1, dtype=np.int64), entries
+        offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(entries['num_moves'], dtype=np.int64)
+        starts = entries['offset'].astype(np.int64)
+        if np.array_equal(starts - starts[0], offsets[:-1]):
+            # Games back to back, the usual case: one slice of the data file
+            return self.data[starts[0]:starts[0] + offsets[-1]], offsets, entries
+        # A gap in the data file, e.g. moves written by a writer that crashed before
+        # their index entries: gather each game from its own offset
+        positions = np.repeat(starts - offsets[:-1], entries['num_moves']) + np.arange(offsets[-1])
+        return self.data[positions], offsets, entries
+
+
+class GameStoreWriter:
+    # Appends games to a store: `with GameStoreWriter(path) as writer: writer.write_all(records)`
+    def __init__(self, path=STORE_PATH):
+        data_file, index_file = store_paths(path)
+        self.data_file = open(data_file, 'ab')
+        self.index_file = open(index_file, 'ab')
+        self.offset = self.data_file.tell()
+        self.games_written = 0
+
+    def write_all(self, records):
+        entries = np.zeros(len(records), dtype=INDEX_DTYPE)
+        chunks = []
+        offset = self.offset
+        for i, record in enumerate(records):
+            entries[i]['offset'] = offset
+            if record is None:
+                continue
+            entries[i]['num_moves'] = record.num_moves
+            entries[i]['starting_player'] = record.starting_player
+            entries[i]['outcome'] = OUTCOME_UNFINISHED if record.outcome is None else record.outcome
+            chunks.append(record.moves.tobytes())
+            offset += record.num_moves
+        self._append(b''.join(chunks), entries, offset)
+
+    def write(self, record):
+        self.write_all([record])
+
+    def append_store(self, source):
+        # Stream another store's games into this one a block at a time
+        for start in range(0, len(source), COPY_CHUNK_GAMES):
+            moves, offsets, entries = source.moves_range(start, start + COPY_CHUNK_GAMES)
+            shifted = np.array(entries, dtype=INDEX_DTYPE)
+            shifted['offset'] = self.offset + offsets[:-1].astype(np.uint64)
+            self._append(np.asarray(moves).tobytes(), shifted, self.offset + len(moves))
+
+    def _append(self, data, entries, new_offset):
+        self.data_file.write(data)
+        self.data_file.flush()  # Moves must be on disk before the index entries that point at them
+        self.index_file.write(entries.tobytes())
+        self.index_file.flush()
+        self.offset = new_offset
+        self.games_written += len(entries)
+
+    def close(self):
+        self.data_file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+def load_shard(path):
+    # Records from a compact record file or a legacy batch pickle
+    if path.endswith('.pkl'):
+        return records_from_pickle(path)
+    return read_records(path)
+
+
+def ingest_files(store_path, files, remove=False):
+    # Append shards to a store one at a time; only one shard is ever in memory.
+    # Shards may be record files, legacy pickles or other stores (given by their .idx file).
+    total_games = 0
+    total_moves = 0
+    with GameStoreWriter(store_path) as writer:
+        for filename in files:
+            if filename.endswith(INDEX_SUFFIX):
+                source = GameStore(filename[:-len(INDEX_SUFFIX)])
+                writer.append_store(source)
+                total_games += len(source)
+                total_moves += int(source.index['num_moves'].sum(dtype=np.int64))
+                continue
+            records = load_shard(filename)
+            writer.write_all(records)
+            total_games += len(records)
+            total_moves += sum(record.num_moves for record in records if record is not None)
+            if remove:
+                os.remove(filename)
+    return total_games, total_moves
+
+
+if __name__ == '__main__':
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description='Append game shards to an indexed game store')
+    parser.add_argument('files', nargs='*',
+                        help=f"Record files, batch pickles or other stores' .idx files "
+                             "(default: all super_tic_tac_toe_training_data_batch_* files)")
+    parser.add_argument('--store', default=STORE_PATH, help='Store path without suffix')
+    parser.add_argument('--remove', action='store_true', help='Delete record and pickle shards once ingested')
+    args = parser.parse_args()
+
+    def batch_number(filename):
+        return int(os.path.splitext(filename)[0].rsplit('_', 1)[1])
+
+    files = args.files or sorted(
+        glob.glob('super_tic_tac_toe_training_data_batch_*' + RECORD_EXTENSION) +
+        glob.glob('super_tic_tac_toe_training_data_batch_*.pkl'), key=batch_number)
+    total_games, total_moves = ingest_files(args.store, files, remove=args.remove)
+    store = GameStore(args.store)
+    print(f"Ingested {total_games} games ({total_moves} moves) from {len(files)} files")
+    print(f"Store {args.store} now holds {len(store)} games")
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import numpy as np
+
+# Minimal HTTP/1.1 over asyncio streams for the local JSON services. Connections are
+# kept alive, bodies are JSON with a Content-Length, and there is no chunked encoding,
+# TLS or anything else a service on localhost does not need.
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+MAX_BODY_BYTES = 1 << 20
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+async def read_message(reader):
+    # (start line, body) of one request or response, or None once the peer has closed.
+    # A malformed head raises HTTPError(400); the stream cannot be read further after it.
+    try:
+        start_line = await reader.readline()
+    except ConnectionError:
+        return None
+    except ValueError:  # Line longer than the stream's limit
+        raise HTTPError(400, 'Request line too long')
+    if not start_line:
+        return None
+    length = 0
+    while True:
+        try:
+            header = await reader.readline()
+        except ValueError:
+            raise HTTPError(400, 'Header line too long')
+        if header in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = header.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            value = value.strip()
+            if not (value.isascii() and value.isdigit()):
+                raise HTTPError(400, f"Invalid Content-Length {value!r}")
+            length = int(value)
+            if length > MAX_BODY_BYTES:
+                raise HTTPError(400, f"Body of {length} bytes is over the {MAX_BODY_BYTES} byte limit")
+    body = await reader.readexactly(length) if length else b''
+    return start_line.decode('latin-1').strip(), body
+
+
+def encode_message(start_line, payload):
+    body = b'' if payload is None else json.dumps(payload).encode()
+    head = f"{start_line}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    return head.encode('latin-1') + body
+
+
+def connection_handler(handler):
+    # asyncio.start_server callback; handler(method, path, payload) returns (status, payload)
+    async def handle_connection(reader, writer):
+        try:
+            while True:
+                try:
+                    message = await read_message(reader)
+                except HTTPError as e:
+                    # The rest of the stream cannot be framed, so answer and close
+                    writer.write(encode_message(f"HTTP/1.1 {e.status} {REASONS[e.status]}", {'error': e.message}))
+                    await writer.drain()
+                    break
+                if message is None:
+                    break
+                request_line, body = message
+                try:
+                    method, path, _ = request_line.split(' ', 2)
+                    payload = json.loads(body) if body else None
+                    status, response = await handler(method, path.split('?', 1)[0], payload)
+                except HTTPError as e:
+                    status, response = e.status, {'error': e.message}
+                except (ValueError, KeyError, TypeError) as e:
+                    status, response = 400, {'error': str(e)}
+                except Exception as e:
+                    # Answer rather than drop the connection, e.g. when the model itself fails
+                    print(f"Error handling {request_line!r}: {e!r}")
+                    status, response = 500, {'error': 'Internal server error'}
+                writer.write(encode_message(f"HTTP/1.1 {status} {REASONS.get(status, '')}", response))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return handle_connection
+
+
+class JSONClient:
+    # One keep-alive connection; requests on it are sent one at a time
+    def __init__(self, host='127.0.0.1', port=8080):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def request(self, method, path, payload=None):
+        self.writer.write(encode_message(f"{method} {path} HTTP/1.1\r\nHost: {self.host}", payload))
+        await self.writer.drain()
+        message = await read_message(self.reader)
+        if message is None:
+            raise ConnectionError('Server closed the connection')
+        status_line, body = message
+        return int(status_line.split(' ', 2)[1]), json.loads(body) if body else None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.writer = None
+
+
+def latency_summary(latencies):
+    # Percentiles in milliseconds of a sequence of latencies in seconds
+    if len(latencies) == 0:
+        return {'count': 0}
+    ms = np.asarray(latencies) * 1000
+    return {
+        'count': int(len(ms)),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p90_ms': float(np.percentile(ms, 90)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
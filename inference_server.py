@@ -0,0 +1,223 @@
+import asyncio
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bitboard import BitboardSuperTicTacToe
+from features import model_inputs
+from http_util import HTTPError, connection_handler, latency_summary
+
+# Local move-prediction service. The model is loaded once and requests that arrive
+# close together are stacked into one batch, so many concurrent games share a single
+# forward pass instead of running one [1, 81] prediction each like the browser does.
+#
+#   POST /predict  {"board": 81 values or 9x9, "current_player": 1, "next_valid_sub_board": null}
+#   GET  /stats    latency percentiles and the batch-size histogram
+#
+# Moves are numbered row * 9 + col, as in the training data.
+
+MODEL_DIR = 'super_tic_tac_toe_model'
+LATENCY_WINDOW = 100000  # Most recent request latencies kept for the percentiles
+
+
+class SavedModelPredictor:
+    # Maps a (batch, input_size) float32 array of model inputs to (batch, 81) move probabilities
+    def __init__(self, model_dir=None):
+        import tensorflow as tf
+        self.tf = tf
+        self.model = tf.saved_model.load(model_dir or MODEL_DIR)
+        self.signature = self.model.signatures['serving_default']
+        self.input_name = next(iter(self.signature.structured_input_signature[1]))
+        self.output_name = next(iter(self.signature.structured_outputs))
+        self.input_size = self.signature.structured_input_signature[1][self.input_name].shape[-1]
+
+    def __call__(self, boards):
+        inputs = self.tf.constant(boards, dtype=self.tf.float32)
+        return self.signature(**{self.input_name: inputs})[self.output_name].numpy()
+
+
+def numpy_predictor(model_dir=None):
+    from numpy_model import NumpyPolicy, TFJS_MODEL_DIR
+    return NumpyPolicy.from_tfjs(model_dir or TFJS_MODEL_DIR)
+
+
+PREDICTORS = {'tensorflow': SavedModelPredictor, 'numpy': numpy_predictor}
+
+
+class MicroBatcher:
+    def __init__(self, predict, max_batch_size=64, max_wait_ms=2.0):
+        self.predict_fn = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = None
+        self.executor = ThreadPoolExecutor(max_workers=1)  # One forward pass at a time, off the event loop
+        self.batch_sizes = Counter()
+        self.batches = 0
+
+    async def predict(self, position):
+        # position is (board, current_player, next_valid_sub_board)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((position, future))
+        return await future
+
+    def forward(self, positions):
+        # Runs on the executor thread: encode the whole batch, then one forward pass
+        boards, current_players, next_valid_sub_boards = zip(*positions)
+        inputs = model_inputs(np.stack(boards), np.array(current_players), list(next_valid_sub_boards),
+                              getattr(self.predict_fn, 'input_size', 81))
+        return self.predict_fn(inputs)
+
+    async def collect_batch(self):
+        # Wait for a first request, then take more until the batch is full or max_wait has passed
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        self.queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self.collect_batch()
+            try:
+                probabilities = await loop.run_in_executor(self.executor, self.forward,
+                                                           [position for position, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), row in zip(batch, probabilities):
+                if not future.done():  # The client may have gone away
+                    future.set_result(row)
+            self.batch_sizes[len(batch)] += 1
+            self.batches += 1
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def parse_position(payload):
+    if not isinstance(payload, dict) or 'board' not in payload:
+        raise HTTPError(400, 'Expected a JSON object with a "board"')
+    # Check the values before the int8 cast, which would wrap or reject out-of-range numbers
+    board = np.asarray(payload['board'])
+    if board.dtype.kind not in 'iuf' or board.size != 81 or not np.isin(board, (-1, 0, 1)).all():
+        raise HTTPError(400, 'The board must have 81 cells with values -1, 0 or 1')
+    board = board.astype(np.int8)
+    current_player = payload.get('current_player', 1)
+    if current_player not in (1, -1):
+        raise HTTPError(400, 'current_player must be 1 or -1')
+    next_valid_sub_board = payload.get('next_valid_sub_board')
+    if next_valid_sub_board is not None and next_valid_sub_board not in range(9):
+        raise HTTPError(400, 'next_valid_sub_board must be null or 0-8')
+    return board.reshape(81), current_player, next_valid_sub_board
+
+
+def rank_moves(probabilities, valid_moves):
+    # Legal moves by predicted probability, renormalized over the legal moves
+    moves = np.array(valid_moves)
+    legal = probabilities[moves].astype(np.float64)
+    total = legal.sum()
+    legal = legal / total if total > 0 else np.full(len(moves), 1.0 / len(moves))
+    order = np.argsort(-legal, kind='stable')
+    return [{'move': int(moves[i]), 'row': int(moves[i]) // 9, 'col': int(moves[i]) % 9,
+             'probability': float(legal[i])} for i in order]
+
+
+class InferenceServer:
+    def __init__(self, predict, max_batch_size=64, max_wait_ms=2.0):
+        self.batcher = MicroBatcher(predict, max_batch_size, max_wait_ms)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.errors = 0
+        self.start_time = time.time()
+
+    async def handle(self, method, path, payload):
+        if path == '/predict':
+            if method != 'POST':
+                raise HTTPError(405, 'Use POST')
+            return 200, await self.predict(payload)
+        if path == '/stats':
+            return 200, self.stats()
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        raise HTTPError(404, f"No route for {path}")
+
+    async def predict(self, payload):
+        start_time = time.perf_counter()
+        try:
+            board, current_player, next_valid_sub_board = parse_position(payload)
+            game = BitboardSuperTicTacToe.from_array(board, current_player, next_valid_sub_board)
+            if game.is_game_over():
+                raise HTTPError(409, 'The game is already over')
+            valid_moves = game.get_valid_moves()
+        except HTTPError:
+            self.errors += 1
+            raise
+        probabilities = await self.batcher.predict((board, current_player, next_valid_sub_board))
+        ranking = rank_moves(probabilities, valid_moves)
+        self.latencies.append(time.perf_counter() - start_time)
+        self.requests += 1
+        return {'move': ranking[0]['move'], 'ranking': ranking}
+
+    def stats(self):
+        batch_sizes = self.batcher.batch_sizes
+        batched = sum(size * count for size, count in batch_sizes.items())
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'uptime_seconds': time.time() - self.start_time,
+            'latency': latency_summary(self.latencies),
+            'batches': self.batcher.batches,
+            'mean_batch_size': batched / self.batcher.batches if self.batcher.batches else 0.0,
+            'batch_size_histogram': {str(size): batch_sizes[size] for size in sorted(batch_sizes)},
+        }
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        batcher_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(connection_handler(self.handle), host, port)
+        print(f"Serving predictions on http://{host}:{port} "
+              f"(max batch {self.batcher.max_batch_size}, max wait {self.batcher.max_wait * 1000:.1f} ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+            self.batcher.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve batched move predictions over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--model-dir', default=None,
+                        help=f"SavedModel for tensorflow (default {MODEL_DIR}), tfjs export for numpy")
+    parser.add_argument('--backend', choices=sorted(PREDICTORS), default='tensorflow',
+                        help='numpy runs the tfjs weights without importing TensorFlow')
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0,
+                        help='Longest a request waits for others to share its batch')
+    args = parser.parse_args()
+
+    predictor = PREDICTORS[args.backend](args.model_dir)
+    server = InferenceServer(predictor, args.max_batch_size, args.max_wait_ms)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"Final stats: {server.stats()}")
@@ -0,0 +1,270 @@
+import cProfile
+import json
+import os
+import pickle
+import signal
+import threading
+import time
+from collections import defaultdict
+
+# Optional metrics for the self-play generator: counters and per-phase timers, kept
+# per process, shipped back from pool workers with their results and merged in the
+# parent, which writes them to a JSON-lines log and a Prometheus text file.
+#
+# Disabled by default. Code reads the module attribute `metrics` at call time and
+# checks `metrics.enabled` before timing anything fine-grained, so a disabled run pays
+# one attribute lookup per game. Timing starts with enable() (or init_worker() in
+# pool workers).
+#
+# Profiling: send SIGUSR1 to a worker process to start cProfile in it and again to
+# stop and write profile_<pid>.prof; the pids are listed in the metrics output.
+
+METRICS_PREFIX = 'stt_selfplay'
+JSONL_FILENAME = 'selfplay_metrics.jsonl'
+PROMETHEUS_FILENAME = 'selfplay_metrics.prom'
+
+
+class NullMetrics:
+    enabled = False
+
+    def count(self, name, value=1):
+        pass
+
+    def add_time(self, name, seconds):
+        pass
+
+    def timer(self, name):
+        return _NULL_TIMER
+
+    def drain(self):
+        return None
+
+    def merge(self, snapshot):
+        pass
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(self):
+        self.lock = threading.Lock()  # Writer threads record into the same object
+        self.counters = defaultdict(float)
+        self.timers = defaultdict(lambda: [0, 0.0])  # name -> [calls, seconds]
+        self.worker_busy = defaultdict(float)  # pid -> seconds spent in tasks
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            timer = self.timers[name]
+            timer[0] += 1
+            timer[1] += seconds
+
+    def timer(self, name):
+        return _Timer(self, name)
+
+    def drain(self):
+        # Everything recorded since the last drain, as a small picklable dict
+        with self.lock:
+            snapshot = {'counters': dict(self.counters), 'timers': {name: list(t) for name, t in self.timers.items()},
+                        'worker_busy': dict(self.worker_busy)}
+            self.counters.clear()
+            self.timers.clear()
+            self.worker_busy.clear()
+        return snapshot
+
+    def merge(self, snapshot):
+        if not snapshot:
+            return
+        with self.lock:
+            for name, value in snapshot['counters'].items():
+                self.counters[name] += value
+            for name, (calls, seconds) in snapshot['timers'].items():
+                timer = self.timers[name]
+                timer[0] += calls
+                timer[1] += seconds
+            for pid, seconds in snapshot['worker_busy'].items():
+                self.worker_busy[pid] += seconds
+
+
+metrics = NullMetrics()
+
+
+def enable():
+    global metrics
+    if not metrics.enabled:
+        metrics = Metrics()
+    return metrics
+
+
+class InstrumentedTask:
+    # Wraps a pool task so the worker's metrics travel back with each result
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, *args, **kwargs):
+        start_time = time.perf_counter()
+        result = self.function(*args, **kwargs)
+        m = metrics
+        elapsed = time.perf_counter() - start_time
+        m.add_time('worker.task', elapsed)
+        with m.timer('worker.serialize'):
+            m.count('bytes_serialized', len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)))
+        with m.lock:
+            m.worker_busy[os.getpid()] += elapsed
+        return result, m.drain()
+
+
+def task(function):
+    # The function itself when metrics are off, an InstrumentedTask otherwise
+    return InstrumentedTask(function) if metrics.enabled else function
+
+
+def collect(results):
+    # Unwrap results of instrumented tasks, merging their metrics into this process
+    if not metrics.enabled:
+        return results
+    values = []
+    for value, snapshot in results:
+        metrics.merge(snapshot)
+        values.append(value)
+    return values
+
+
+def collect_one(result):
+    return collect([result])[0]
+
+
+def timed_iter(iterable, name):
+    # Time spent waiting on each item of an iterator, e.g. results of imap_unordered
+    if not metrics.enabled:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        with metrics.timer(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+# Profiling of individual workers
+
+_profiler = None
+_profile_dir = '.'
+
+
+def toggle_profile(signum=None, frame=None):
+    global _profiler
+    if _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    else:
+        _profiler.disable()
+        path = os.path.join(_profile_dir, f"profile_{os.getpid()}.prof")
+        _profiler.dump_stats(path)
+        _profiler = None
+        print(f"Worker {os.getpid()} profile written to {path}")
+
+
+def init_worker(enabled, profile_dir='.'):
+    # Pool initializer: fresh per-worker metrics (not the parent's, copied by fork) and
+    # the SIGUSR1 profiling toggle
+    global metrics, _profile_dir
+    metrics = Metrics() if enabled else NullMetrics()
+    _profile_dir = profile_dir
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, toggle_profile)
+
+
+class MetricsExporter:
+    # Accumulates merged metrics in the parent and writes them out every `interval` seconds
+    def __init__(self, output_dir='.', interval=10.0):
+        os.makedirs(output_dir, exist_ok=True)
+        self.jsonl_path = os.path.join(output_dir, JSONL_FILENAME)
+        self.prometheus_path = os.path.join(output_dir, PROMETHEUS_FILENAME)
+        self.interval = interval
+        self.start_time = time.time()
+        self.last_flush = 0.0
+        self.totals = Metrics()
+
+    def maybe_flush(self):
+        if time.time() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self.totals.merge(metrics.drain())
+        self.last_flush = time.time()
+        elapsed = self.last_flush - self.start_time
+        report = self.report(elapsed)
+        with open(self.jsonl_path, 'a') as f:
+            f.write(json.dumps(report) + '\n')
+        tmp_path = self.prometheus_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text(report))
+        os.replace(tmp_path, self.prometheus_path)
+        return report
+
+    def report(self, elapsed):
+        counters = dict(self.totals.counters)
+        timers = {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in self.totals.timers.items()}
+        utilization = {str(pid): busy / elapsed for pid, busy in self.totals.worker_busy.items()} if elapsed > 0 else {}
+        return {
+            'time': time.time(),
+            'elapsed': elapsed,
+            'counters': counters,
+            'timers': timers,
+            'games_per_sec': counters.get('games', 0) / elapsed if elapsed > 0 else 0.0,
+            'moves_per_sec': counters.get('moves', 0) / elapsed if elapsed > 0 else 0.0,
+            'worker_utilization': utilization,
+        }
+
+    def prometheus_text(self, report):
+        lines = []
+        for name, value in sorted(report['counters'].items()):
+            metric = f"{METRICS_PREFIX}_{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value:.15g}"]
+        lines += [f"# TYPE {METRICS_PREFIX}_phase_seconds_total counter"]
+        lines += [f'{METRICS_PREFIX}_phase_seconds_total{{phase="{name}"}} {timer["seconds"]:.6f}'
+                  for name, timer in sorted(report['timers'].items())]
+        lines += [f"# TYPE {METRICS_PREFIX}_phase_calls_total counter"]
+        lines += [f'{METRICS_PREFIX}_phase_calls_total{{phase="{name}"}} {timer["calls"]}'
+                  for name, timer in sorted(report['timers'].items())]
+        lines += [f"# TYPE {METRICS_PREFIX}_worker_utilization gauge"]
+        lines += [f'{METRICS_PREFIX}_worker_utilization{{pid="{pid}"}} {value:.4f}'
+                  for pid, value in sorted(report['worker_utilization'].items())]
+        for name in ('games_per_sec', 'moves_per_sec', 'elapsed'):
+            metric = f"{METRICS_PREFIX}_{name}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {report[name]:.3f}"]
+        return '\n'.join(lines) + '\n'
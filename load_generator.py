@@ -0,0 +1,80 @@
+import asyncio
+import random
+import time
+
+from bitboard import BitboardSuperTicTacToe
+from http_util import JSONClient, latency_summary
+
+# Load generator for inference_server.py: many concurrent clients, each on its own
+# keep-alive connection, send positions from random games as fast as the server answers.
+
+
+def random_positions(count, seed=0):
+    # Mid-game positions reached by random play, as /predict request bodies
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = BitboardSuperTicTacToe(starting_player=rng.choice([1, -1]))
+        for _ in range(rng.randrange(0, 60)):
+            if game.is_game_over():
+                break
+            game.make_move(rng.choice(game.get_valid_moves()))
+        if not game.is_game_over():
+            positions.append({
+                'board': game.board.reshape(81).tolist(),
+                'current_player': game.current_player,
+                'next_valid_sub_board': game.next_valid_sub_board,
+            })
+    return positions
+
+
+async def client_loop(host, port, positions, requests, latencies, errors):
+    client = await JSONClient(host, port).connect()
+    try:
+        for i in range(requests):
+            start_time = time.perf_counter()
+            status, _ = await client.request('POST', '/predict', positions[i % len(positions)])
+            latencies.append(time.perf_counter() - start_time)
+            if status != 200:
+                errors.append(status)
+    finally:
+        await client.close()
+
+
+async def run_load(host, port, clients, requests_per_client, positions):
+    latencies = []
+    errors = []
+    start_time = time.perf_counter()
+    await asyncio.gather(*(client_loop(host, port, positions[i::clients] or positions, requests_per_client,
+                                       latencies, errors) for i in range(clients)))
+    elapsed = time.perf_counter() - start_time
+
+    stats_client = await JSONClient(host, port).connect()
+    _, server_stats = await stats_client.request('GET', '/stats')
+    await stats_client.close()
+    return latencies, errors, elapsed, server_stats
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Send concurrent prediction requests to the inference server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--clients', type=int, default=64, help='Concurrent connections')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per client')
+    parser.add_argument('--positions', type=int, default=2000, help='Distinct positions to cycle through')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    positions = random_positions(args.positions, args.seed)
+    latencies, errors, elapsed, server_stats = asyncio.run(
+        run_load(args.host, args.port, args.clients, args.requests, positions))
+
+    total = len(latencies)
+    print(f"{total} requests from {args.clients} clients in {elapsed:.2f} seconds "
+          f"({total / elapsed:.0f} requests/sec), {len(errors)} errors")
+    print(f"Client latency: {latency_summary(latencies)}")
+    print(f"Server latency: {server_stats['latency']}")
+    print(f"Server batches: {server_stats['batches']}, mean size {server_stats['mean_batch_size']:.1f}")
+    print(f"Batch-size histogram: {server_stats['batch_size_histogram']}")
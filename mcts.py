@@ -0,0 +1,215 @@
+import math
+import random
+import time
+from multiprocessing import Pool
+
+from bitboard import BitboardSuperTicTacToe
+
+# Monte Carlo Tree Search player. Searches run on a BitboardSuperTicTacToe copy of
+# the position, so the AI works with any engine that has board, current_player
+# and next_valid_sub_board.
+
+
+class MCTSNode:
+    __slots__ = ('move', 'parent', 'children', 'untried_moves', 'visits', 'wins', 'player_just_moved')
+
+    def __init__(self, move, parent, untried_moves, player_just_moved):
+        self.move = move
+        self.parent = parent
+        self.children = {}
+        self.untried_moves = untried_moves
+        self.visits = 0
+        self.wins = 0.0  # From the point of view of player_just_moved; a draw counts half
+        self.player_just_moved = player_just_moved
+
+    def select_child(self, exploration):
+        log_visits = math.log(self.visits)
+        return max(self.children.values(),
+                   key=lambda child: child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits))
+
+
+def new_root(game):
+    return MCTSNode(None, None, game.get_valid_moves(), -game.current_player)
+
+
+def run_playouts(root, game, playouts=None, time_budget=None, exploration=1.4, rng=random):
+    # Grow the tree under `root` (whose position is `game`) with UCT until the playout
+    # count or the time budget runs out. Returns the number of playouts made.
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    completed = 0
+    while True:
+        if playouts is not None and completed >= playouts:
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+
+        node = root
+        state = game.copy()
+
+        # Selection
+        while not node.untried_moves and node.children:
+            node = node.select_child(exploration)
+            state.make_move(node.move)
+
+        # Expansion
+        if node.untried_moves and not state.is_game_over():
+            move = node.untried_moves.pop(rng.randrange(len(node.untried_moves)))
+            mover = state.current_player
+            state.make_move(move)
+            child = MCTSNode(move, node, state.get_valid_moves() if not state.is_game_over() else [], mover)
+            node.children[move] = child
+            node = child
+
+        # Simulation
+        while not state.is_game_over():
+            state.make_move(rng.choice(state.get_valid_moves()))
+        winner = state.get_winner()
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner == node.player_just_moved:
+                node.wins += 1.0
+            elif winner == 0:
+                node.wins += 0.5
+            node = node.parent
+        completed += 1
+    return completed
+
+
+def search_position(board, current_player, next_valid_sub_board, playouts, time_budget, exploration, seed):
+    # Root-parallel worker: search the position from scratch and return the root's visit counts
+    game = BitboardSuperTicTacToe.from_array(board, current_player, next_valid_sub_board)
+    root = new_root(game)
+    completed = run_playouts(root, game, playouts, time_budget, exploration, random.Random(seed))
+    return {move: child.visits for move, child in root.children.items()}, completed
+
+
+class MCTSAI:
+    def __init__(self, player, playouts=2000, time_budget=None, exploration=1.4, num_workers=0, seed=None):
+        self.player = player
+        self.playouts = playouts  # Playouts per move, split across the parent and the workers
+        self.time_budget = time_budget  # Seconds per move; when set it takes precedence over playouts
+        self.exploration = exploration
+        self.num_workers = num_workers
+        self.rng = random.Random(seed)
+        self.pool = None
+
+        # Tree kept between moves, and the moves that led to its root
+        self.root = None
+        self.root_history = None
+
+        self.last_playouts = 0
+        self.last_search_time = 0.0
+        self.reused_visits = 0
+
+    def playouts_per_sec(self):
+        return self.last_playouts / self.last_search_time if self.last_search_time > 0 else 0.0
+
+    def game_history(self, game):
+        history = getattr(game, 'move_history', None)
+        if history is None:
+            return None
+        return [entry[0] for entry in history]
+
+    def reuse_root(self, history):
+        # Walk the saved tree down the moves played since our last search
+        if self.root is None or history is None or self.root_history is None:
+            return None
+        if history[:len(self.root_history)] != self.root_history:
+            return None
+        node = self.root
+        for move in history[len(self.root_history):]:
+            node = node.children.get(move)
+            if node is None:
+                return None
+        node.parent = None
+        return node
+
+    def choose_move(self, game):
+        valid_moves = game.get_valid_moves()
+        if not valid_moves:
+            return None
+        if len(valid_moves) == 1:
+            return valid_moves[0]
+
+        state = BitboardSuperTicTacToe.from_game(game)
+        history = self.game_history(game)
+        root = self.reuse_root(history) or new_root(state)
+        self.reused_visits = root.visits
+
+        start_time = time.perf_counter()
+        workers = self.num_workers if self.num_workers > 1 else 0
+        share = None if self.time_budget is not None else max(1, self.playouts // (workers + 1))
+
+        pending = []
+        if workers:
+            if self.pool is None:
+                self.pool = Pool(processes=workers)
+            board = state.to_array()
+            pending = [self.pool.apply_async(search_position, (
+                board, state.current_player, state.next_valid_sub_board, share, self.time_budget,
+                self.exploration, self.rng.randrange(2**63))) for _ in range(workers)]
+
+        completed = run_playouts(root, state, share, self.time_budget, self.exploration, self.rng)
+
+        # Root parallelism: add every worker's root visit counts to our own
+        visits = {move: child.visits for move, child in root.children.items()}
+        for result in pending:
+            worker_visits, worker_playouts = result.get()
+            completed += worker_playouts
+            for move, count in worker_visits.items():
+                visits[move] = visits.get(move, 0) + count
+
+        self.last_search_time = time.perf_counter() - start_time
+        self.last_playouts = completed
+
+        best_move = max(visits, key=visits.get)
+
+        # Keep the chosen subtree for the next move
+        self.root = root.children.get(best_move)
+        if self.root is not None:
+            self.root.parent = None
+            self.root_history = (history + [best_move]) if history is not None else None
+        return best_move
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+if __name__ == '__main__':
+    import argparse
+    from buildai import SuperTicTacToe, BasicAI
+
+    parser = argparse.ArgumentParser(description='Play MCTSAI against the random BasicAI')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--playouts', type=int, default=1000)
+    parser.add_argument('--time-budget', type=float, default=None, help='Seconds per move (overrides --playouts)')
+    parser.add_argument('--workers', type=int, default=0)
+    args = parser.parse_args()
+
+    mcts = MCTSAI(1, playouts=args.playouts, time_budget=args.time_budget, num_workers=args.workers)
+    opponent = BasicAI(-1)
+    results = {1: 0, -1: 0, 0: 0}
+    total_playouts = 0
+    total_time = 0.0
+    for game_number in range(args.games):
+        game = SuperTicTacToe(starting_player=1 if game_number % 2 == 0 else -1)
+        while not game.is_game_over():
+            if game.current_player == 1:
+                move = mcts.choose_move(game)
+                total_playouts += mcts.last_playouts
+                total_time += mcts.last_search_time
+            else:
+                move = opponent.choose_move(game)
+            game.make_move(move)
+        results[game.get_winner()] += 1
+        print(f"Game {game_number + 1}: winner {game.get_winner()}")
+    mcts.close()
+
+    print(f"MCTS results as player 1: {results}")
+    if total_time > 0:
+        print(f"Playouts/sec: {total_playouts / total_time:.0f}")
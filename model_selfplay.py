@@ -0,0 +1,195 @@
+import os
+import time
+from collections import deque
+from functools import partial
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+from tqdm import tqdm
+
+from batched_selfplay import BatchedSuperTicTacToe, NO_GAME
+from buildai import shard_path
+from export_quantized import load_float_layers
+from features import model_inputs
+from game_record import RecordWriter
+from numpy_model import NumpyPolicy, TFJS_MODEL_DIR
+
+# Self-play driven by the policy network instead of BasicAI's random moves. Each worker
+# keeps hundreds of games in flight in a BatchedSuperTicTacToe; every step gathers the
+# positions of all unfinished games into one batch, runs a single NumPy forward pass,
+# masks illegal moves, samples a move per game with a temperature and advances them all.
+# Output shards use the compact record format, so a generation can be ingested with
+# game_store.py, preprocessed with Split.py and trained on with training.py:
+#
+#   python model_selfplay.py --model tfjs_model2 --num-games 100000
+#   python game_store.py model_selfplay_shards/*.stt --store generation_1
+
+MODEL_SELFPLAY_DIR = 'model_selfplay_shards'
+
+
+def load_policy(source=TFJS_MODEL_DIR):
+    # A tfjs export, a SavedModel (needs TensorFlow) or an .npz from export_quantized.py
+    if source.endswith('.npz'):
+        return NumpyPolicy.from_npz(source)
+    return NumpyPolicy(load_float_layers(source))
+
+
+def sample_moves(probabilities, legal_masks, temperature, rng):
+    # One legal move per row: the most likely at temperature 0, otherwise sampled from
+    # probabilities ** (1 / temperature). Rows whose legal moves all have probability 0
+    # fall back to a uniform choice.
+    weights = np.where(legal_masks, probabilities, 0.0).astype(np.float64)
+    if temperature <= 0:
+        scores = np.where(legal_masks, weights, -1.0)
+        return scores.argmax(axis=1)
+    if temperature != 1:
+        weights **= 1.0 / temperature
+    totals = weights.sum(axis=1)
+    weights[totals <= 0] = legal_masks[totals <= 0]
+    # Inverse CDF: the first cell whose cumulative weight exceeds a uniform target always
+    # has positive weight; the clip guards against the target rounding up to the total
+    cumulative = np.cumsum(weights, axis=1)
+    targets = rng.random(len(weights)) * cumulative[:, -1]
+    moves = (cumulative <= targets[:, None]).sum(axis=1)
+    last_positive = weights.shape[1] - 1 - (weights[:, ::-1] > 0).argmax(axis=1)
+    return np.minimum(moves, last_positive)
+
+
+def iter_model_games(game_numbers, policy, num_parallel=512, temperature=1.0, greedy_after=None, rng=None,
+                     stats=None):
+    # Yields (game_number, GameRecord) as games finish; finished rows are refilled from
+    # the queue, so the batch stays full until the queue runs dry. stats, if given,
+    # accumulates steps, positions evaluated and time spent in the network.
+    rng = rng if rng is not None else np.random.default_rng()
+    queue = deque(game_numbers)
+    games = BatchedSuperTicTacToe(min(num_parallel, max(len(queue), 1)), rng=rng)
+    stats = stats if stats is not None else {}
+    for key in ('steps', 'positions', 'slots', 'forward_seconds'):
+        stats.setdefault(key, 0)
+
+    def refill(rows):
+        count = min(len(rows), len(queue))
+        if count:
+            games.reset_rows(rows[:count], [queue.popleft() for _ in range(count)])
+        games.game_ids[rows[count:]] = NO_GAME
+
+    refill(np.arange(games.num_games))
+    while True:
+        rows = games.active_rows()
+        if len(rows) == 0:
+            break
+        legal = games.legal_move_mask(rows)
+        inputs = model_inputs(games.board[rows], games.current_player[rows],
+                              games.next_valid_sub_board[rows].astype(np.int64), policy.input_size)
+        start_time = time.perf_counter()
+        probabilities = policy.predict(inputs)
+        stats['forward_seconds'] += time.perf_counter() - start_time
+
+        moves = sample_moves(probabilities, legal, temperature, rng)
+        if greedy_after is not None:
+            # Sample the opening for variety, then play the network's best move
+            greedy = games.num_moves[rows] >= greedy_after
+            if greedy.any():
+                moves[greedy] = sample_moves(probabilities[greedy], legal[greedy], 0, rng)
+        games.apply_moves(rows, moves)
+        stats['steps'] += 1
+        stats['positions'] += len(rows)
+        stats['slots'] += games.num_games
+
+        done = games.finished_rows()
+        if len(done) == 0:
+            continue
+        for row in done:
+            yield int(games.game_ids[row]), games.to_record(row)
+        refill(done)
+
+
+_policy = None
+
+
+def init_worker(model_source):
+    # Pool initializer: every worker loads the weights once
+    global _policy
+    _policy = load_policy(model_source)
+
+
+def generate_model_shard(chunk_id, num_games, games_per_chunk, seed, output_dir, num_parallel=512, temperature=1.0,
+                         greedy_after=None):
+    # Play one chunk of games and write them, in game order, to the chunk's shard file
+    chunk_start = chunk_id * games_per_chunk
+    game_numbers = range(chunk_start + 1, min(chunk_start + games_per_chunk, num_games) + 1)
+    rng = np.random.default_rng(seed * 1000003 + chunk_id)
+    stats = {}
+    start_time = time.perf_counter()
+    records = dict(iter_model_games(game_numbers, _policy, num_parallel, temperature, greedy_after, rng, stats))
+
+    filename = shard_path(output_dir, chunk_id)
+    temp_filename = filename + '.tmp'
+    with RecordWriter(temp_filename) as writer:
+        writer.write_all([records[game_number] for game_number in game_numbers])
+    os.replace(temp_filename, filename)
+
+    outcomes = {1: 0, -1: 0, 0: 0}
+    for record in records.values():
+        outcomes[record.outcome] += 1
+    stats.update({'chunk_id': chunk_id, 'games': len(records), 'outcomes': outcomes,
+                  'moves': sum(record.num_moves for record in records.values()),
+                  'seconds': time.perf_counter() - start_time})
+    return stats
+
+
+def generate_model_selfplay(model_source=TFJS_MODEL_DIR, num_games=10000, games_per_chunk=2000, seed=0,
+                            output_dir=MODEL_SELFPLAY_DIR, num_parallel=512, temperature=1.0, greedy_after=None,
+                            processes=None):
+    os.makedirs(output_dir, exist_ok=True)
+    num_chunks = -(-num_games // games_per_chunk)
+    pending = [chunk_id for chunk_id in range(num_chunks) if not os.path.exists(shard_path(output_dir, chunk_id))]
+    if len(pending) < num_chunks:
+        print(f"Resuming: {num_chunks - len(pending)} of {num_chunks} shards already exist in {output_dir}")
+
+    make_shard = partial(generate_model_shard, num_games=num_games, games_per_chunk=games_per_chunk, seed=seed,
+                         output_dir=output_dir, num_parallel=num_parallel, temperature=temperature,
+                         greedy_after=greedy_after)
+    totals = {'games': 0, 'moves': 0, 'steps': 0, 'positions': 0, 'slots': 0, 'forward_seconds': 0.0,
+              'worker_seconds': 0.0, 'outcomes': {1: 0, -1: 0, 0: 0}}
+    start_time = time.time()
+    processes = min(processes or cpu_count(), max(len(pending), 1))
+    with Pool(processes=processes, initializer=init_worker, initargs=(model_source,)) as pool:
+        for summary in tqdm(pool.imap_unordered(make_shard, pending), total=len(pending), desc="Model self-play"):
+            for key in ('games', 'moves', 'steps', 'positions', 'slots', 'forward_seconds'):
+                totals[key] += summary[key]
+            totals['worker_seconds'] += summary['seconds']
+            for outcome, count in summary['outcomes'].items():
+                totals['outcomes'][outcome] += count
+    totals['elapsed'] = time.time() - start_time
+    return totals
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate self-play games with the policy network')
+    parser.add_argument('--model', default=TFJS_MODEL_DIR, help='tfjs export, SavedModel or .npz weights')
+    parser.add_argument('--num-games', type=int, default=10000)
+    parser.add_argument('--games-per-chunk', type=int, default=2000, help='Games per worker task and shard file')
+    parser.add_argument('--parallel-games', type=int, default=512, help='Games in flight per worker')
+    parser.add_argument('--temperature', type=float, default=1.0,
+                        help='Sampling temperature; 0 always plays the most likely legal move')
+    parser.add_argument('--greedy-after', type=int, default=None,
+                        help='Ply after which games play the most likely move instead of sampling')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default=MODEL_SELFPLAY_DIR)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    totals = generate_model_selfplay(args.model, args.num_games, args.games_per_chunk, args.seed, args.output_dir,
+                                     args.parallel_games, args.temperature, args.greedy_after, args.processes)
+    elapsed = totals['elapsed']
+    print(f"Outcomes: {totals['outcomes']}")
+    if totals['games'] and elapsed > 0:
+        print(f"Generated {totals['games']} games ({totals['moves']} moves) in {elapsed:.2f} seconds "
+              f"({totals['games'] / elapsed:.0f} games/sec, {totals['positions'] / elapsed:.0f} positions/sec)")
+        print(f"Average batch occupancy: {totals['positions'] / totals['steps']:.1f} positions per step "
+              f"({totals['positions'] / totals['slots']:.1%} of slots)")
+        print(f"Network forward passes: {totals['forward_seconds'] / totals['worker_seconds']:.1%} of worker time")
+        print(f"Ingest with: python game_store.py {os.path.join(args.output_dir, '*.stt')} --store <store>")
@@ -0,0 +1,169 @@
+import json
+import os
+
+import numpy as np
+
+from features import model_inputs
+
+# Runs the exported policy network with NumPy alone. The tfjs exports are a stack of
+# dense layers (ReLU hidden layers, softmax output) whose weights sit in the .bin
+# shards listed in model.json, so reading them directly gives the same predictions
+# as TensorFlow without importing it.
+
+TFJS_MODEL_DIR = 'tfjs_model2'  # Same weights as super_tic_tac_toe_model (81 inputs)
+
+TFJS_DTYPES = {'float32': np.float32, 'int32': np.int32, 'uint8': np.uint8, 'uint16': np.uint16}
+
+
+def load_tfjs_weights(model_dir=TFJS_MODEL_DIR):
+    # {weight name: array} in manifest order; each group's shards are one contiguous buffer
+    with open(os.path.join(model_dir, 'model.json'), 'r') as f:
+        model = json.load(f)
+    weights = {}
+    for group in model['weightsManifest']:
+        buffer = b''.join(open(os.path.join(model_dir, path), 'rb').read() for path in group['paths'])
+        offset = 0
+        for spec in group['weights']:
+            quantization = spec.get('quantization')
+            stored_dtype = quantization['dtype'] if quantization else spec['dtype']
+            dtype = np.dtype(TFJS_DTYPES[stored_dtype]).newbyteorder('<')
+            count = int(np.prod(spec['shape'])) if spec['shape'] else 1
+            values = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            offset += count * dtype.itemsize
+            values = values.reshape(spec['shape']).astype(dtype.newbyteorder('='))
+            if quantization:
+                # tfjs affine quantization: value = q * scale + min
+                values = (values * np.float32(quantization['scale']) + np.float32(quantization['min']))
+                values = values.astype(TFJS_DTYPES[spec['dtype']])
+            weights[spec['name']] = values
+    return weights
+
+
+def dense_layers(weights):
+    # [(kernel, bias)] from tfjs names like .../dense_1/MatMul/ReadVariableOp, in layer order
+    kernels = {}
+    biases = {}
+    for name, values in weights.items():
+        parts = name.split('/')
+        if len(parts) >= 3 and parts[-2] == 'MatMul':
+            kernels[parts[-3]] = values
+        elif len(parts) >= 3 and parts[-2] == 'BiasAdd':
+            biases[parts[-3]] = values
+    names = sorted(kernels, key=lambda layer: int(layer.rsplit('_', 1)[1]) if '_' in layer else 0)
+    return [(kernels[layer], biases[layer]) for layer in names]
+
+
+class NumpyPolicy:
+    def __init__(self, layers):
+        self.layers = [(np.ascontiguousarray(kernel, dtype=np.float32), bias.astype(np.float32))
+                       for kernel, bias in layers]
+        self.input_size = self.layers[0][0].shape[0]
+        self.output_size = self.layers[-1][0].shape[1]
+
+    @classmethod
+    def from_tfjs(cls, model_dir=TFJS_MODEL_DIR):
+        return cls(dense_layers(load_tfjs_weights(model_dir)))
+
+    @classmethod
+    def from_npz(cls, path):
+        # Layers saved as layer{i}_kernel/layer{i}_bias, or with the kernel quantized to
+        # layer{i}_kernel_q (uint8) plus layer{i}_kernel_scale and layer{i}_kernel_min,
+        # scalars or one per row (shape (rows, 1)) that broadcast over the kernel
+        with np.load(path) as data:
+            layers = []
+            while f"layer{len(layers)}_bias" in data:
+                prefix = f"layer{len(layers)}"
+                if f"{prefix}_kernel" in data:
+                    kernel = data[f"{prefix}_kernel"]
+                else:
+                    kernel = data[f"{prefix}_kernel_q"] * data[f"{prefix}_kernel_scale"] + data[f"{prefix}_kernel_min"]
+                layers.append((kernel, data[f"{prefix}_bias"]))
+        return cls(layers)
+
+    def predict(self, boards):
+        # (batch, input_size) boards -> (batch, output_size) move probabilities
+        x = np.asarray(boards, dtype=np.float32).reshape(-1, self.input_size)
+        for kernel, bias in self.layers[:-1]:
+            x = x @ kernel
+            x += bias
+            np.maximum(x, 0, out=x)
+        kernel, bias = self.layers[-1]
+        logits = x @ kernel
+        logits += bias
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+    __call__ = predict
+
+    def predict_masked(self, boards, legal_masks):
+        # Probabilities renormalized over each row's legal moves; rows with no legal move stay zero
+        probabilities = self.predict(boards) * legal_masks
+        totals = probabilities.sum(axis=1, keepdims=True)
+        return np.divide(probabilities, totals, out=np.zeros_like(probabilities), where=totals > 0)
+
+
+def legal_move_mask(game):
+    mask = np.zeros(81, dtype=np.float32)
+    mask[game.get_valid_moves()] = 1.0
+    return mask
+
+
+class PolicyAI:
+    # Plays the network's most likely legal move, or samples with a temperature
+    def __init__(self, player, policy=None, temperature=0.0, rng=None):
+        self.player = player
+        self.policy = policy if policy is not None else NumpyPolicy.from_tfjs()
+        self.temperature = temperature
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def choose_move(self, game):
+        valid_moves = game.get_valid_moves()
+        if not valid_moves:
+            return None
+        inputs = model_inputs(game.board.reshape(1, 81), game.current_player, [game.next_valid_sub_board],
+                              self.policy.input_size)
+        probabilities = self.policy.predict(inputs)[0][valid_moves]
+        if self.temperature <= 0:
+            return valid_moves[int(np.argmax(probabilities))]
+        weights = np.power(probabilities.astype(np.float64), 1.0 / self.temperature)
+        total = weights.sum()
+        if total <= 0:
+            return valid_moves[self.rng.integers(len(valid_moves))]
+        return valid_moves[self.rng.choice(len(valid_moves), p=weights / total)]
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Load a tfjs export with NumPy and time batched predictions')
+    parser.add_argument('--model-dir', default=TFJS_MODEL_DIR)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--verify', default=None, metavar='SAVED_MODEL_DIR',
+                        help='Compare the predictions against this SavedModel run by TensorFlow')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    policy = NumpyPolicy.from_tfjs(args.model_dir)
+    print(f"Loaded {len(policy.layers)} dense layers ({policy.input_size} -> {policy.output_size}) "
+          f"in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+
+    rng = np.random.default_rng(0)
+    boards = rng.integers(-1, 2, size=(args.batch_size, policy.input_size)).astype(np.float32)
+    start_time = time.perf_counter()
+    repeats = 100
+    for _ in range(repeats):
+        probabilities = policy.predict(boards)
+    elapsed = time.perf_counter() - start_time
+    print(f"{repeats * args.batch_size / elapsed:.0f} positions/sec at batch size {args.batch_size}")
+
+    if args.verify:
+        from inference_server import SavedModelPredictor
+        expected = SavedModelPredictor(args.verify)(boards)
+        difference = np.abs(expected - probabilities).max()
+        agreement = np.mean(expected.argmax(axis=1) == probabilities.argmax(axis=1))
+        print(f"Max difference from TensorFlow: {difference:.2e}, top-1 agreement {agreement:.2%}")
+        if difference > 1e-5:
+            raise SystemExit('NumPy predictions do not match TensorFlow')
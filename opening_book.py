@@ -0,0 +1,178 @@
+import os
+from collections import defaultdict
+
+import numpy as np
+
+from bitboard import BitboardSuperTicTacToe
+from game_store import GameStore, STORE_PATH
+from zobrist import CELL_KEYS, SIDE_KEY, ANY_SUB_BOARD, SUB_BOARD_KEYS, compute_hash, game_hash, player_index
+
+# Opening book: best known move for positions of the first few plies, keyed by the
+# Zobrist hash. The book is an open-addressing hash table in a single .npy file, so
+# it can be memory-mapped and every lookup touches one or two slots.
+
+BOOK_PATH = 'opening_book.npy'
+
+BOOK_DTYPE = np.dtype([
+    ('key', '<u8'),  # Zobrist hash, 0 for an empty slot
+    ('move', 'i1'),
+    ('games', '<u4'),  # Games the move was seen in (0 for moves from offline search)
+    ('score', '<f4'),  # Mean result for the mover: 1 win, 0.5 tie, 0 loss
+])
+
+
+def replay_hashes(starting_player, moves, max_plies):
+    # (hash, move, mover) for the first max_plies moves of a game, hashing incrementally
+    game = BitboardSuperTicTacToe(starting_player)
+    h = SUB_BOARD_KEYS[ANY_SUB_BOARD] ^ (SIDE_KEY if starting_player == -1 else 0)
+    for move in moves[:max_plies]:
+        move = int(move)
+        mover = game.current_player
+        previous_sub_board = game.next_valid_sub_board
+        yield h, move, mover
+        game.make_move(move)
+        h ^= CELL_KEYS[move][player_index(mover)] ^ SIDE_KEY
+        h ^= SUB_BOARD_KEYS[ANY_SUB_BOARD if previous_sub_board is None else previous_sub_board]
+        h ^= SUB_BOARD_KEYS[ANY_SUB_BOARD if game.next_valid_sub_board is None else game.next_valid_sub_board]
+
+
+def collect_opening_stats(store, max_plies=6):
+    # {hash: {move: [games, total score for the mover]}} plus one move sequence reaching each hash
+    stats = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+    sequences = {}
+    for i in range(len(store)):
+        record = store[i]
+        if record is None or record.outcome is None:
+            continue
+        for ply, (h, move, mover) in enumerate(replay_hashes(record.starting_player, record.moves, max_plies)):
+            if h not in sequences:
+                sequences[h] = (record.starting_player, [int(m) for m in record.moves[:ply]])
+            entry = stats[h][move]
+            entry[0] += 1
+            entry[1] += 1.0 if record.outcome == mover else 0.5 if record.outcome == 0 else 0.0
+    return stats, sequences
+
+
+def choose_book_moves(stats, min_games=20):
+    # Best-scoring move per position among moves seen in at least min_games games
+    book = {}
+    for h, moves in stats.items():
+        candidates = [(total / games, games, move) for move, (games, total) in moves.items() if games >= min_games]
+        if candidates:
+            score, games, move = max(candidates)
+            book[h] = (move, games, score)
+    return book
+
+
+def refine_with_search(book, sequences, time_limit_ms=1000):
+    # Replace the statistical choice with the move a long alpha-beta search prefers
+    from alphabeta import AlphaBetaAI
+    from buildai import SuperTicTacToe
+
+    for h in list(book):
+        starting_player, moves = sequences[h]
+        game = SuperTicTacToe(starting_player=starting_player)
+        for move in moves:
+            game.make_move(move)
+        ai = AlphaBetaAI(game.current_player, time_limit_ms=time_limit_ms)
+        move = ai.choose_move(game)
+        _, games, score = book[h]
+        book[h] = (move, games, score)
+    return book
+
+
+def save_book(book, path=BOOK_PATH):
+    size = 1
+    while size < 2 * max(len(book), 1):
+        size *= 2
+    table = np.zeros(size, dtype=BOOK_DTYPE)
+    mask = size - 1
+    for h, (move, games, score) in book.items():
+        slot = h & mask
+        while table['key'][slot] != 0:
+            slot = (slot + 1) & mask
+        table[slot] = (h, move, games, score)
+    np.save(path, table)
+    return size
+
+
+class OpeningBook:
+    def __init__(self, path=BOOK_PATH):
+        self.path = path
+        self.table = None  # Memory-mapped on first lookup
+        self.mask = 0
+
+    def load(self):
+        if self.table is None:
+            if os.path.exists(self.path):
+                self.table = np.load(self.path, mmap_mode='r')
+            else:
+                self.table = np.zeros(1, dtype=BOOK_DTYPE)
+            self.mask = len(self.table) - 1
+
+    def lookup(self, h):
+        # Book entry (move, games, score) for a position hash, or None
+        self.load()
+        slot = h & self.mask
+        while True:
+            entry = self.table[slot]
+            key = int(entry['key'])
+            if key == 0:
+                return None
+            if key == h:
+                return int(entry['move']), int(entry['games']), float(entry['score'])
+            slot = (slot + 1) & self.mask
+
+    def __len__(self):
+        self.load()
+        return int(np.count_nonzero(self.table['key']))
+
+
+class BookAI:
+    # Plays book moves while the position is in the book, then hands over to a search AI
+    def __init__(self, player, book_path=BOOK_PATH, fallback=None):
+        self.player = player
+        self.book = OpeningBook(book_path)
+        if fallback is None:
+            from alphabeta import AlphaBetaAI
+            fallback = AlphaBetaAI(player)
+        self.fallback = fallback
+        self.book_hits = 0
+        self.book_misses = 0
+
+    def choose_move(self, game):
+        entry = self.book.lookup(game_hash(game))
+        if entry is not None and entry[0] in game.get_valid_moves():
+            self.book_hits += 1
+            return entry[0]
+        self.book_misses += 1
+        return self.fallback.choose_move(game)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Build an opening book from the game store')
+    parser.add_argument('--store', default=STORE_PATH)
+    parser.add_argument('--output', default=BOOK_PATH)
+    parser.add_argument('--plies', type=int, default=6, help='Book depth in plies')
+    parser.add_argument('--min-games', type=int, default=20, help='Games a move needs before it can enter the book')
+    parser.add_argument('--search-ms', type=int, default=0,
+                        help='If set, choose book moves with an alpha-beta search of this many ms per position')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    stats, sequences = collect_opening_stats(GameStore(args.store), args.plies)
+    book = choose_book_moves(stats, args.min_games)
+    if args.search_ms:
+        book = refine_with_search(book, sequences, args.search_ms)
+    size = save_book(book, args.output)
+    print(f"Opening book with {len(book)} positions ({size} slots) saved to {args.output} "
+          f"in {time.time() - start_time:.1f} seconds")
+
+    # Sanity check: the empty board with either side to move
+    opening = OpeningBook(args.output)
+    for player in (1, -1):
+        h = compute_hash(np.zeros((9, 9), dtype=int), player, None)
+        print(f"Book move for the empty board, player {player} to move: {opening.lookup(h)}")
@@ -0,0 +1,89 @@
+import asyncio
+import random
+import time
+
+from http_util import JSONClient, latency_summary
+
+# Load test for session_server.py: clients on their own keep-alive connections open
+# sessions and play random legal moves in them, asking the server for an AI reply on
+# a fraction of the turns. Sessions are left open unless --delete is given, so the
+# server ends the run holding them all.
+
+
+async def client_loop(host, port, games, ai_fraction, ai, time_limit_ms, rng, results, delete):
+    client = await JSONClient(host, port).connect()
+    try:
+        for _ in range(games):
+            status, state = await client.request('POST', '/sessions', {'starting_player': rng.choice([1, -1])})
+            if status != 200:
+                results['errors'].append(status)
+                continue
+            path = f"/sessions/{state['session_id']}"
+            while not state['game_over']:
+                start_time = time.perf_counter()
+                if rng.random() < ai_fraction:
+                    status, response = await client.request('POST', path + '/ai-move',
+                                                            {'ai': ai, 'time_limit_ms': time_limit_ms})
+                    latencies = results['ai_latencies']
+                else:
+                    status, response = await client.request('POST', path + '/move',
+                                                            {'move': rng.choice(state['valid_moves'])})
+                    latencies = results['move_latencies']
+                if status == 503:
+                    results['ai_rejected'] += 1  # AI queue full; play the turn ourselves
+                    continue
+                if status != 200:
+                    results['errors'].append(status)
+                    break
+                latencies.append(time.perf_counter() - start_time)
+                state = response
+            results['games'] += 1
+            if delete:
+                await client.request('DELETE', path)
+    finally:
+        await client.close()
+
+
+async def run_load(host, port, clients, games_per_client, ai_fraction, ai, time_limit_ms, seed=0, delete=False):
+    results = {'games': 0, 'move_latencies': [], 'ai_latencies': [], 'errors': [], 'ai_rejected': 0}
+    start_time = time.perf_counter()
+    await asyncio.gather(*(client_loop(host, port, games_per_client, ai_fraction, ai, time_limit_ms,
+                                       random.Random(seed * 100003 + i), results, delete)
+                           for i in range(clients)))
+    elapsed = time.perf_counter() - start_time
+
+    stats_client = await JSONClient(host, port).connect()
+    _, server_stats = await stats_client.request('GET', '/stats')
+    await stats_client.close()
+    return results, elapsed, server_stats
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Play many concurrent games against the session server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--clients', type=int, default=50, help='Concurrent connections')
+    parser.add_argument('--games', type=int, default=40, help='Games per client')
+    parser.add_argument('--ai-fraction', type=float, default=0.05, help='Share of turns played by the server AI')
+    parser.add_argument('--ai', default='alphabeta', help='random, alphabeta, mcts or policy')
+    parser.add_argument('--time-limit-ms', type=float, default=20)
+    parser.add_argument('--delete', action='store_true', help='Delete every session once its game is over')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results, elapsed, server_stats = asyncio.run(
+        run_load(args.host, args.port, args.clients, args.games, args.ai_fraction, args.ai, args.time_limit_ms,
+                 args.seed, args.delete))
+
+    requests = len(results['move_latencies']) + len(results['ai_latencies'])
+    print(f"{results['games']} games, {requests} moves from {args.clients} clients in {elapsed:.2f} seconds "
+          f"({requests / elapsed:.0f} moves/sec), {len(results['errors'])} errors, "
+          f"{results['ai_rejected']} AI requests turned away")
+    print(f"Client move latency: {latency_summary(results['move_latencies'])}")
+    print(f"Client AI-move latency: {latency_summary(results['ai_latencies'])}")
+    print(f"Server holds {server_stats['sessions']} sessions, {server_stats['bytes_per_session']:.0f} bytes each "
+          f"(max RSS {server_stats['max_rss_mb']:.0f} MB)")
+    print(f"Server move latency: {server_stats['move_latency']}")
+    print(f"Server AI-move latency: {server_stats['ai_move_latency']}")
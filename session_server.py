@@ -0,0 +1,298 @@
+import asyncio
+import itertools
+import random
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import BitboardSuperTicTacToe
+from http_util import HTTPError, connection_handler, latency_summary
+
+# Game-session server: holds many live games in memory and plays them over HTTP.
+# Each session is a BitboardSuperTicTacToe (nine pairs of 9-bit ints in __slots__)
+# plus a bytearray of the moves played, under a kilobyte in all instead of the NumPy
+# arrays of buildai.SuperTicTacToe. Every move is validated by the engine.
+#
+#   POST   /sessions               {"starting_player": 1}      -> new session state
+#   GET    /sessions/<id>                                      -> state
+#   POST   /sessions/<id>/move     {"move": 40} or {"row": 4, "col": 4}
+#   POST   /sessions/<id>/ai-move  {"ai": "alphabeta", "time_limit_ms": 100}
+#   DELETE /sessions/<id>
+#   GET    /stats                  sessions, memory per session, latency percentiles
+#
+# AI moves run in a process pool, so a long search never blocks the event loop. At
+# most max_pending_ai searches are queued or running; beyond that requests get 503.
+
+LATENCY_WINDOW = 100000
+AI_PLAYERS = ('random', 'alphabeta', 'mcts', 'policy')
+MAX_TIME_LIMIT_MS = 10000
+MEMORY_SAMPLE = 1000  # Sessions measured for the memory-per-session estimate
+
+_ai_players = {}  # Per worker process: one AI per (kind, player), reused across requests
+_transposition_table = None  # Per worker process: shared by its alpha-beta players
+
+
+def make_ai(kind, player):
+    global _transposition_table
+    if kind == 'alphabeta':
+        from alphabeta import AlphaBetaAI
+        from transposition import TranspositionTable
+        if _transposition_table is None:
+            _transposition_table = TranspositionTable(18)
+        return AlphaBetaAI(player, transposition_table=_transposition_table)
+    if kind == 'mcts':
+        from mcts import MCTSAI
+        return MCTSAI(player)
+    if kind == 'policy':
+        from numpy_model import PolicyAI
+        return PolicyAI(player)
+    return None
+
+
+def choose_ai_move(kind, board, current_player, next_valid_sub_board, time_limit_ms):
+    # Runs in a worker process: rebuild the position and let the chosen AI pick a move
+    game = BitboardSuperTicTacToe.from_array(board, current_player, next_valid_sub_board)
+    if kind == 'random':
+        return random.choice(game.get_valid_moves())
+    # Keyed without the time limit, which clients choose freely: it is set per request
+    key = (kind, current_player)
+    if key not in _ai_players:
+        _ai_players[key] = make_ai(kind, current_player)
+    ai = _ai_players[key]
+    if kind == 'alphabeta':
+        ai.time_limit_ms = time_limit_ms
+    elif kind == 'mcts':
+        ai.time_budget = time_limit_ms / 1000.0
+    return ai.choose_move(game)
+
+
+class Session:
+    __slots__ = ('game', 'moves', 'last_active', 'busy')
+
+    def __init__(self, starting_player=1):
+        self.game = BitboardSuperTicTacToe(starting_player=starting_player)
+        self.moves = bytearray()  # Moves played, one byte each
+        self.last_active = time.monotonic()
+        self.busy = False  # An AI move is being searched for this session
+
+    def play(self, move):
+        if not self.game.make_move(move):
+            return False
+        # Sessions never undo, so the engine's undo history would only grow
+        self.game.move_history.clear()
+        self.moves.append(move)
+        return True
+
+    def state(self, session_id):
+        game = self.game
+        winner = game.get_winner()
+        return {
+            'session_id': session_id,
+            'board': game.to_array().reshape(81).tolist(),
+            'current_player': game.current_player,
+            'next_valid_sub_board': game.next_valid_sub_board,
+            'valid_moves': [] if winner is not None else game.get_valid_moves(),
+            'winner': winner,
+            'game_over': winner is not None,
+            'moves': list(self.moves),
+        }
+
+    def size(self):
+        # Bytes held by this session and the objects only it references (small ints are shared)
+        game = self.game
+        masks = [mask for mask in game.x_boards + game.o_boards if mask > 256]
+        return (sys.getsizeof(self) + sys.getsizeof(game) + sys.getsizeof(game.x_boards) +
+                sys.getsizeof(game.o_boards) + sys.getsizeof(game.move_history) + sys.getsizeof(self.moves) +
+                sum(sys.getsizeof(mask) for mask in masks))
+
+
+def parse_move(payload):
+    if not isinstance(payload, dict):
+        raise HTTPError(400, 'Expected a JSON object with "move" or "row" and "col"')
+    if 'move' in payload:
+        move = payload['move']
+    elif 'row' in payload and 'col' in payload:
+        if payload['row'] not in range(9) or payload['col'] not in range(9):
+            raise HTTPError(400, 'row and col must be 0-8')
+        move = payload['row'] * 9 + payload['col']
+    else:
+        raise HTTPError(400, 'Expected "move" or "row" and "col"')
+    if not isinstance(move, int) or isinstance(move, bool):
+        raise HTTPError(400, 'move must be an integer')
+    return move
+
+
+class SessionServer:
+    def __init__(self, ai_workers=2, max_pending_ai=None, max_sessions=1000000, session_ttl=3600.0):
+        self.sessions = {}
+        self.session_ids = itertools.count(1)
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.ai_executor = ProcessPoolExecutor(max_workers=ai_workers)
+        self.ai_workers = ai_workers
+        self.max_pending_ai = max_pending_ai or 4 * ai_workers
+        self.ai_slots = None  # Semaphore, created on the running loop
+        self.move_latencies = deque(maxlen=LATENCY_WINDOW)
+        self.ai_latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counts = {'created': 0, 'moves': 0, 'ai_moves': 0, 'rejected_moves': 0, 'ai_rejected': 0, 'expired': 0}
+        self.start_time = time.time()
+
+    async def handle(self, method, path, payload):
+        parts = path.strip('/').split('/')
+        if parts == ['sessions']:
+            if method != 'POST':
+                raise HTTPError(405, 'Use POST')
+            return 200, self.create({} if payload is None else payload)
+        if parts[0] == 'sessions' and len(parts) in (2, 3):
+            session_id = parts[1]
+            session = self.sessions.get(session_id)
+            if session is None:
+                raise HTTPError(404, f"No session {session_id}")
+            session.last_active = time.monotonic()
+            action = parts[2] if len(parts) == 3 else None
+            if action is None and method == 'GET':
+                return 200, session.state(session_id)
+            if action is None and method == 'DELETE':
+                del self.sessions[session_id]
+                return 200, {'deleted': session_id}
+            if action == 'move' and method == 'POST':
+                return 200, self.move(session_id, session, payload)
+            if action == 'ai-move' and method == 'POST':
+                return 200, await self.ai_move(session_id, session, {} if payload is None else payload)
+            raise HTTPError(405, f"{method} not supported on {path}")
+        if path == '/stats':
+            return 200, self.stats()
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        raise HTTPError(404, f"No route for {path}")
+
+    def create(self, payload):
+        if not isinstance(payload, dict):
+            raise HTTPError(400, 'Expected a JSON object')
+        if len(self.sessions) >= self.max_sessions:
+            raise HTTPError(503, f"Session limit of {self.max_sessions} reached")
+        starting_player = payload.get('starting_player', 1)
+        if starting_player not in (1, -1):
+            raise HTTPError(400, 'starting_player must be 1 or -1')
+        session_id = str(next(self.session_ids))
+        session = Session(starting_player)
+        self.sessions[session_id] = session
+        self.counts['created'] += 1
+        return session.state(session_id)
+
+    def move(self, session_id, session, payload):
+        start_time = time.perf_counter()
+        move = parse_move(payload)
+        if session.busy:
+            raise HTTPError(409, 'An AI move is in progress for this session')
+        if session.game.is_game_over():
+            raise HTTPError(409, 'The game is already over')
+        if not session.play(move):
+            self.counts['rejected_moves'] += 1
+            raise HTTPError(409, f"Illegal move {move}")
+        self.counts['moves'] += 1
+        state = session.state(session_id)
+        self.move_latencies.append(time.perf_counter() - start_time)
+        return state
+
+    async def ai_move(self, session_id, session, payload):
+        start_time = time.perf_counter()
+        if not isinstance(payload, dict):
+            raise HTTPError(400, 'Expected a JSON object with "ai" and "time_limit_ms"')
+        kind = payload.get('ai', 'alphabeta')
+        if kind not in AI_PLAYERS:
+            raise HTTPError(400, f"ai must be one of {', '.join(AI_PLAYERS)}")
+        time_limit_ms = payload.get('time_limit_ms', 100)
+        if not isinstance(time_limit_ms, (int, float)) or not 0 < time_limit_ms <= MAX_TIME_LIMIT_MS:
+            raise HTTPError(400, f"time_limit_ms must be between 0 and {MAX_TIME_LIMIT_MS}")
+        if session.busy:
+            raise HTTPError(409, 'An AI move is already in progress for this session')
+        game = session.game
+        if game.is_game_over():
+            raise HTTPError(409, 'The game is already over')
+        if self.ai_slots.locked():
+            self.counts['ai_rejected'] += 1
+            raise HTTPError(503, 'AI workers are busy, try again later')
+
+        session.busy = True
+        try:
+            async with self.ai_slots:
+                move = await asyncio.get_running_loop().run_in_executor(
+                    self.ai_executor, choose_ai_move, kind, game.to_array(), game.current_player,
+                    game.next_valid_sub_board, time_limit_ms)
+        finally:
+            session.busy = False
+        if move is None or not session.play(move):
+            raise HTTPError(500, f"AI {kind} returned an invalid move {move}")
+        self.counts['ai_moves'] += 1
+        state = session.state(session_id)
+        state['ai_move'] = move
+        self.ai_latencies.append(time.perf_counter() - start_time)
+        return state
+
+    def memory_per_session(self):
+        sample = list(itertools.islice(self.sessions.values(), MEMORY_SAMPLE))
+        if not sample:
+            return 0.0
+        # The dict entry (key string and slot) is part of the cost of holding a session
+        key_bytes = sys.getsizeof(str(self.counts['created'])) + sys.getsizeof(self.sessions) / len(self.sessions)
+        return sum(session.size() for session in sample) / len(sample) + key_bytes
+
+    def stats(self):
+        return {
+            'sessions': len(self.sessions),
+            'bytes_per_session': self.memory_per_session(),
+            'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'uptime_seconds': time.time() - self.start_time,
+            'move_latency': latency_summary(self.move_latencies),
+            'ai_move_latency': latency_summary(self.ai_latencies),
+            'ai_workers': self.ai_workers,
+            'max_pending_ai': self.max_pending_ai,
+            **self.counts,
+        }
+
+    async def expire_sessions(self):
+        # Drop sessions idle for longer than session_ttl, checked a few times per TTL
+        while True:
+            await asyncio.sleep(max(self.session_ttl / 4, 1.0))
+            cutoff = time.monotonic() - self.session_ttl
+            expired = [session_id for session_id, session in self.sessions.items()
+                       if session.last_active < cutoff and not session.busy]
+            for session_id in expired:
+                del self.sessions[session_id]
+            self.counts['expired'] += len(expired)
+
+    async def serve(self, host='127.0.0.1', port=8081):
+        self.ai_slots = asyncio.Semaphore(self.max_pending_ai)
+        expiry_task = asyncio.create_task(self.expire_sessions())
+        server = await asyncio.start_server(connection_handler(self.handle), host, port)
+        print(f"Serving game sessions on http://{host}:{port} "
+              f"({self.ai_workers} AI workers, at most {self.max_pending_ai} pending AI moves)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            expiry_task.cancel()
+            self.ai_executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Host live Super Tic-Tac-Toe games over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--ai-workers', type=int, default=2, help='Processes searching AI moves')
+    parser.add_argument('--max-pending-ai', type=int, default=None,
+                        help='AI moves queued or running before requests get 503 (default 4 per worker)')
+    parser.add_argument('--max-sessions', type=int, default=1000000)
+    parser.add_argument('--session-ttl', type=float, default=3600.0, help='Seconds before an idle session is dropped')
+    args = parser.parse_args()
+
+    server = SessionServer(args.ai_workers, args.max_pending_ai, args.max_sessions, args.session_ttl)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"Final stats: {server.stats()}")
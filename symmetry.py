@@ -0,0 +1,100 @@
+import numpy as np
+
+# The 8 symmetries of the square (D4) acting on Super Tic-Tac-Toe positions. Rotating or
+# reflecting the whole 9x9 grid moves every sub-board and every cell inside it in the same
+# way, so each symmetry is one permutation of the 81 cells (moves are row * 9 + col).
+#
+# PERMUTATIONS[k] gathers a transformed board: transformed = board[..., PERMUTATIONS[k]]
+# MOVE_MAPS[k] sends a move on the original board to the same move on the transformed one
+
+_GRID = np.arange(81).reshape(9, 9)
+PERMUTATIONS = np.array([np.rot90(grid, rotation).reshape(81)
+                         for grid in (_GRID, _GRID.T) for rotation in range(4)])
+MOVE_MAPS = np.argsort(PERMUTATIONS, axis=1)
+NUM_SYMMETRIES = len(PERMUTATIONS)
+
+# Boards are hashed as three base-3 words of 27 cells each (3**27 fits easily in int64)
+WORD_CELLS = 27
+_POWERS = 3 ** np.arange(WORD_CELLS, dtype=np.int64)
+
+
+def transform(boards, moves, k):
+    # Apply symmetry k to a batch of (N, 81) boards and their (N,) move labels
+    return boards[:, PERMUTATIONS[k]], MOVE_MAPS[k][moves]
+
+
+def board_keys(boards):
+    # (N, 3) int64 keys that identify each (N, 81) board exactly
+    digits = (np.asarray(boards, dtype=np.int64) + 1).reshape(-1, 3, WORD_CELLS)
+    return digits @ _POWERS
+
+
+def canonicalize(boards, moves):
+    # Map each (board, move) sample to the symmetric variant with the smallest board key.
+    # When a board is itself symmetric, the smallest of the equivalent moves is chosen, so
+    # equivalent samples always end up identical. Returns (boards, moves, keys, symmetry used).
+    boards = np.asarray(boards)
+    moves = np.asarray(moves)
+    best_keys = board_keys(boards)
+    best_moves = moves.astype(np.int64)
+    best_symmetry = np.zeros(len(boards), dtype=np.int8)
+    for k in range(1, NUM_SYMMETRIES):
+        keys = board_keys(boards[:, PERMUTATIONS[k]])
+        mapped = MOVE_MAPS[k][moves]
+        smaller = keys[:, 0] < best_keys[:, 0]
+        equal = keys[:, 0] == best_keys[:, 0]
+        smaller |= equal & (keys[:, 1] < best_keys[:, 1])
+        equal &= keys[:, 1] == best_keys[:, 1]
+        smaller |= equal & (keys[:, 2] < best_keys[:, 2])
+        equal &= keys[:, 2] == best_keys[:, 2]
+        better = smaller | (equal & (mapped < best_moves))
+        best_keys[better] = keys[better]
+        best_moves[better] = mapped[better]
+        best_symmetry[better] = k
+    canonical = boards[np.arange(len(boards))[:, None], PERMUTATIONS[best_symmetry]]
+    return canonical, best_moves.astype(moves.dtype), best_keys, best_symmetry
+
+
+def deduplicate(boards, moves):
+    # Canonicalize and merge equivalent samples: (unique boards, moves, sample counts)
+    canonical, canonical_moves, keys, _ = canonicalize(boards, moves)
+    sample_keys = np.concatenate([keys, canonical_moves.astype(np.int64)[:, None]], axis=1)
+    _, first, counts = np.unique(sample_keys, axis=0, return_index=True, return_counts=True)
+    order = np.sort(first)  # Keep samples in their original order
+    counts = counts[np.argsort(first)]
+    return canonical[order], canonical_moves[order], counts, sample_keys[order]
+
+
+class SampleIndex:
+    # Hash index over sample keys, used to merge duplicates across shards
+    def __init__(self):
+        self.index = {}
+        self.weights = []  # One count array per shard, updated as later shards repeat samples
+
+    def add_shard(self, sample_keys, counts):
+        # Registers a shard's samples; returns a mask of the samples that are new
+        shard = len(self.weights)
+        weights = counts.astype(np.uint32)
+        new = np.ones(len(sample_keys), dtype=bool)
+        raw = np.ascontiguousarray(sample_keys).view(np.dtype((np.void, sample_keys.shape[1] * 8))).ravel()
+        kept = 0
+        for row, key in enumerate(raw.tolist()):
+            location = self.index.get(key)
+            if location is None:
+                self.index[key] = (shard, kept)
+                kept += 1
+            else:
+                self.weights[location[0]][location[1]] += weights[row]
+                new[row] = False
+        self.weights.append(weights[new])
+        return new
+
+
+def augment(boards, moves):
+    # Every sample in all 8 symmetric variants: (8N, ..., 81) boards and (8N,) moves.
+    # Boards may carry extra axes before the cells, e.g. (N, planes, 81) feature planes.
+    boards = np.asarray(boards)
+    moves = np.asarray(moves)
+    variants = np.moveaxis(boards[..., PERMUTATIONS], -2, 0)
+    return (variants.reshape((-1,) + boards.shape[1:]),
+            MOVE_MAPS[:, moves].reshape(-1).astype(moves.dtype))
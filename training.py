@@ -1,32 +1,188 @@
+import os
+import json
+import time
 import pickle
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Input
 
-# Load the preprocessed data
-with open('preprocessed_data.pkl', 'rb') as f:
-    X_train, X_test, y_train, y_test = pickle.load(f)
+import features
+import symmetry
 
-# Define the model
-model = Sequential([
-    Input(shape=(81,)),  # Input layer with 81 nodes for the flattened 9x9 board
-    Dense(256, activation='relu'),  # First hidden layer with 256 units
-    Dense(128, activation='relu'),  # Second hidden layer with 128 units
-    Dense(81, activation='softmax')  # Output layer with 81 nodes for move probabilities
-])
+PREPROCESSED_DIR = 'preprocessed'
+MODEL_DIR = 'super_tic_tac_toe_model'
+PLANES_MODEL_DIR = 'super_tic_tac_toe_model_planes'  # Model trained on feature planes (different input size)
+BASE_BATCH_SIZE = 32
+BASE_LEARNING_RATE = 0.001  # Adam's default, tuned for BASE_BATCH_SIZE
+SHARD_BLOCK_ROWS = 4096  # Rows read from a shard at a time by the input pipeline
 
-# Compile the model
-model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+def build_model(input_size=81):
+    # Define the model
+    model = Sequential([
+        Input(shape=(input_size,)),  # Input layer with 81 nodes for the flattened 9x9 board (or the feature planes)
+        Dense(256, activation='relu'),  # First hidden layer with 256 units
+        Dense(128, activation='relu'),  # Second hidden layer with 128 units
+        Dense(81, activation='softmax')  # Output layer with 81 nodes for move probabilities
+    ])
+    return model
 
-# Train the model
-history = model.fit(X_train, y_train, epochs=20, batch_size=32, validation_split=0.2)
+def train_in_memory():
+    # Load the preprocessed data
+    with open('preprocessed_data.pkl', 'rb') as f:
+        X_train, X_test, y_train, y_test = pickle.load(f)
 
-# Save the trained model
-model.save('super_tic_tac_toe_model')
+    model = build_model()
 
-print("Model training complete and saved as 'super_tic_tac_toe_model'")
+    # Compile the model
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
 
-# Evaluate the model on the test data
-test_loss, test_accuracy = model.evaluate(X_test, y_test)
-print(f"Test Accuracy: {test_accuracy:.2f}")
+    # Train the model
+    history = model.fit(X_train, y_train, epochs=20, batch_size=32, validation_split=0.2)
+
+    # Save the trained model
+    model.save(MODEL_DIR)
+
+    print(f"Model training complete and saved as '{MODEL_DIR}'")
+
+    # Evaluate the model on the test data
+    test_loss, test_accuracy = model.evaluate(X_test, y_test)
+    print(f"Test Accuracy: {test_accuracy:.2f}")
+
+def scaled_learning_rate(batch_size, scaling='linear', base_learning_rate=BASE_LEARNING_RATE):
+    # Larger batches take fewer optimizer steps per epoch, so raise the step size to match
+    ratio = batch_size / BASE_BATCH_SIZE
+    if scaling == 'linear':
+        return base_learning_rate * ratio
+    if scaling == 'sqrt':
+        return base_learning_rate * np.sqrt(ratio)
+    return base_learning_rate
+
+def load_manifest(data_dir=PREPROCESSED_DIR):
+    with open(os.path.join(data_dir, 'manifest.json'), 'r') as f:
+        return json.load(f)
+
+def read_shard_blocks(X_path, y_path, w_path, shuffle, augment, planes):
+    # Yield a shard in blocks of rows straight from the memmapped .npy files. Shards
+    # written with --dedup carry sample weights; others weigh every sample 1.
+    # Bit-packed feature planes are unpacked here, a block at a time.
+    X = np.load(X_path.decode(), mmap_mode='r')
+    y = np.load(y_path.decode(), mmap_mode='r')
+    w = np.load(w_path.decode(), mmap_mode='r') if w_path else np.ones(len(y), dtype=np.uint32)
+    starts = np.arange(0, len(y), SHARD_BLOCK_ROWS)
+    if shuffle:
+        np.random.shuffle(starts)
+    for start in starts:
+        X_block = np.asarray(X[start:start + SHARD_BLOCK_ROWS])
+        y_block = np.asarray(y[start:start + SHARD_BLOCK_ROWS])
+        w_block = np.asarray(w[start:start + SHARD_BLOCK_ROWS])
+        if planes:
+            X_block = features.unpack(X_block)
+        if augment:
+            # All 8 symmetric variants of every sample
+            X_block, y_block = symmetry.augment(X_block, y_block)
+            w_block = np.tile(w_block, symmetry.NUM_SYMMETRIES)
+        X_block = X_block.reshape(len(y_block), -1)
+        if shuffle:
+            order = np.random.permutation(len(y_block))
+            X_block, y_block, w_block = X_block[order], y_block[order], w_block[order]
+        yield X_block, y_block, w_block
+
+def make_dataset(data_dir, split, batch_size, shuffle_buffer=0, num_parallel_reads=tf.data.AUTOTUNE, cycle_length=8,
+                 augment=False):
+    manifest = load_manifest(data_dir)
+    shards = [shard[split] for shard in manifest['shards'] if shard[split]['samples'] > 0]
+    X_files = [os.path.join(data_dir, shard['X']) for shard in shards]
+    y_files = [os.path.join(data_dir, shard['y']) for shard in shards]
+    w_files = [os.path.join(data_dir, shard['w']) if 'w' in shard else '' for shard in shards]
+    shuffle = shuffle_buffer > 0
+    planes = manifest.get('features', 'board') == 'planes'
+    input_size = features.PLANES_SIZE if planes else 81
+
+    files = tf.data.Dataset.from_tensor_slices((X_files, y_files, w_files))
+    if shuffle:
+        files = files.shuffle(len(X_files), reshuffle_each_iteration=True)
+
+    signature = (tf.TensorSpec(shape=(None, input_size), dtype=tf.int8), tf.TensorSpec(shape=(None,), dtype=tf.uint8),
+                 tf.TensorSpec(shape=(None,), dtype=tf.uint32))
+    dataset = files.interleave(
+        lambda X_path, y_path, w_path: tf.data.Dataset.from_generator(
+            read_shard_blocks, args=(X_path, y_path, w_path, shuffle, augment, planes), output_signature=signature),
+        cycle_length=max(1, min(cycle_length, len(X_files))),
+        num_parallel_calls=num_parallel_reads,
+        deterministic=not shuffle)
+    dataset = dataset.unbatch()
+    if shuffle:
+        dataset = dataset.shuffle(shuffle_buffer)
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(lambda X, y, w: (tf.cast(X, tf.float32), tf.cast(y, tf.int32), tf.cast(w, tf.float32)),
+                          num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+class ThroughputLogger(tf.keras.callbacks.Callback):
+    # Logs training samples per second for every epoch
+    def __init__(self, samples_per_epoch):
+        super().__init__()
+        self.samples_per_epoch = samples_per_epoch
+        self.epoch_start = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.time()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.time() - self.epoch_start
+        samples_per_sec = self.samples_per_epoch / elapsed if elapsed > 0 else 0.0
+        if logs is not None:
+            logs['samples_per_sec'] = samples_per_sec
+        print(f"Epoch {epoch + 1}: {samples_per_sec:,.0f} samples/sec ({elapsed:.1f} seconds)")
+
+def train_streaming(data_dir=PREPROCESSED_DIR, epochs=20, batch_size=1024, lr_scaling='sqrt',
+                    base_learning_rate=BASE_LEARNING_RATE, shuffle_buffer=100000, cycle_length=8, augment=False):
+    manifest = load_manifest(data_dir)
+    train_dataset = make_dataset(data_dir, 'train', batch_size, shuffle_buffer, cycle_length=cycle_length,
+                                 augment=augment)
+    test_dataset = make_dataset(data_dir, 'test', batch_size)
+    samples_per_epoch = manifest['train_samples'] * (symmetry.NUM_SYMMETRIES if augment else 1)
+    planes = manifest.get('features', 'board') == 'planes'
+    model_dir = PLANES_MODEL_DIR if planes else MODEL_DIR
+
+    learning_rate = scaled_learning_rate(batch_size, lr_scaling, base_learning_rate)
+    print(f"Training on {samples_per_epoch} samples with batch size {batch_size}, learning rate {learning_rate:g}")
+
+    model = build_model(features.PLANES_SIZE if planes else 81)
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                  loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    history = model.fit(train_dataset, epochs=epochs, callbacks=[ThroughputLogger(samples_per_epoch)])
+
+    # Save the trained model
+    model.save(model_dir)
+
+    print(f"Model training complete and saved as '{model_dir}'")
+
+    # Evaluate the model on the test data
+    test_loss, test_accuracy = model.evaluate(test_dataset)
+    print(f"Test Accuracy: {test_accuracy:.2f}")
+    return history
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Train the Super Tic-Tac-Toe move prediction model')
+    parser.add_argument('--streaming', action='store_true',
+                        help="Stream the sharded arrays written by 'Split.py --streaming' through tf.data")
+    parser.add_argument('--data-dir', default=PREPROCESSED_DIR)
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--lr-scaling', choices=['linear', 'sqrt', 'none'], default='sqrt',
+                        help=f"How the learning rate grows with batch size relative to {BASE_BATCH_SIZE}")
+    parser.add_argument('--base-lr', type=float, default=BASE_LEARNING_RATE)
+    parser.add_argument('--shuffle-buffer', type=int, default=100000)
+    parser.add_argument('--cycle-length', type=int, default=8, help='Shards read in parallel')
+    parser.add_argument('--augment', action='store_true',
+                        help='Train on all 8 symmetric variants of every sample, generated on the fly')
+    args = parser.parse_args()
+
+    if args.streaming:
+        train_streaming(args.data_dir, args.epochs, args.batch_size, args.lr_scaling, args.base_lr,
+                        args.shuffle_buffer, args.cycle_length, args.augment)
+    else:
+        train_in_memory()
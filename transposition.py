@@ -0,0 +1,91 @@
+from array import array
+
+# Fixed-size transposition table shared by the search AIs.
+#
+# The table has 2**size_bits buckets addressed by the low bits of a 64-bit position
+# hash. With the default 'two-tier' policy every bucket has two slots: a depth-preferred
+# slot that is only replaced by searches at least as deep, and an always-replace slot
+# that takes everything else. The 'always' policy uses a single always-replace slot.
+# Entries live in flat typed arrays, which keeps them compact and out of the garbage
+# collector's way (a GC pass over millions of list slots would stall a timed search).
+
+EXACT = 0
+LOWER_BOUND = 1  # Value is at least the stored value (fail-high)
+UPPER_BOUND = 2  # Value is at most the stored value (fail-low)
+
+EMPTY_KEY = 0  # A real position hashing to exactly 0 is not a practical concern
+NO_MOVE = -1
+
+
+class TranspositionTable:
+    def __init__(self, size_bits=20, policy='two-tier'):
+        if policy not in ('two-tier', 'always'):
+            raise ValueError(f"Unknown replacement policy: {policy}")
+        self.policy = policy
+        self.slots_per_bucket = 2 if policy == 'two-tier' else 1
+        self.mask = (1 << size_bits) - 1
+        self.clear()
+
+    def clear(self):
+        size = (self.mask + 1) * self.slots_per_bucket
+        self.keys = array('Q', [EMPTY_KEY]) * size
+        self.depths = array('h', [0]) * size
+        self.values = array('q', [0]) * size
+        self.flags = array('b', [EXACT]) * size
+        self.best_moves = array('b', [NO_MOVE]) * size
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0  # Stores that evicted a different position
+
+    def __len__(self):
+        return len(self.keys) - self.keys.count(EMPTY_KEY)
+
+    def probe(self, key):
+        # Returns (depth, value, flag, best_move) for the position or None
+        slot = (key & self.mask) * self.slots_per_bucket
+        for i in range(slot, slot + self.slots_per_bucket):
+            if self.keys[i] == key:
+                self.hits += 1
+                best_move = self.best_moves[i]
+                return self.depths[i], self.values[i], self.flags[i], None if best_move == NO_MOVE else best_move
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value, flag, best_move=None):
+        slot = (key & self.mask) * self.slots_per_bucket
+        if self.slots_per_bucket == 2:
+            deep = slot
+            if self.keys[deep] == key or self.keys[deep] == EMPTY_KEY or depth >= self.depths[deep]:
+                # Demote the previous deep entry to the always-replace slot rather than lose it
+                if self.keys[deep] not in (key, EMPTY_KEY):
+                    self._write(deep + 1, self.keys[deep], self.depths[deep], self.values[deep],
+                                self.flags[deep], self.best_moves[deep])
+                    self.keys[deep] = EMPTY_KEY
+                slot = deep
+            else:
+                slot = deep + 1
+        self._write(slot, key, depth, value, flag, best_move)
+        self.stores += 1
+
+    def _write(self, slot, key, depth, value, flag, best_move):
+        if self.keys[slot] not in (key, EMPTY_KEY):
+            self.overwrites += 1
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.values[slot] = value
+        self.flags[slot] = flag
+        self.best_moves[slot] = NO_MOVE if best_move is None else best_move
+
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate(),
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+        }
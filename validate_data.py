@@ -0,0 +1,185 @@
+import glob
+import os
+import pickle
+import time
+from collections import Counter
+import multiprocessing as mp
+
+import numpy as np
+from tqdm import tqdm
+
+from buildai import ENGINES
+from game_record import RECORD_EXTENSION, read_records
+from game_store import GameStore, STORE_PATH
+
+# Dataset validator that replays every game through a rules engine. Each worker opens
+# its own shard file or store range and returns only counters plus the first few
+# offending games, so no game data crosses process boundaries.
+#
+# Checks: every move is legal for the position and mover, no move follows the end of
+# the game, recorded boards and players match the replay (legacy pickles store them),
+# and the recorded outcome matches the engine's result.
+
+
+def replay_game(game_class, starting_player, moves, outcome, states=None, players=None):
+    # (reason, detail) for the first problem in a game, or None if it replays cleanly
+    game = game_class(starting_player=starting_player)
+    for ply, move in enumerate(moves):
+        if game.is_game_over():
+            return 'move after the game ended', f"ply {ply}"
+        if states is not None and not np.array_equal(states[ply], game.board):
+            return 'recorded board differs', f"before move {ply}"
+        if not game.make_move(move):
+            return 'illegal move', f"move {move} at ply {ply}"
+        if players is not None and players[ply] != game.current_player:
+            return 'recorded player differs', f"after move {ply}"
+    if states is not None and len(states) > len(moves) and not np.array_equal(states[len(moves)], game.board):
+        return 'recorded board differs', 'final board'
+    winner = game.get_winner()
+    if outcome is None:
+        return None if winner is None else ('missing outcome', f"replay gives {winner}")
+    if winner is None:
+        return 'game not over', f"recorded outcome {outcome}"
+    if winner != outcome:
+        return 'wrong outcome', f"recorded {outcome}, replay gives {winner}"
+    return None
+
+
+def new_result():
+    return {'games': 0, 'moves': 0, 'skipped': 0, 'invalid': 0, 'reasons': Counter(), 'offenders': []}
+
+
+def check(result, game_id, problem, max_offenders):
+    result['games'] += 1
+    if problem is not None:
+        result['invalid'] += 1
+        result['reasons'][problem[0]] += 1
+        if len(result['offenders']) < max_offenders:
+            result['offenders'].append((game_id, f"{problem[0]} ({problem[1]})"))
+
+
+def validate_store_range(task):
+    store_path, start, stop, engine, max_offenders = task
+    game_class = ENGINES[engine]
+    store = GameStore(store_path)
+    moves, offsets, entries = store.moves_range(start, stop)
+    result = new_result()
+    for i in range(stop - start):
+        if entries['starting_player'][i] == 0:
+            result['skipped'] += 1  # Timed out or errored game stored as an empty record
+            continue
+        game_moves = moves[offsets[i]:offsets[i + 1]].tolist()
+        outcome = int(entries['outcome'][i])
+        problem = replay_game(game_class, int(entries['starting_player'][i]), game_moves,
+                              outcome if outcome in (1, -1, 0) else None)
+        result['moves'] += len(game_moves)
+        check(result, start + i, problem, max_offenders)
+    return result
+
+
+def validate_file(task):
+    path, engine, max_offenders = task
+    game_class = ENGINES[engine]
+    name = os.path.basename(path)
+    result = new_result()
+    if path.endswith('.pkl'):
+        # Legacy game_data lists also carry the board before every move and the next player
+        with open(path, 'rb') as f:
+            games = pickle.load(f)
+        for i, game_data in enumerate(games):
+            if not game_data:
+                result['skipped'] += 1
+                continue
+            steps = [step for step in game_data[1:] if step[2] is not None]
+            moves = [int(move) for _, _, move in steps]
+            states = [np.asarray(state) for _, state, _ in steps]
+            if len(game_data) > 1 and game_data[-1][2] is None and game_data[-1][1] is not None:
+                states.append(np.asarray(game_data[-1][1]))
+            outcome = game_data[-1][0] if len(game_data) > 1 and game_data[-1][2] is None else None
+            problem = replay_game(game_class, game_data[0][0], moves, outcome if outcome in (1, -1, 0) else None,
+                                  states, [player for player, _, _ in steps])
+            result['moves'] += len(moves)
+            check(result, f"{name}:{i}", problem, max_offenders)
+    else:
+        for i, record in enumerate(read_records(path)):
+            if record is None:
+                result['skipped'] += 1
+                continue
+            problem = replay_game(game_class, record.starting_player, record.moves.tolist(), record.outcome)
+            result['moves'] += record.num_moves
+            check(result, f"{name}:{i}", problem, max_offenders)
+    return result
+
+
+def merge_results(results, max_offenders):
+    total = new_result()
+    for result in results:
+        for key in ('games', 'moves', 'skipped', 'invalid'):
+            total[key] += result[key]
+        total['reasons'].update(result['reasons'])
+        total['offenders'].extend(result['offenders'])
+    total['offenders'] = total['offenders'][:max_offenders]
+    return total
+
+
+def expand_paths(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*' + RECORD_EXTENSION)) +
+                                glob.glob(os.path.join(path, '*.pkl'))))
+        else:
+            files.append(path)
+    return files
+
+
+def validate(store_path=None, files=(), engine='bitboard', games_per_task=10000, processes=None, max_offenders=20):
+    # One task per shard file and per store range; results come back in order, so the
+    # offenders listed are the first ones in the dataset
+    tasks = [(validate_file, (path, engine, max_offenders)) for path in expand_paths(files)]
+    if store_path is not None:
+        num_games = len(GameStore(store_path))
+        tasks += [(validate_store_range, (store_path, start, min(start + games_per_task, num_games), engine,
+                                          max_offenders))
+                  for start in range(0, num_games, games_per_task)]
+
+    processes = processes or mp.cpu_count()
+    results = []
+    with mp.Pool(processes=min(processes, max(len(tasks), 1))) as pool:
+        pending = [pool.apply_async(function, (task,)) for function, task in tasks]
+        for result in tqdm(pending, desc="Validating"):
+            results.append(result.get())
+    return merge_results(results, max_offenders)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay every stored game through the rules engine')
+    parser.add_argument('files', nargs='*', help='Record (.stt) or legacy .pkl files, or directories of them')
+    parser.add_argument('--store', default=None, help=f"Also validate an indexed game store, e.g. {STORE_PATH}")
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='bitboard',
+                        help='Both engines implement the same rules; bitboard replays much faster')
+    parser.add_argument('--games-per-task', type=int, default=10000, help='Store games per worker task')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--show', type=int, default=20, help='Offending game IDs to print')
+    args = parser.parse_args()
+
+    if not args.files and args.store is None:
+        args.store = STORE_PATH
+
+    start_time = time.time()
+    result = validate(args.store, args.files, args.engine, args.games_per_task, args.processes, args.show)
+    elapsed = time.time() - start_time
+
+    print(f"\nValidated {result['games']} games ({result['moves']} moves) in {elapsed:.1f} seconds "
+          f"({result['games'] / elapsed:.0f} games/sec); {result['skipped']} empty records skipped")
+    if result['invalid'] == 0:
+        print("All games follow the rules of Super Tic-Tac-Toe!")
+    else:
+        print(f"Invalid games: {result['invalid']}")
+        for reason, count in result['reasons'].most_common():
+            print(f"  {reason}: {count}")
+        print(f"\nFirst {len(result['offenders'])} offending games:")
+        for game_id, problem in result['offenders']:
+            print(f"  {game_id}: {problem}")
@@ -0,0 +1,41 @@
+import random
+
+# Zobrist keys for SuperTicTacToe positions. A position hash is the XOR of one key
+# per occupied cell (per player), a key when player -1 is to move, and a key for
+# next_valid_sub_board (index 9 stands for None, i.e. any sub-board).
+# The keys come from a fixed seed, so hashes agree across processes and runs.
+
+ZOBRIST_SEED = 0x5EED5EED
+
+_rng = random.Random(ZOBRIST_SEED)
+CELL_KEYS = tuple((_rng.getrandbits(64), _rng.getrandbits(64)) for _ in range(81))  # [move][player == -1]
+SIDE_KEY = _rng.getrandbits(64)  # Player -1 to move
+SUB_BOARD_KEYS = tuple(_rng.getrandbits(64) for _ in range(10))
+ANY_SUB_BOARD = 9
+
+
+def player_index(player):
+    return 0 if player == 1 else 1
+
+
+def sub_board_key(next_valid_sub_board):
+    return SUB_BOARD_KEYS[ANY_SUB_BOARD if next_valid_sub_board is None else next_valid_sub_board]
+
+
+def compute_hash(board, current_player, next_valid_sub_board):
+    # Full hash from scratch; engines update it incrementally on make_move/undo_move
+    h = sub_board_key(next_valid_sub_board)
+    if current_player == -1:
+        h ^= SIDE_KEY
+    for move, value in enumerate(board.reshape(81).tolist()):
+        if value != 0:
+            h ^= CELL_KEYS[move][player_index(value)]
+    return h
+
+
+def game_hash(game):
+    # Hash of any engine's position; uses the incremental hash when the engine keeps one
+    h = getattr(game, 'hash', None)
+    if h is not None:
+        return h
+    return compute_hash(game.board, game.current_player, game.next_valid_sub_board)